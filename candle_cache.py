@@ -0,0 +1,157 @@
+import os, re, time, threading
+from collections import OrderedDict
+import numpy as np
+from PyQt6.QtCore import QObject, pyqtSignal as Signal
+
+CANDLE_CACHE_DIR_NAME = "candle_cache"
+DEFAULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_CACHE_MAX_BARS = 20000
+DEFAULT_MEMORY_ENTRIES = 48
+OHLCV_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+
+def ohlcv_to_array(ohlcv):
+    """Zamienia listę świec z ccxt ([ts, o, h, l, c, v], ...) na tablicę (N, 6) float64."""
+    if ohlcv is None or len(ohlcv) == 0:
+        return np.empty((0, len(OHLCV_COLUMNS)), dtype=np.float64)
+    return np.asarray(ohlcv, dtype=np.float64).reshape(-1, len(OHLCV_COLUMNS))
+
+
+def merge_ohlcv(cached, fresh, max_bars=DEFAULT_CACHE_MAX_BARS):
+    """
+    Scala świece z cache ze świeżo pobranymi. Świeże dane nadpisują zakres, który pokrywają
+    (np. formująca się ostatnia świeca), a starsze/nowsze świece z cache zostają zachowane.
+    """
+    if cached is None or len(cached) == 0:
+        merged = fresh if fresh is not None else ohlcv_to_array(None)
+    elif fresh is None or len(fresh) == 0:
+        merged = cached
+    else:
+        head = cached[cached[:, 0] < fresh[0, 0]]
+        tail = cached[cached[:, 0] > fresh[-1, 0]]
+        merged = np.concatenate([head, fresh, tail])
+    return merged[-max_bars:] if max_bars else merged
+
+
+class CandleCache(QObject):
+    """
+    Kolumnowy cache świec OHLCV: jeden plik .npy na (giełda, symbol, interwał), warstwa w pamięci
+    dla ostatnio używanych wykresów i limit rozmiaru na dysku z usuwaniem najdawniej używanych (LRU).
+    Bezpieczny dla wielu wątków pobierających dane naraz; błędy zapisu zgłaszane są sygnałem `write_failed`
+    (z wątku pobierania - odbiorca w GUI dostaje go przez kolejkę zdarzeń).
+    """
+    write_failed = Signal(str)   # opis błędu zapisu
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_CACHE_MAX_BYTES, max_bars=DEFAULT_CACHE_MAX_BARS, memory_entries=DEFAULT_MEMORY_ENTRIES, parent=None):
+        super().__init__(parent)
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_bars = max_bars
+        self.memory_entries = memory_entries
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()      # nazwa pliku -> tablica (N, 6)
+        self._disk_index = OrderedDict()  # nazwa pliku -> rozmiar w bajtach, od najdawniej używanego
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._scan_disk()
+
+    def _scan_disk(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.npy'): continue
+            try:
+                st = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((st.st_mtime, name, st.st_size))
+            except OSError:
+                pass
+        for _, name, size in sorted(entries):
+            self._disk_index[name] = size
+
+    @staticmethod
+    def file_name(exchange_id, symbol, timeframe):
+        safe_symbol = re.sub(r'[^A-Za-z0-9]+', '-', symbol).strip('-')
+        return f"{exchange_id}__{safe_symbol}__{timeframe}.npy"
+
+    def load(self, exchange_id, symbol, timeframe):
+        name = self.file_name(exchange_id, symbol, timeframe)
+        with self._lock:
+            data = self._memory.get(name)
+            if data is not None:
+                self._memory.move_to_end(name)
+                if name in self._disk_index: self._disk_index.move_to_end(name)
+                return data
+            if name not in self._disk_index:
+                return None
+            path = os.path.join(self.cache_dir, name)
+            try:
+                data = np.load(path)
+                os.utime(path)
+            except (OSError, ValueError):
+                self._disk_index.pop(name, None)
+                return None
+            self._disk_index.move_to_end(name)
+            self._remember(name, data)
+            return data
+
+    def store(self, exchange_id, symbol, timeframe, data):
+        if data is None or len(data) == 0: return
+        data = np.ascontiguousarray(data[-self.max_bars:], dtype=np.float64)
+        name = self.file_name(exchange_id, symbol, timeframe)
+        path = os.path.join(self.cache_dir, name)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with self._lock:
+            self._remember(name, data)
+            try:
+                with open(tmp_path, 'wb') as f:
+                    np.save(f, data)
+                os.replace(tmp_path, path)
+                # rozmiar pliku z nagłówkiem .npy, nie samych danych - limit dysku liczony dokładnie
+                self._disk_index[name] = os.path.getsize(path)
+            except OSError as e:
+                error = f"Błąd zapisu cache świec {name}: {e}"
+                if os.path.exists(tmp_path):
+                    try:
+                        os.remove(tmp_path)
+                    except OSError:
+                        pass
+            else:
+                error = None
+                self._disk_index.move_to_end(name)
+                self._evict_disk()
+        if error: self.write_failed.emit(error)
+
+    def _remember(self, name, data):
+        self._memory[name] = data
+        self._memory.move_to_end(name)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        total = sum(self._disk_index.values())
+        while total > self.max_bytes and len(self._disk_index) > 1:
+            name, size = self._disk_index.popitem(last=False)
+            self._memory.pop(name, None)
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+            total -= size
+
+
+def fetch_ohlcv_cached(exchange, cache, symbol, timeframe, limit):
+    """
+    Pobiera świece z uzupełnianiem cache: jeśli w cache jest świeża historia, z giełdy pobierany jest
+    tylko brakujący ogon (od ostatniej zapisanej świecy), w przeciwnym razie pełne `limit` świec.
+    Zwraca tablicę (N, 6) po scaleniu.
+    """
+    cached = cache.load(exchange.id, symbol, timeframe) if cache else None
+    since = None
+    if cached is not None and len(cached):
+        timeframe_ms = exchange.parse_timeframe(timeframe) * 1000
+        last_ts = cached[-1, 0]
+        if time.time() * 1000 - last_ts < limit * timeframe_ms:
+            since = int(last_ts)
+    fresh = ohlcv_to_array(exchange.fetch_ohlcv(symbol, timeframe=timeframe, since=since, limit=limit))
+    merged = merge_ohlcv(cached, fresh, cache.max_bars if cache else None) if since is not None else fresh
+    if cache and len(merged):
+        cache.store(exchange.id, symbol, timeframe, merged)
+    return merged
@@ -1,89 +1,138 @@
-import sys, os, configparser, datetime, time, ccxt, pandas as pd, pandas_ta as ta, pyqtgraph as pg, numpy as np
+import sys, os, configparser, datetime, time, asyncio, ccxt, ccxt.pro as ccxtpro, pandas as pd, pyqtgraph as pg, numpy as np
 from PyQt6.QtWidgets import (QMainWindow, QVBoxLayout, QWidget, QComboBox, QGridLayout, QLabel, QListWidget, QPushButton, QHBoxLayout, QGroupBox, QApplication, QMessageBox, QListWidgetItem, QFormLayout, QSpinBox, QStackedWidget, QCheckBox, QScrollArea, QAbstractItemView)
-from PyQt6.QtCore import Qt, QThread, pyqtSignal as Signal, QTimer, QEvent, QPointF, QRectF
+from PyQt6.QtCore import Qt, QThread, pyqtSignal as Signal, QTimer, QEvent, QPointF, QRectF, QLineF
 from PyQt6.QtGui import QPainter, QPen, QFont, QBrush
+from collections import deque
+
+from candle_cache import CandleCache, CANDLE_CACHE_DIR_NAME, OHLCV_COLUMNS, fetch_ohlcv_cached, merge_ohlcv, ohlcv_to_array
+from indicators import apply_indicator, get_indicator, indicator_names
+from config_service import get_config_service
 
 pg.setConfigOption('background', 'w')
 pg.setConfigOption('foreground', 'k')
 
-DEFAULT_WPR_LENGTH = 14
-DEFAULT_EMA_WPR_LENGTH = 9
-DEFAULT_RSI_LENGTH = 14
-DEFAULT_MACD_FAST = 12
-DEFAULT_MACD_SLOW = 26
-DEFAULT_MACD_SIGNAL = 9
 DEFAULT_REFRESH_MINUTES = 5
+CHART_MODE_TIMEFRAMES = "Jedna para, wiele interwałów"
+CHART_MODE_PAIRS = "Wiele par, jeden interwał"
+DEFAULT_CROSS_PAIR_BATCH = 2
+CROSS_PAIR_BATCH_KEY = 'cross_pairs'
+ROUND_ROBIN_BATCH_KEY = 'round_robin'
+DEFAULT_GRID_ROWS, DEFAULT_GRID_COLUMNS = 2, 3
+MAX_GRID_SIZE = 4
+CHART_TIMEFRAMES = ['1m', '5m', '15m', '1h', '4h', '12h', '1d', '1w']
+CHART_CANDLE_LIMIT = 300
+DEFAULT_PREFETCH_BUDGET = 24
+PREFETCH_RECENT_PAIRS = 5
+LIVE_REPAINT_FPS = 4
+LIVE_STREAM_CLOSE_TIMEOUT_MS = 3000   # czas na zamknięcie połączeń ccxt.pro przy zamykaniu okna
+CROSSHAIR_FPS = 60
+CHART_MAX_HISTORY_BARS = 20000
+LIVE_INDICATOR_MIN_WARMUP_BARS = 300   # rozbieg wskaźnika przy przeliczaniu końcówki danych ze streamu na żywo
+LIVE_INDICATOR_WARMUP_PERIODS = 20     # ...co najmniej tyle razy najdłuższy okres wskaźnika (ustalenie się EMA/RMA)
+LOD_MIN_CANDLE_PIXELS = 3
+
+HISTOGRAM_UP_BRUSH = pg.mkBrush('g')
+HISTOGRAM_DOWN_BRUSH = pg.mkBrush('r')
 
 class CandlestickItem(pg.GraphicsObject):
-    def __init__(self, data=[]):
+    def __init__(self):
         pg.GraphicsObject.__init__(self)
-        self._data = []
-        self.setData(data)
-
-    def setData(self, data):
-        self._data = data
-        self.generatePicture()
+        empty = np.empty(0)
+        self.x, self.open, self.high, self.low, self.close = empty, empty, empty, empty, empty
+        self.width = 1.0
+        self.data_version = 0
+        self.picture = pg.QtGui.QPicture()
+        self.picture_key = None
+        self.bounds = QRectF()
+
+    def setData(self, x, open_, high, low, close):
+        # Obraz zamkniętych świec jest przebudowywany tylko wtedy, gdy się zmieniły (np. doszła nowa świeca);
+        # sama aktualizacja formującej się ostatniej świecy rysowana jest bezpośrednio w paint().
+        closed_changed = not (len(x) == len(self.x) and len(x) > 0 and
+                              np.array_equal(x[:-1], self.x[:-1]) and np.array_equal(open_[:-1], self.open[:-1]) and
+                              np.array_equal(high[:-1], self.high[:-1]) and np.array_equal(low[:-1], self.low[:-1]) and
+                              np.array_equal(close[:-1], self.close[:-1]))
+        self.x, self.open, self.high, self.low, self.close = x, open_, high, low, close
+        self.width = np.mean(np.diff(x)) * 0.4 if len(x) > 1 else 1.0
+        if closed_changed:
+            self.data_version += 1
         self.prepareGeometryChange()
+        self.bounds = self.calculateBounds()
         self.update()
 
-    def generatePicture(self):
+    def visibleRange(self):
+        """Zwraca (pierwszy indeks, indeks za ostatnim, rozmiar grupy świec) dla aktualnego widoku i rozdzielczości."""
+        n = len(self.x)
+        view_rect = self.viewRect()
+        pixel_width = self.pixelWidth()
+        if view_rect is None or not pixel_width:
+            return 0, n, 1
+        i0 = max(0, int(np.searchsorted(self.x, view_rect.left() - self.width)) - 1)
+        i1 = min(n, int(np.searchsorted(self.x, view_rect.right() + self.width)) + 1)
+        candle_spacing_px = (self.width / 0.4) / pixel_width
+        if candle_spacing_px >= LOD_MIN_CANDLE_PIXELS:
+            return i0, i1, 1
+        group = int(np.ceil(LOD_MIN_CANDLE_PIXELS / candle_spacing_px))
+        return i0 - i0 % group, i1, group
+
+    def generatePicture(self, i0, i1, group):
         self.picture = pg.QtGui.QPicture()
         p = pg.QtGui.QPainter(self.picture)
-        if not self._data:
-            p.end()
-            return
-
-        if len(self._data) > 1:
-            avg_interval = np.mean([self._data[i]['x'] - self._data[i-1]['x'] for i in range(1, len(self._data))])
-            w = avg_interval * 0.4
-        else:
-            w = 1.0
-
-        for d in self._data:
-            t, open_val, high_val, low_val, close_val = d['x'], d['open'], d['high'], d['low'], d['close']
-
-            # Draw wick
-            p.setPen(pg.mkPen('k')) # Always black pen for wick
-            p.drawLine(QPointF(t, low_val), QPointF(t, high_val))
-
-            # Draw body
-            if open_val < close_val:
-                p.setBrush(pg.mkBrush('g')) # Green for bullish
-            else:
-                p.setBrush(pg.mkBrush('r')) # Red for bearish
-
-            # Set pen to black for body outline
-            p.setPen(pg.mkPen('k')) # Black pen for body outline
-
-            rect_top = min(open_val, close_val)
-            rect_height = abs(close_val - open_val)
-            p.drawRect(QRectF(t - w, rect_top, w * 2, rect_height))
+        x, o, h, l, c = self.x[i0:i1], self.open[i0:i1], self.high[i0:i1], self.low[i0:i1], self.close[i0:i1]
+        if len(x) and group == 1:
+            self.drawCandles(p, x, o, h, l, c)
+        elif len(x):
+            # Oddalony widok: świece węższe niż kilka pikseli - rysujemy obwiednię min/max dla grup świec
+            starts = np.arange(0, len(x), group)
+            ends = np.minimum(starts + group, len(x)) - 1
+            group_x = (x[starts] + x[ends]) / 2
+            group_high = np.maximum.reduceat(h, starts)
+            group_low = np.minimum.reduceat(l, starts)
+            bullish = o[starts] < c[ends]
+            self.drawEnvelope(p, group_x, group_low, group_high, bullish)
         p.end()
 
+    def drawCandles(self, p, x, o, h, l, c):
+        w = self.width
+        p.setPen(pg.mkPen('k')) # Black pen for wicks and body outlines
+        p.drawLines([QLineF(t, lo, t, hi) for t, lo, hi in zip(x, l, h)])
+        bullish = o < c
+        bottoms, heights = np.minimum(o, c), np.abs(c - o)
+        for mask, color in ((bullish, 'g'), (~bullish, 'r')): # Green for bullish, red for bearish
+            p.setBrush(pg.mkBrush(color))
+            p.drawRects([QRectF(t - w, b, w * 2, hgt) for t, b, hgt in zip(x[mask], bottoms[mask], heights[mask])])
+
+    def drawEnvelope(self, p, x, low, high, bullish):
+        for mask, color in ((bullish, 'g'), (~bullish, 'r')):
+            p.setPen(pg.mkPen(color))
+            p.drawLines([QLineF(t, lo, t, hi) for t, lo, hi in zip(x[mask], low[mask], high[mask])])
+
     def paint(self, p, *args):
+        n = len(self.x)
+        if not n: return
+        i0, i1, group = self.visibleRange()
+        # Zamknięte świece z bufora obrazu (przebudowa tylko po zmianie danych, widoku lub poziomu szczegółów)
+        key = (i0, min(i1, n - 1), group, self.data_version)
+        if key != self.picture_key:
+            self.generatePicture(*key[:3])
+            self.picture_key = key
         p.drawPicture(0, 0, self.picture)
+        if i1 == n:
+            last = slice(n - 1, n)
+            if group == 1: self.drawCandles(p, self.x[last], self.open[last], self.high[last], self.low[last], self.close[last])
+            else: self.drawEnvelope(p, self.x[last], self.low[last], self.high[last], self.open[last] < self.close[last])
 
-    def boundingRect(self):
-        if not self._data:
+    def calculateBounds(self):
+        if not len(self.x):
             return QRectF()
-
-        x_values = [d['x'] for d in self._data]
-        y_lows = [d['low'] for d in self._data]
-        y_highs = [d['high'] for d in self._data]
-
-        x_min = min(x_values)
-        x_max = max(x_values)
-        y_min = np.min(y_lows)
-        y_max = np.max(y_highs)
-
-        if len(self._data) > 1:
-            avg_interval = np.mean([self._data[i]['x'] - self._data[i-1]['x'] for i in range(1, len(self._data))])
-            w = avg_interval * 0.4
-        else:
-            w = 1.0
-
+        x_min, x_max = self.x[0], self.x[-1]
+        y_min, y_max = np.min(self.low), np.max(self.high)
+        w = self.width
         return QRectF(x_min - w, y_min, (x_max - x_min) + 2 * w, y_max - y_min)
 
+    def boundingRect(self):
+        return self.bounds
+
 
 class FetchChartMarketsThread(QThread):
     markets_fetched_signal = Signal(list)
@@ -134,12 +183,50 @@ class FetchChartMarketsThread(QThread):
 
         return False
 
+def build_chart_data_frame(ohlcv, indicator_name, indicator_params, max_bars=CHART_CANDLE_LIMIT, source=None):
+    """`source` = (giełda, symbol, interwał) - wyniki wskaźnika trafiają do wspólnego cache."""
+    ohlcv = ohlcv[-max_bars:] if max_bars else ohlcv
+    df = pd.DataFrame(ohlcv, columns=OHLCV_COLUMNS)
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+    df.set_index('timestamp', inplace=True)
+    indicator_source = (*source, int(ohlcv[-1][0])) if source and len(ohlcv) else None
+    return apply_indicator(df, indicator_name, indicator_params, indicator_source)
+
+def data_frame_to_ohlcv(df):
+    return np.column_stack([df.index.asi8 // 10**6, df['open'], df['high'], df['low'], df['close'], df['volume']]).astype(np.float64)
+
+def update_chart_data_frame(df, ohlcv, indicator_name, indicator_params, max_bars):
+    """
+    Nakłada świece ze streamu na DataFrame wykresu. Wskaźnik przeliczany jest tylko dla końcówki danych z rozbiegiem,
+    a nie dla całej historii - wiersze sprzed pierwszej świecy ze streamu zachowują dotychczasowe wartości.
+    """
+    indicator = get_indicator(indicator_name)
+    periods = list(indicator.normalize_params(indicator_params).values()) if indicator else []
+    warmup = max(LIVE_INDICATOR_MIN_WARMUP_BARS, LIVE_INDICATOR_WARMUP_PERIODS * max(periods, default=0))
+    start = int(np.searchsorted(df.index.asi8 // 10**6, ohlcv[0, 0]))
+    tail_start = max(0, start - warmup)
+    tail = build_chart_data_frame(merge_ohlcv(data_frame_to_ohlcv(df.iloc[tail_start:]), ohlcv, None), indicator_name, indicator_params, None)
+    return pd.concat([df.iloc[:start], tail.iloc[start - tail_start:]]).iloc[-max_bars:]
+
+def fetch_chart_frames(exchange, candle_cache, pair_symbol, timeframe, indicator_name, indicator_params, warm_start, display_bars, emit):
+    source = (exchange.id, pair_symbol, timeframe)
+    # Natychmiastowy start z dysku, potem dociągnięcie brakującego ogona z giełdy
+    if candle_cache is not None and warm_start:
+        cached = candle_cache.load(exchange.id, pair_symbol, timeframe)
+        if cached is not None and len(cached):
+            emit(build_chart_data_frame(cached, indicator_name, indicator_params, source=source))
+
+    ohlcv = fetch_ohlcv_cached(exchange, candle_cache, pair_symbol, timeframe, CHART_CANDLE_LIMIT)
+    if not len(ohlcv):
+        raise ccxt.NetworkError(f"Giełda nie zwróciła danych OHLCV dla {pair_symbol} na {timeframe}.")
+    emit(build_chart_data_frame(ohlcv, indicator_name, indicator_params, display_bars, source))
+
 class FetchChartDataThread(QThread):
     data_ready_signal = Signal(object, object)
     error_signal = Signal(str, object)
     finished_signal = Signal(object)
 
-    def __init__(self, exchange, pair_symbol, timeframe, indicator_name, indicator_params, chart_widget, parent=None):
+    def __init__(self, exchange, pair_symbol, timeframe, indicator_name, indicator_params, chart_widget, candle_cache=None, warm_start=True, display_bars=CHART_CANDLE_LIMIT, parent=None):
         super().__init__(parent)
         self.exchange = exchange
         self.pair_symbol = pair_symbol
@@ -147,40 +234,161 @@ class FetchChartDataThread(QThread):
         self.indicator_name = indicator_name
         self.indicator_params = indicator_params
         self.chart_widget = chart_widget
+        self.candle_cache = candle_cache
+        self.warm_start = warm_start
+        self.display_bars = display_bars
 
     def run(self):
         try:
-            ohlcv = self.exchange.fetch_ohlcv(self.pair_symbol, timeframe=self.timeframe, limit=300)
-            if not ohlcv:
-                raise ccxt.NetworkError(f"Giełda nie zwróciła danych OHLCV dla {self.pair_symbol} na {self.timeframe}.")
-
-            df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-            df.set_index('timestamp', inplace=True)
-
-            if self.indicator_name == "Williams %R":
-                wpr_p = self.indicator_params.get('wpr_period', DEFAULT_WPR_LENGTH)
-                ema_p = self.indicator_params.get('ema_period', DEFAULT_EMA_WPR_LENGTH)
-                wpr_col = f'WILLR_{wpr_p}'
-                df.ta.willr(length=wpr_p, append=True)
-                if wpr_col in df and df[wpr_col].notna().any():
-                    df[f'WPR_EMA_{ema_p}'] = ta.ema(df[wpr_col], length=ema_p)
-            elif self.indicator_name == "RSI":
-                rsi_p = self.indicator_params.get('rsi_period', DEFAULT_RSI_LENGTH)
-                df.ta.rsi(length=rsi_p, append=True)
-            elif self.indicator_name == "MACD":
-                fast_p = self.indicator_params.get('fast', DEFAULT_MACD_FAST)
-                slow_p = self.indicator_params.get('slow', DEFAULT_MACD_SLOW)
-                signal_p = self.indicator_params.get('signal', DEFAULT_MACD_SIGNAL)
-                df.ta.macd(fast=fast_p, slow=slow_p, signal=signal_p, append=True)
-
-            self.data_ready_signal.emit(df, self.chart_widget)
+            fetch_chart_frames(self.exchange, self.candle_cache, self.pair_symbol, self.timeframe, self.indicator_name, self.indicator_params,
+                               self.warm_start, self.display_bars, lambda df: self.data_ready_signal.emit(df, self.chart_widget))
         except Exception as e:
             error_message = f"Błąd w wątku pobierania danych dla {self.pair_symbol} ({self.timeframe}): {type(e).__name__} - {str(e)}"
             self.error_signal.emit(error_message, self.chart_widget)
         finally:
             self.finished_signal.emit(self.chart_widget)
 
+class FetchChartBatchThread(QThread):
+    """
+    Pobiera dane dla kilku wykresów po kolei na jednej instancji giełdy - limiter ccxt rozkłada zapytania
+    w czasie, zamiast kilku niezależnych wątków uderzających w API naraz (tryb wielu par).
+    """
+    data_ready_signal = Signal(object, object)
+    error_signal = Signal(str, object)
+    finished_signal = Signal(object)
+
+    def __init__(self, exchange, jobs, indicator_name, indicator_params, candle_cache=None, parent=None):
+        super().__init__(parent)
+        self.exchange = exchange
+        self.jobs = jobs  # lista (chart_widget, para, interwał, przyrostowo, liczba wyświetlanych świec)
+        self.indicator_name = indicator_name
+        self.indicator_params = indicator_params
+        self.candle_cache = candle_cache
+
+    def run(self):
+        for chart_widget, pair_symbol, timeframe, incremental, display_bars in self.jobs:
+            if self.isInterruptionRequested(): break
+            try:
+                fetch_chart_frames(self.exchange, self.candle_cache, pair_symbol, timeframe, self.indicator_name, self.indicator_params,
+                                   not incremental, display_bars, lambda df, cw=chart_widget: self.data_ready_signal.emit(df, cw))
+            except Exception as e:
+                self.error_signal.emit(f"Błąd pobierania danych dla {pair_symbol} ({timeframe}): {type(e).__name__} - {str(e)}", chart_widget)
+        self.finished_signal.emit(None)
+
+class FetchOlderHistoryThread(QThread):
+    """Dociąga starszą historię, gdy użytkownik przewinie wykres w lewo poza pierwszą świecę."""
+    data_ready_signal = Signal(object, object)
+    history_exhausted_signal = Signal(object)
+    error_signal = Signal(str, object)
+
+    def __init__(self, exchange, pair_symbol, timeframe, indicator_name, indicator_params, chart_widget, ohlcv, candle_cache=None, parent=None):
+        super().__init__(parent)
+        self.exchange = exchange
+        self.pair_symbol = pair_symbol
+        self.timeframe = timeframe
+        self.indicator_name = indicator_name
+        self.indicator_params = indicator_params
+        self.chart_widget = chart_widget
+        self.ohlcv = ohlcv
+        self.candle_cache = candle_cache
+
+    def run(self):
+        try:
+            first_ts = self.ohlcv[0, 0]
+            timeframe_ms = self.exchange.parse_timeframe(self.timeframe) * 1000
+            older = ohlcv_to_array(self.exchange.fetch_ohlcv(self.pair_symbol, timeframe=self.timeframe, since=int(first_ts - CHART_CANDLE_LIMIT * timeframe_ms), limit=CHART_CANDLE_LIMIT))
+            older = older[older[:, 0] < first_ts]
+            if not len(older):
+                self.history_exhausted_signal.emit(self.chart_widget); return
+            merged = np.concatenate([older, self.ohlcv])
+            if self.candle_cache is not None:
+                cached = self.candle_cache.load(self.exchange.id, self.pair_symbol, self.timeframe)
+                self.candle_cache.store(self.exchange.id, self.pair_symbol, self.timeframe, merge_ohlcv(cached, merged, self.candle_cache.max_bars))
+            self.data_ready_signal.emit(build_chart_data_frame(merged, self.indicator_name, self.indicator_params, None, (self.exchange.id, self.pair_symbol, self.timeframe)), self.chart_widget)
+        except Exception as e:
+            self.error_signal.emit(f"Błąd pobierania historii dla {self.pair_symbol} ({self.timeframe}): {type(e).__name__} - {str(e)}", self.chart_widget)
+
+class ChartPrefetchThread(QThread):
+    """Rozgrzewa cache świec dla kolejnych par z listy obserwowanych w limicie zapytań do API."""
+    def __init__(self, exchange, pairs, timeframes, candle_cache, request_budget, parent=None):
+        super().__init__(parent)
+        self.exchange = exchange
+        self.pairs = pairs
+        self.timeframes = timeframes
+        self.candle_cache = candle_cache
+        self.request_budget = request_budget
+
+    def run(self):
+        requests_made = 0
+        for pair_symbol in self.pairs:
+            for timeframe in self.timeframes:
+                if self.isInterruptionRequested() or requests_made >= self.request_budget: return
+                if self.is_cache_fresh(pair_symbol, timeframe): continue
+                requests_made += 1
+                try:
+                    fetch_ohlcv_cached(self.exchange, self.candle_cache, pair_symbol, timeframe, CHART_CANDLE_LIMIT)
+                except Exception as e:
+                    print(f"Prefetch {pair_symbol} ({timeframe}) nieudany: {type(e).__name__} - {str(e)}")
+
+    def is_cache_fresh(self, pair_symbol, timeframe):
+        cached = self.candle_cache.load(self.exchange.id, pair_symbol, timeframe)
+        if cached is None or not len(cached): return False
+        timeframe_ms = self.exchange.parse_timeframe(timeframe) * 1000
+        # Świeca formująca się teraz jest już w cache - wykres dociągnie ją przy otwarciu
+        return cached[-1, 0] + timeframe_ms > time.time() * 1000
+
+class LiveCandleStreamThread(QThread):
+    """Jedno połączenie ccxt.pro dla wszystkich subskrypcji watch_ohlcv (para, interwał) okna wykresów."""
+    candles_signal = Signal(str, str, object)
+    error_signal = Signal(str)
+
+    def __init__(self, exchange_id, market_type, subscriptions, parent=None):
+        super().__init__(parent)
+        self.exchange_id = exchange_id
+        self.market_type = market_type
+        self.subscriptions = subscriptions
+        # Flaga ustawiana przez stop() - także przed startem wątku, zanim powstanie pętla asyncio
+        self._stop_requested = False
+        self.loop = None
+        self.main_task = None
+
+    def run(self):
+        if self._stop_requested: return
+        try:
+            asyncio.run(self.main_loop())
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            self.error_signal.emit(f"Błąd krytyczny streamu świec: {type(e).__name__} - {str(e)}")
+
+    async def main_loop(self):
+        self.loop = asyncio.get_running_loop()
+        self.main_task = asyncio.current_task()
+        # stop() wywołany przed ustawieniem main_task nie mógł go anulować - sprawdzenie flagi po ustawieniu
+        if self._stop_requested: return
+        exchange = getattr(ccxtpro, self.exchange_id)({'enableRateLimit': True, 'options': {'defaultType': self.market_type} if self.market_type in ['future', 'swap'] else {}})
+        try:
+            await asyncio.gather(*[self.watch_candles(exchange, symbol, timeframe) for symbol, timeframe in self.subscriptions])
+        finally:
+            await exchange.close()
+
+    async def watch_candles(self, exchange, symbol, timeframe):
+        while not self._stop_requested:
+            try:
+                ohlcv = await exchange.watch_ohlcv(symbol, timeframe)
+                if not self._stop_requested and ohlcv:
+                    self.candles_signal.emit(symbol, timeframe, ohlcv_to_array(ohlcv))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.error_signal.emit(f"Błąd streamu {symbol} ({timeframe}): {type(e).__name__} - {str(e)}")
+                await asyncio.sleep(5)
+
+    def stop(self):
+        self._stop_requested = True
+        if self.loop and self.main_task and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.main_task.cancel)
+
 class MeasurablePlotItem(pg.PlotItem):
     sigMeasureStart = Signal(object)
     sigMeasureUpdate = Signal(object)
@@ -214,6 +422,7 @@ class MeasurablePlotItem(pg.PlotItem):
 class SingleChartWidget(QWidget):
     mouse_moved_signal = Signal(float)
     sigDoubleClicked = Signal()
+    sigHistoryRequested = Signal(object)
 
     def __init__(self, chart_id, parent=None):
         super().__init__(parent)
@@ -230,7 +439,7 @@ class SingleChartWidget(QWidget):
         self.chart_title_label.setFont(font)
 
         self.timeframe_combo = QComboBox()
-        self.timeframe_combo.addItems(['1m', '5m', '15m', '1h', '4h', '12h', '1d', '1w'])
+        self.timeframe_combo.addItems(CHART_TIMEFRAMES)
         top_layout.addWidget(self.chart_title_label)
         top_layout.addStretch()
         top_layout.addWidget(QLabel("Interwał:"))
@@ -251,6 +460,14 @@ class SingleChartWidget(QWidget):
         self.data_frame = None
         self.current_indicator_name = ""
         self.pair_name = ""
+        self.data_key = None
+        self.indicator_items = {}
+        self.indicator_plot_name = None
+        self.history_loading = False
+        self.history_exhausted = False
+        self.stale = False  # pominięty przy odświeżaniu, bo był ukryty
+        self.crosshair_x = None
+        self.indicator_arrays = {}  # kolumna wskaźnika -> tablica numpy, do odczytów pod kursorem
 
         self.candlestick_item = CandlestickItem()
         self.plot_widget.addItem(self.candlestick_item)
@@ -277,6 +494,7 @@ class SingleChartWidget(QWidget):
         self.plot_item_price.sigMeasureStart.connect(self.measure_start)
         self.plot_item_price.sigMeasureUpdate.connect(self.measure_update)
         self.plot_item_price.sigMeasureEnd.connect(self.measure_end)
+        self.plot_item_price.vb.sigXRangeChanged.connect(self.on_x_range_changed)
 
     def eventFilter(self, watched_object, event):
         if event.type() == QEvent.Type.Leave:
@@ -297,7 +515,7 @@ class SingleChartWidget(QWidget):
             self.mouse_moved_signal.emit(x_val)
 
             date_str = datetime.datetime.fromtimestamp(x_val).strftime('%Y-%m-%d %H:%M:%S')
-            self.chart_title_label.setText(f"<b>{self.pair_name}</b> | Data: {date_str} | Cena: {y_val:.4f}")
+            self.chart_title_label.setText(f"<b>{self.pair_name}</b> | Data: {date_str} | Cena: {y_val:.4f}{self.candle_readout(x_val)}")
         else:
             self.mouse_left()
 
@@ -307,23 +525,44 @@ class SingleChartWidget(QWidget):
         self.v_line_indicator.hide()
         self.chart_title_label.setText(f"<b>{self.pair_name}</b>")
 
+    def nearest_candle_index(self, x_val):
+        # Wyszukiwanie binarne po posortowanych czasach świec
+        x = self.candlestick_item.x
+        if not len(x): return None
+        i = int(np.searchsorted(x, x_val))
+        if i >= len(x): return len(x) - 1
+        if i > 0 and x_val - x[i - 1] < x[i] - x_val: return i - 1
+        return i
+
     def update_v_line(self, x_pos):
+        idx = self.nearest_candle_index(x_pos)
+        if idx is not None: x_pos = self.candlestick_item.x[idx]
+        if x_pos == self.crosshair_x and self.v_line.isVisible(): return
+        self.crosshair_x = x_pos
         self.v_line.setPos(x_pos); self.v_line.show()
         self.v_line_indicator.setPos(x_pos); self.v_line_indicator.show()
 
+    def candle_readout(self, x_val):
+        idx = self.nearest_candle_index(x_val)
+        if idx is None: return ""
+        item = self.candlestick_item
+        text = f" | O: {item.open[idx]:.4f} H: {item.high[idx]:.4f} L: {item.low[idx]:.4f} C: {item.close[idx]:.4f}"
+        for column, values in self.indicator_arrays.items():
+            if idx < len(values) and not np.isnan(values[idx]): text += f" | {column}: {values[idx]:.2f}"
+        return text
+
     def get_snapped_pos(self, pos):
-        if self.data_frame is None or self.data_frame.empty: return pos
-        try:
-            nearest_idx = self.data_frame.index.get_indexer([pd.to_datetime(pos.x(), unit='s')], method='nearest')[0]
-            nearest_candle = self.data_frame.iloc[nearest_idx]
-        except (IndexError, KeyError): return pos
-        snapped_x = nearest_candle.name.timestamp(); mouse_y, candle_high, candle_low = pos.y(), nearest_candle['high'], nearest_candle['low']
+        idx = self.nearest_candle_index(pos.x())
+        if idx is None: return pos
+        item = self.candlestick_item
+        snapped_x = item.x[idx]; mouse_y, candle_high, candle_low = pos.y(), item.high[idx], item.low[idx]
+        candle_open, candle_close = item.open[idx], item.close[idx]
         visible_y_range = self.plot_widget.getPlotItem().vb.viewRange()[1]; snap_threshold = (visible_y_range[1] - visible_y_range[0]) * 0.05
         dist_to_high, dist_to_low = abs(mouse_y - candle_high), abs(mouse_y - candle_low); snapped_y = mouse_y
         if dist_to_high < snap_threshold and dist_to_high < dist_to_low: snapped_y = candle_high
         elif dist_to_low < snap_threshold and dist_to_low < dist_to_high: snapped_y = candle_low
-        elif abs(mouse_y - nearest_candle['open']) < snap_threshold and abs(mouse_y - nearest_candle['open']) < min(dist_to_high, dist_to_low): snapped_y = nearest_candle['open']
-        elif abs(mouse_y - nearest_candle['close']) < snap_threshold and abs(mouse_y - nearest_candle['close']) < min(dist_to_high, dist_to_low): snapped_y = nearest_candle['close']
+        elif abs(mouse_y - candle_open) < snap_threshold and abs(mouse_y - candle_open) < min(dist_to_high, dist_to_low): snapped_y = candle_open
+        elif abs(mouse_y - candle_close) < snap_threshold and abs(mouse_y - candle_close) < min(dist_to_high, dist_to_low): snapped_y = candle_close
         return QPointF(snapped_x, snapped_y)
 
     def measure_start(self, pos):
@@ -336,81 +575,153 @@ class SingleChartWidget(QWidget):
         dx = snapped_pos.x() - self.start_measure_pos.x(); dy = snapped_pos.y() - self.start_measure_pos.y()
         percent_change = (dy / self.start_measure_pos.y()) * 100 if self.start_measure_pos.y() != 0 else 0
         time_diff = datetime.timedelta(seconds=int(dx)); bar_count = 0
-        if self.data_frame is not None and not self.data_frame.empty:
-            try:
-                start_idx = self.data_frame.index.get_indexer([pd.to_datetime(self.start_measure_pos.x(), unit='s')], method='nearest')[0]
-                end_idx = self.data_frame.index.get_indexer([pd.to_datetime(snapped_pos.x(), unit='s')], method='nearest')[0]
-                bar_count = abs(end_idx - start_idx)
-            except Exception: pass
+        start_idx, end_idx = self.nearest_candle_index(self.start_measure_pos.x()), self.nearest_candle_index(snapped_pos.x())
+        if start_idx is not None and end_idx is not None: bar_count = abs(end_idx - start_idx)
         text = f"Δ Cena: {dy:,.4f}\nΔ Procent: {percent_change:.2f}%\nCzas: {str(time_diff)}\nŚwiece: {bar_count}"
         self.measure_text.setText(text); self.measure_text.setPos(snapped_pos)
     def measure_end(self, pos):
         self.start_measure_pos = None; self.measure_line.setData([], []); self.measure_text.setVisible(False)
 
-    def update_chart_and_indicator(self, df, indicator_name, pair_name):
+    def update_chart_and_indicator(self, df, indicator_name, pair_name, data_key=None, incremental=False):
+        # Ścieżka przyrostowa: te same dane (para/interwał/wskaźnik) - aktualizacja w miejscu z zachowaniem widoku
+        incremental = (incremental and data_key is not None and data_key == self.data_key and not df.empty
+                       and self.data_frame is not None and not self.data_frame.empty)
+        previous_last_x = self.candlestick_item.x[-1] if len(self.candlestick_item.x) else None
+
         self.data_frame = df
         self.current_indicator_name = indicator_name
         self.pair_name = pair_name
-        self.chart_title_label.setText(f"<b>{self.pair_name}</b>")
+        self.data_key = data_key
+        self.stale = False
 
-        if not df.empty:
-            candlestick_data = []
-            for d_idx, row in df.iterrows():
-                timestamp = d_idx.timestamp()
-                candlestick_data.append({'x': timestamp, 'open': row['open'], 'high': row['high'], 'low': row['low'], 'close': row['close']})
-            self.candlestick_item.setData(candlestick_data)
-        else:
-            self.candlestick_item.setData([])
+        timestamps = df.index.asi8 / 10**9
+        self.candlestick_item.setData(timestamps, df['open'].to_numpy(), df['high'].to_numpy(), df['low'].to_numpy(), df['close'].to_numpy())
 
+        if incremental:
+            self.update_indicator_data()
+            self.follow_last_candle(previous_last_x)
+            return
+
+        self.history_exhausted = False
+        self.chart_title_label.setText(f"<b>{self.pair_name}</b>")
         self.redraw_indicator()
         self.plot_widget.autoRange()
         self.indicator_widget.autoRange()
         self.mouse_left()
 
-    def redraw_indicator(self):
+    def on_x_range_changed(self, view_box, x_range):
+        # Przewinięcie w lewo poza początek danych - poproś o starszą historię
+        if self.history_loading or self.history_exhausted or not len(self.candlestick_item.x): return
+        if len(self.candlestick_item.x) >= CHART_MAX_HISTORY_BARS: return
+        x_min, x_max = x_range
+        # margines większy niż padding autoRange, żeby pełne przerysowanie nie wywoływało pobierania
+        if x_min < self.candlestick_item.x[0] - (x_max - x_min) * 0.05:
+            self.sigHistoryRequested.emit(self)
+
+    def follow_last_candle(self, previous_last_x):
+        # Jeśli użytkownik patrzył na ostatnią świecę, przesuń widok o nowe świece, nie zmieniając powiększenia
+        new_last_x = self.candlestick_item.x[-1]
+        if previous_last_x is None or new_last_x <= previous_last_x: return
+        (x_min, x_max), _ = self.plot_item_price.vb.viewRange()
+        if x_max >= previous_last_x:
+            shift = new_last_x - previous_last_x
+            self.plot_item_price.vb.setXRange(x_min + shift, x_max + shift, padding=0)
+
+    def build_indicator_items(self, indicator_name):
+        # Elementy wykresu tworzone raz na zmianę wskaźnika; kolejne odświeżenia tylko podmieniają dane
         self.indicator_widget.clear(); self.indicator_widget.addItem(self.v_line_indicator, ignoreBounds=True)
+        self.indicator_items = {}
+        self.indicator_plot_name = indicator_name
+        indicator = get_indicator(indicator_name)
+        spec = indicator.plot if indicator else {}
+        for prefix, pen, name in spec.get('curves', []):
+            self.indicator_items[prefix] = self.indicator_widget.plot(pen=pg.mkPen(**pen) if isinstance(pen, dict) else pen, name=name)
+        histogram_prefix = spec.get('histogram')
+        if histogram_prefix:
+            # Dwa histogramy o stałym kolorze zamiast listy pędzli dla każdego słupka
+            empty = np.zeros(0)
+            up_item = pg.BarGraphItem(x=empty, height=empty, width=1, brush=HISTOGRAM_UP_BRUSH, pen=pg.mkPen(None))
+            down_item = pg.BarGraphItem(x=empty, height=empty, width=1, brush=HISTOGRAM_DOWN_BRUSH, pen=pg.mkPen(None))
+            self.indicator_widget.addItem(up_item); self.indicator_widget.addItem(down_item)
+            self.indicator_items[histogram_prefix] = (up_item, down_item)
+        for level, color in spec.get('levels', []):
+            self.indicator_widget.addLine(y=level, pen=pg.mkPen(color, style=Qt.PenStyle.DashLine))
+
+    def update_indicator_data(self):
+        if self.indicator_plot_name != self.current_indicator_name: self.build_indicator_items(self.current_indicator_name)
+        self.indicator_arrays = {}
         if self.data_frame is None or self.data_frame.empty: return
-        indicator_name = self.current_indicator_name; timestamps = self.data_frame.index.astype('int64') // 10**9
-        if indicator_name == "Williams %R":
-            wpr_col = next((c for c in self.data_frame if c.startswith('WILLR_')), None); ema_col = next((c for c in self.data_frame if c.startswith('WPR_EMA_')), None)
-            if wpr_col is not None: self.indicator_widget.plot(x=timestamps, y=self.data_frame[wpr_col], pen='b', name="W%R")
-            if ema_col is not None: self.indicator_widget.plot(x=timestamps, y=self.data_frame[ema_col], pen=pg.mkPen('orange', width=2), name="EMA on W%R")
-            self.indicator_widget.addLine(y=-20, pen=pg.mkPen('r', style=Qt.PenStyle.DashLine)); self.indicator_widget.addLine(y=-80, pen=pg.mkPen('g', style=Qt.PenStyle.DashLine))
-        elif indicator_name == "RSI":
-            rsi_col = next((c for c in self.data_frame if c.startswith('RSI_')), None)
-            if rsi_col is not None: self.indicator_widget.plot(x=timestamps, y=self.data_frame[rsi_col], pen='g', name="RSI"); self.indicator_widget.addLine(y=70, pen=pg.mkPen('r', style=Qt.PenStyle.DashLine)); self.indicator_widget.addLine(y=30, pen=pg.mkPen('g', style=Qt.PenStyle.DashLine))
-        elif indicator_name == "MACD":
-            macd_col = next((c for c in self.data_frame if c.startswith('MACD_')), None); macdh_col = next((c for c in self.data_frame if c.startswith('MACDh_')), None); macds_col = next((c for c in self.data_frame if c.startswith('MACDs_')), None)
-            if all([macd_col, macdh_col, macds_col]):
-                self.indicator_widget.plot(x=timestamps, y=self.data_frame[macd_col], pen='b', name='MACD'); self.indicator_widget.plot(x=timestamps, y=self.data_frame[macds_col], pen='r', name='Signal')
-                brushes = ['g' if v > 0 else 'r' for v in self.data_frame[macdh_col]]; width = 0.8 * (timestamps[1] - timestamps[0] if len(timestamps) > 1 else 1)
-                self.indicator_widget.addItem(pg.BarGraphItem(x=timestamps, height=self.data_frame[macdh_col], width=width, brushes=brushes))
-        self.indicator_widget.autoRange()
+        timestamps = self.data_frame.index.asi8 // 10**9
+        for prefix, item in self.indicator_items.items():
+            column = next((c for c in self.data_frame if c.startswith(prefix)), None)
+            values = self.data_frame[column].to_numpy() if column is not None else None
+            if values is not None: self.indicator_arrays[column] = values
+            if isinstance(item, tuple):
+                up_item, down_item = item
+                x = timestamps if values is not None else np.zeros(0)
+                if values is None: values = np.zeros(0)
+                width = 0.8 * (timestamps[1] - timestamps[0] if len(timestamps) > 1 else 1)
+                rising = values > 0
+                up_item.setOpts(x=x, height=np.where(rising, values, 0.0), width=width)
+                down_item.setOpts(x=x, height=np.where(rising, 0.0, values), width=width)
+            elif values is None: item.setData([], [])
+            else: item.setData(x=timestamps, y=values)
+
+    def redraw_indicator(self, auto_range=True):
+        self.update_indicator_data()
+        if auto_range: self.indicator_widget.autoRange()
 
 class MultiChartWindow(QMainWindow):
     def __init__(self, exchange_options, config_path, parent=None):
         super().__init__(parent)
         self.exchange_options = exchange_options
         self.config_path = config_path
+        self.config_service = get_config_service(config_path)
+        self.config_service.save_failed.connect(lambda msg: self.statusBar().showMessage(f"Błąd zapisu ustawień wykresów: {msg}", 10000))
+        self.loading_settings = False
         self.setWindowTitle("Okno Analizy Wykresów")
         self.setGeometry(150, 150, 1400, 800)
         self.maximized_chart = None
+        self.saved_chart_timeframes = {}  # indeks wykresu -> interwał, także dla wykresów jeszcze nieutworzonych
         self.current_pair = ""
         self.is_loading = False
+        self.candle_cache = CandleCache(os.path.join(os.path.dirname(self.config_path), CANDLE_CACHE_DIR_NAME), parent=self)
+        self.candle_cache.write_failed.connect(self.on_candle_cache_write_failed)
 
         self.refresh_timer = QTimer(self)
-        self.refresh_timer.timeout.connect(self.trigger_chart_updates)
+        self.refresh_timer.timeout.connect(self.refresh_charts_incrementally)
 
+        self.chart_pairs = {}  # tryb wielu par: chart_id -> para
         self.setup_ui() # Call to setup UI elements
         self.fetch_markets_thread = None
         self.chart_data_threads = {}
+        self.history_threads = {}
+        self.cross_pair_index = 0
+        self.prefetch_thread = None
+        self.recent_pairs = deque(maxlen=PREFETCH_RECENT_PAIRS)
+        self.live_stream_thread = None
+        self.retired_threads = set()   # zatrzymywane wątki - referencja do końca ich pracy
+        self.pending_live_candles = {}
+        self.live_repaint_timer = QTimer(self)
+        self.live_repaint_timer.setInterval(1000 // LIVE_REPAINT_FPS)
+        self.live_repaint_timer.timeout.connect(self.apply_live_candles)
+        self.crosshair_x = None
+        self.crosshair_timer = QTimer(self)
+        self.crosshair_timer.setSingleShot(True)
+        self.crosshair_timer.setInterval(1000 // CROSSHAIR_FPS)
+        self.crosshair_timer.timeout.connect(self.apply_crosshair)
 
         # Load settings and trigger initial market fetch after UI setup
         self.load_settings()
         self.on_global_indicator_changed() # Ensure indicator parameters are correctly set up
+        self.update_chart_mode_controls()
         self.trigger_fetch_markets()
 
     # --- Methods for getting indicator parameters and exchange configuration ---
+    def get_exchange_id(self):
+        selected_config = self.exchange_options.get(self.chart_exchange_combo.currentText())
+        return selected_config["id_ccxt"] if selected_config else None
+
     def get_exchange(self):
         selected_exchange_gui = self.chart_exchange_combo.currentText()
         selected_config = self.exchange_options.get(selected_exchange_gui)
@@ -420,8 +731,7 @@ class MultiChartWindow(QMainWindow):
 
         ccxt_id, market_type = selected_config["id_ccxt"], selected_config["type"]
 
-        config = configparser.ConfigParser()
-        config.read(self.config_path)
+        config = self.config_service.config
 
         api_key, api_secret = '', ''
         config_section_name = selected_config.get("config_section")
@@ -447,18 +757,8 @@ class MultiChartWindow(QMainWindow):
         return self.global_indicator_combo.currentText()
 
     def get_indicator_params(self):
-        indicator_name = self.get_indicator_name()
-        params = {}
-        if indicator_name == "Williams %R":
-            params['wpr_period'] = self.wpr_period_spin.value()
-            params['ema_period'] = self.ema_period_spin.value()
-        elif indicator_name == "RSI":
-            params['rsi_period'] = self.rsi_period_spin.value()
-        elif indicator_name == "MACD":
-            params['fast'] = self.macd_fast_spin.value()
-            params['slow'] = self.macd_slow_spin.value()
-            params['signal'] = self.macd_signal_spin.value()
-        return params
+        spins = self.indicator_param_spins.get(self.get_indicator_name(), {})
+        return {key: spin.value() for key, spin in spins.items()}
 
     # --- Refactored UI Setup Methods ---
     def setup_ui(self):
@@ -488,38 +788,50 @@ class MultiChartWindow(QMainWindow):
         indicator_group = QGroupBox("Globalny Wskaźnik")
         indicator_layout = QFormLayout()
         self.global_indicator_combo = QComboBox()
-        self.global_indicator_combo.addItems(["Williams %R", "RSI", "MACD"])
+        self.global_indicator_combo.addItems(indicator_names())
         indicator_layout.addRow("Wskaźnik:", self.global_indicator_combo)
         self.params_stacked_widget = QStackedWidget()
 
-        # WPR Params
-        wpr_params_widget = QWidget()
-        wpr_layout = QFormLayout(wpr_params_widget)
-        wpr_layout.setContentsMargins(0,0,0,0)
-        self.wpr_period_spin = QSpinBox(); self.wpr_period_spin.setRange(1,200); wpr_layout.addRow("Okres W%R:", self.wpr_period_spin)
-        self.ema_period_spin = QSpinBox(); self.ema_period_spin.setRange(1,200); wpr_layout.addRow("Okres EMA:", self.ema_period_spin)
-        self.params_stacked_widget.addWidget(wpr_params_widget)
-
-        # RSI Params
-        rsi_params_widget = QWidget()
-        rsi_layout = QFormLayout(rsi_params_widget)
-        rsi_layout.setContentsMargins(0,0,0,0)
-        self.rsi_period_spin = QSpinBox(); self.rsi_period_spin.setRange(1,200); rsi_layout.addRow("Okres RSI:", self.rsi_period_spin)
-        self.params_stacked_widget.addWidget(rsi_params_widget)
-
-        # MACD Params
-        macd_params_widget = QWidget()
-        macd_layout = QFormLayout(macd_params_widget)
-        macd_layout.setContentsMargins(0,0,0,0)
-        self.macd_fast_spin = QSpinBox(); self.macd_fast_spin.setRange(1,200); macd_layout.addRow("Okres Fast:", self.macd_fast_spin)
-        self.macd_slow_spin = QSpinBox(); self.macd_slow_spin.setRange(1,200); macd_layout.addRow("Okres Slow:", self.macd_slow_spin)
-        self.macd_signal_spin = QSpinBox(); self.macd_signal_spin.setRange(1,200); macd_layout.addRow("Okres Signal:", self.macd_signal_spin)
-        self.params_stacked_widget.addWidget(macd_params_widget)
+        # Pola parametrów generowane ze schematu każdego wskaźnika z rejestru
+        self.indicator_param_spins = {}
+        for name in indicator_names():
+            params_widget = QWidget()
+            params_layout = QFormLayout(params_widget)
+            params_layout.setContentsMargins(0,0,0,0)
+            spins = {}
+            for param in get_indicator(name).params:
+                spin = QSpinBox(); spin.setRange(param.minimum, param.maximum); spin.setValue(param.default)
+                params_layout.addRow(param.label, spin)
+                spins[param.key] = spin
+            self.indicator_param_spins[name] = spins
+            self.params_stacked_widget.addWidget(params_widget)
 
         indicator_layout.addRow(self.params_stacked_widget)
         indicator_group.setLayout(indicator_layout)
         self.sidebar_layout.addWidget(indicator_group)
 
+        # Chart Mode Group
+        mode_group = QGroupBox("Tryb wykresów")
+        mode_layout = QFormLayout(mode_group)
+        self.chart_mode_combo = QComboBox()
+        self.chart_mode_combo.addItems([CHART_MODE_TIMEFRAMES, CHART_MODE_PAIRS])
+        self.cross_pair_timeframe_combo = QComboBox()
+        self.cross_pair_timeframe_combo.addItems(CHART_TIMEFRAMES)
+        self.cross_pair_timeframe_combo.setCurrentText('1h')
+        self.cross_pair_batch_spinbox = QSpinBox()
+        self.cross_pair_batch_spinbox.setRange(1, 16)
+        self.cross_pair_batch_spinbox.setValue(DEFAULT_CROSS_PAIR_BATCH)
+        self.cross_pair_batch_spinbox.setToolTip("Ile wykresów jest odświeżanych w jednej turze; tury rozkładane są równomiernie na interwał auto-odświeżania")
+        mode_layout.addRow(self.chart_mode_combo)
+        mode_layout.addRow("Interwał par:", self.cross_pair_timeframe_combo)
+        mode_layout.addRow("Wykresów na turę:", self.cross_pair_batch_spinbox)
+        grid_size_layout = QHBoxLayout()
+        self.grid_rows_spinbox = QSpinBox(); self.grid_rows_spinbox.setRange(1, MAX_GRID_SIZE); self.grid_rows_spinbox.setValue(DEFAULT_GRID_ROWS)
+        self.grid_columns_spinbox = QSpinBox(); self.grid_columns_spinbox.setRange(1, MAX_GRID_SIZE); self.grid_columns_spinbox.setValue(DEFAULT_GRID_COLUMNS)
+        grid_size_layout.addWidget(self.grid_rows_spinbox); grid_size_layout.addWidget(QLabel("×")); grid_size_layout.addWidget(self.grid_columns_spinbox)
+        mode_layout.addRow("Siatka (wiersze × kolumny):", grid_size_layout)
+        self.sidebar_layout.addWidget(mode_group)
+
         # Pairs Management Group
         self.pairs_group = QGroupBox("Zarządzanie Listą Par")
         pairs_layout = QVBoxLayout()
@@ -560,10 +872,23 @@ class MultiChartWindow(QMainWindow):
         self.refresh_interval_spinbox.setRange(1, 120)
         self.refresh_interval_spinbox.setValue(DEFAULT_REFRESH_MINUTES)
         self.refresh_interval_spinbox.setSuffix(" min")
+        self.live_stream_checkbox = QCheckBox("Świece na żywo (WebSocket)")
         refresh_layout.addRow(self.auto_refresh_checkbox)
         refresh_layout.addRow("Interwał:", self.refresh_interval_spinbox)
+        refresh_layout.addRow(self.live_stream_checkbox)
         self.sidebar_layout.addWidget(refresh_group)
 
+        # Prefetch Group
+        prefetch_group = QGroupBox("Wstępne ładowanie par")
+        prefetch_layout = QFormLayout(prefetch_group)
+        self.prefetch_budget_spinbox = QSpinBox()
+        self.prefetch_budget_spinbox.setRange(0, 120)
+        self.prefetch_budget_spinbox.setValue(DEFAULT_PREFETCH_BUDGET)
+        self.prefetch_budget_spinbox.setSuffix(" zapytań")
+        self.prefetch_budget_spinbox.setToolTip("Maksymalna liczba zapytań do API na rozgrzanie cache sąsiednich i ostatnio oglądanych par (0 = wyłączone)")
+        prefetch_layout.addRow("Budżet API:", self.prefetch_budget_spinbox)
+        self.sidebar_layout.addWidget(prefetch_group)
+
         self.load_charts_button = QPushButton("Wczytaj Wykresy dla wybranej pary")
         self.sidebar_layout.addWidget(self.load_charts_button)
 
@@ -572,12 +897,22 @@ class MultiChartWindow(QMainWindow):
 
         # Connect signals for sidebar controls
         self.auto_refresh_checkbox.stateChanged.connect(self.toggle_auto_refresh)
+        self.live_stream_checkbox.stateChanged.connect(self.toggle_live_stream)
+        self.live_stream_checkbox.stateChanged.connect(self.save_settings)
         self.refresh_interval_spinbox.valueChanged.connect(self.update_refresh_interval)
+        self.prefetch_budget_spinbox.valueChanged.connect(self.save_settings)
         self.load_charts_button.clicked.connect(self.trigger_chart_updates)
+        self.chart_mode_combo.currentTextChanged.connect(self.on_chart_mode_changed)
+        self.cross_pair_timeframe_combo.currentTextChanged.connect(self.save_settings)
+        self.cross_pair_batch_spinbox.valueChanged.connect(self.update_refresh_interval)
+        self.cross_pair_batch_spinbox.valueChanged.connect(self.save_settings)
+        self.grid_rows_spinbox.valueChanged.connect(self.on_grid_size_changed)
+        self.grid_columns_spinbox.valueChanged.connect(self.on_grid_size_changed)
         self.global_indicator_combo.currentTextChanged.connect(self.on_global_indicator_changed)
         self.global_indicator_combo.currentTextChanged.connect(self.save_settings)
-        for spinbox in [self.wpr_period_spin, self.ema_period_spin, self.rsi_period_spin, self.macd_fast_spin, self.macd_slow_spin, self.macd_signal_spin]:
-            spinbox.valueChanged.connect(self.save_settings)
+        for spins in self.indicator_param_spins.values():
+            for spinbox in spins.values():
+                spinbox.valueChanged.connect(self.save_settings)
         self.add_pair_button.clicked.connect(self.add_to_watchlist)
         self.remove_pair_button.clicked.connect(self.remove_from_watchlist)
         self.add_all_pairs_button.clicked.connect(self.add_all_to_watchlist)
@@ -587,58 +922,96 @@ class MultiChartWindow(QMainWindow):
         self.charts_area_widget = QWidget()
         self.charts_grid_layout = QGridLayout(self.charts_area_widget)
         self.charts = []
-        for idx, (i, j) in enumerate([(i, j) for i in range(2) for j in range(3)]):
-            chart_widget = SingleChartWidget(chart_id=idx)
-            chart_widget.timeframe_combo.currentTextChanged.connect(self.save_settings)
-            chart_widget.mouse_moved_signal.connect(self.sync_crosshairs)
-            chart_widget.sigDoubleClicked.connect(lambda cw=chart_widget: self.toggle_maximize_chart(cw))
-            self.charts_grid_layout.addWidget(chart_widget, i, j)
-            self.charts.append(chart_widget)
+        self.rebuild_charts_grid(self.grid_rows_spinbox.value(), self.grid_columns_spinbox.value())
         self.main_layout.addWidget(self.charts_area_widget, 1)
 
+    def create_chart_widget(self, idx):
+        chart_widget = SingleChartWidget(chart_id=idx)
+        chart_widget.timeframe_combo.setCurrentText(self.saved_chart_timeframes.get(idx, '1h'))
+        chart_widget.timeframe_combo.currentTextChanged.connect(self.save_settings)
+        chart_widget.mouse_moved_signal.connect(self.sync_crosshairs)
+        chart_widget.sigDoubleClicked.connect(lambda cw=chart_widget: self.toggle_maximize_chart(cw))
+        chart_widget.sigHistoryRequested.connect(self.load_older_history)
+        return chart_widget
+
+    def rebuild_charts_grid(self, rows, columns):
+        # Wykresy tworzone są dopiero, gdy mieszczą się w siatce; nadmiarowe są usuwane, a nie ukrywane
+        if self.maximized_chart is not None: self.toggle_maximize_chart(self.maximized_chart)
+        count = rows * columns
+        for chart in self.charts: self.charts_grid_layout.removeWidget(chart)
+        while len(self.charts) > count:
+            chart = self.charts.pop()
+            self.chart_pairs.pop(chart.chart_id, None)
+            chart.setParent(None); chart.deleteLater()
+        for idx in range(len(self.charts), count):
+            self.charts.append(self.create_chart_widget(idx))
+        for idx, chart in enumerate(self.charts):
+            self.charts_grid_layout.addWidget(chart, idx // columns, idx % columns)
+            chart.show()
+
+    def on_grid_size_changed(self, _=None):
+        previous_count = len(self.charts)
+        self.rebuild_charts_grid(self.grid_rows_spinbox.value(), self.grid_columns_spinbox.value())
+        self.update_chart_mode_controls()
+        if len(self.charts) > previous_count and self.current_pair:
+            if self.is_cross_pair_mode(): self.assign_cross_pairs()
+            self.refresh_stale_charts()
+        self.save_settings()
+
     # --- Refactored Settings (Load/Save) Methods ---
     def load_settings(self):
-        config = configparser.ConfigParser()
-        if not os.path.exists(self.config_path):
-            self._load_default_chart_settings()
-            return
-
-        config.read(self.config_path)
-        self._load_chart_indicator_settings(config)
-        self._load_auto_refresh_settings(config)
-        self._load_watchlist_settings(config)
-        self._load_chart_timeframe_settings(config)
+        # Sygnały kontrolek wywołują save_settings - podczas wczytywania nie mogą nadpisać jeszcze nieodczytanych wartości
+        self.loading_settings = True
+        try:
+            if not self.config_service.file_exists:
+                self._load_default_chart_settings()
+                return
+            config = self.config_service.config
+            self._load_chart_indicator_settings(config)
+            self._load_auto_refresh_settings(config)
+            self._load_prefetch_settings(config)
+            self._load_watchlist_settings(config)
+            self._load_chart_mode_settings(config)
+            self._load_chart_timeframe_settings(config)
+        finally:
+            self.loading_settings = False
 
     def _load_default_chart_settings(self):
         """Loads default chart settings if config file is not found."""
-        self.wpr_period_spin.setValue(DEFAULT_WPR_LENGTH)
-        self.ema_period_spin.setValue(DEFAULT_EMA_WPR_LENGTH)
-        self.rsi_period_spin.setValue(DEFAULT_RSI_LENGTH)
-        self.macd_fast_spin.setValue(DEFAULT_MACD_FAST)
-        self.macd_slow_spin.setValue(DEFAULT_MACD_SLOW)
-        self.macd_signal_spin.setValue(DEFAULT_MACD_SIGNAL)
+        for name, spins in self.indicator_param_spins.items():
+            for param in get_indicator(name).params:
+                spins[param.key].setValue(param.default)
         self.refresh_interval_spinbox.setValue(DEFAULT_REFRESH_MINUTES)
         self.auto_refresh_checkbox.setChecked(False)
+        self.live_stream_checkbox.setChecked(False)
+        self.prefetch_budget_spinbox.setValue(DEFAULT_PREFETCH_BUDGET)
         self.watchlist_widget.clear()
         for chart_widget in self.charts:
             chart_widget.timeframe_combo.setCurrentText('1h') # Default timeframe for charts
+        self.chart_mode_combo.setCurrentText(CHART_MODE_TIMEFRAMES)
+        self.cross_pair_timeframe_combo.setCurrentText('1h')
+        self.cross_pair_batch_spinbox.setValue(DEFAULT_CROSS_PAIR_BATCH)
+        self.grid_rows_spinbox.setValue(DEFAULT_GRID_ROWS)
+        self.grid_columns_spinbox.setValue(DEFAULT_GRID_COLUMNS)
 
     def _load_chart_indicator_settings(self, config):
         if config.has_section('chart_indicator_settings'):
             settings = config['chart_indicator_settings']
             self.global_indicator_combo.setCurrentText(settings.get('indicator_type', 'Williams %R').replace('%%', '%'))
-            self.wpr_period_spin.setValue(settings.getint('wpr_period', DEFAULT_WPR_LENGTH))
-            self.ema_period_spin.setValue(settings.getint('ema_period', DEFAULT_EMA_WPR_LENGTH))
-            self.rsi_period_spin.setValue(settings.getint('rsi_period', DEFAULT_RSI_LENGTH))
-            self.macd_fast_spin.setValue(settings.getint('macd_fast', DEFAULT_MACD_FAST))
-            self.macd_slow_spin.setValue(settings.getint('macd_slow', DEFAULT_MACD_SLOW))
-            self.macd_signal_spin.setValue(settings.getint('macd_signal', DEFAULT_MACD_SIGNAL))
+            for name, spins in self.indicator_param_spins.items():
+                for param in get_indicator(name).params:
+                    spins[param.key].setValue(settings.getint(param.config_key, param.default))
 
     def _load_auto_refresh_settings(self, config):
         if config.has_section('auto_refresh_settings'):
             refresh_settings = config['auto_refresh_settings']
             self.auto_refresh_checkbox.setChecked(refresh_settings.getboolean('enabled', False))
             self.refresh_interval_spinbox.setValue(refresh_settings.getint('interval_minutes', DEFAULT_REFRESH_MINUTES))
+            self.live_stream_checkbox.setChecked(refresh_settings.getboolean('live_stream', False))
+
+    def _load_prefetch_settings(self, config):
+        if config.has_section('chart_prefetch_settings'):
+            self.prefetch_budget_spinbox.setValue(config['chart_prefetch_settings'].getint('request_budget', DEFAULT_PREFETCH_BUDGET))
 
     def _load_watchlist_settings(self, config):
         current_exchange_name_gui = self.chart_exchange_combo.currentText()
@@ -661,39 +1034,39 @@ class MultiChartWindow(QMainWindow):
     def _load_chart_timeframe_settings(self, config):
         if config.has_section('chart_settings'):
             settings = config['chart_settings']
+            self.saved_chart_timeframes = {i: settings.get(f'chart_{i}_timeframe', '1h') for i in range(MAX_GRID_SIZE * MAX_GRID_SIZE)}
             for i, chart_widget in enumerate(self.charts):
-                tf = settings.get(f'chart_{i}_timeframe', '1h')
-                chart_widget.timeframe_combo.setCurrentText(tf)
+                chart_widget.timeframe_combo.setCurrentText(self.saved_chart_timeframes[i])
 
+    def _load_chart_mode_settings(self, config):
+        if config.has_section('chart_mode_settings'):
+            settings = config['chart_mode_settings']
+            self.cross_pair_timeframe_combo.setCurrentText(settings.get('timeframe', '1h'))
+            self.cross_pair_batch_spinbox.setValue(settings.getint('batch_size', DEFAULT_CROSS_PAIR_BATCH))
+            self.grid_rows_spinbox.setValue(settings.getint('grid_rows', DEFAULT_GRID_ROWS))
+            self.grid_columns_spinbox.setValue(settings.getint('grid_columns', DEFAULT_GRID_COLUMNS))
+            self.chart_mode_combo.setCurrentText(CHART_MODE_PAIRS if settings.get('mode') == 'pairs' else CHART_MODE_TIMEFRAMES)
 
-    def save_settings(self, _=None):
-        config = configparser.ConfigParser()
-        if os.path.exists(self.config_path):
-            config.read(self.config_path)
 
+    def save_settings(self, _=None):
+        if self.loading_settings: return
+        config = self.config_service.config
         self._save_chart_indicator_settings(config)
         self._save_auto_refresh_settings(config)
+        self._save_prefetch_settings(config)
         self._save_watchlist_settings(config)
         self._save_chart_timeframe_settings(config)
-
-        try:
-            with open(self.config_path, 'w') as configfile:
-                config.write(configfile)
-            # print("Ustawienia wykresów zapisano pomyślnie.") # Removed verbose print
-        except Exception as e:
-            print(f"Błąd zapisu ustawień wykresów: {e}")
+        self._save_chart_mode_settings(config)
+        self.config_service.commit()  # zapis na dysk z opóźnieniem, jeden dla serii zmian
 
     def _save_chart_indicator_settings(self, config):
         if not config.has_section('chart_indicator_settings'):
             config.add_section('chart_indicator_settings')
         settings = config['chart_indicator_settings']
         settings['indicator_type'] = self.global_indicator_combo.currentText().replace('%', '%%')
-        settings['wpr_period'] = str(self.wpr_period_spin.value())
-        settings['ema_period'] = str(self.ema_period_spin.value())
-        settings['rsi_period'] = str(self.rsi_period_spin.value())
-        settings['macd_fast'] = str(self.macd_fast_spin.value())
-        settings['macd_slow'] = str(self.macd_slow_spin.value())
-        settings['macd_signal'] = str(self.macd_signal_spin.value())
+        for name, spins in self.indicator_param_spins.items():
+            for param in get_indicator(name).params:
+                settings[param.config_key] = str(spins[param.key].value())
 
     def _save_auto_refresh_settings(self, config):
         if not config.has_section('auto_refresh_settings'):
@@ -701,6 +1074,12 @@ class MultiChartWindow(QMainWindow):
         refresh_settings = config['auto_refresh_settings']
         refresh_settings['enabled'] = str(self.auto_refresh_checkbox.isChecked())
         refresh_settings['interval_minutes'] = str(self.refresh_interval_spinbox.value())
+        refresh_settings['live_stream'] = str(self.live_stream_checkbox.isChecked())
+
+    def _save_prefetch_settings(self, config):
+        if not config.has_section('chart_prefetch_settings'):
+            config.add_section('chart_prefetch_settings')
+        config['chart_prefetch_settings']['request_budget'] = str(self.prefetch_budget_spinbox.value())
 
     def _save_watchlist_settings(self, config):
         current_exchange_name_gui = self.chart_exchange_combo.currentText()
@@ -718,7 +1097,18 @@ class MultiChartWindow(QMainWindow):
         if not config.has_section('chart_settings'):
             config.add_section('chart_settings')
         for i, chart_widget in enumerate(self.charts):
-            config.set('chart_settings', f'chart_{i}_timeframe', chart_widget.timeframe_combo.currentText())
+            self.saved_chart_timeframes[i] = chart_widget.timeframe_combo.currentText()
+            config.set('chart_settings', f'chart_{i}_timeframe', self.saved_chart_timeframes[i])
+
+    def _save_chart_mode_settings(self, config):
+        if not config.has_section('chart_mode_settings'):
+            config.add_section('chart_mode_settings')
+        settings = config['chart_mode_settings']
+        settings['mode'] = 'pairs' if self.is_cross_pair_mode() else 'timeframes'
+        settings['timeframe'] = self.cross_pair_timeframe_combo.currentText()
+        settings['batch_size'] = str(self.cross_pair_batch_spinbox.value())
+        settings['grid_rows'] = str(self.grid_rows_spinbox.value())
+        settings['grid_columns'] = str(self.grid_columns_spinbox.value())
 
     # --- Existing (mostly unchanged) functional methods ---
     def toggle_auto_refresh(self, state):
@@ -729,17 +1119,76 @@ class MultiChartWindow(QMainWindow):
             self.trigger_chart_updates()
         else:
             self.refresh_timer.stop()
-            for thread_id, thread in list(self.chart_data_threads.items()):
-                if thread.isRunning():
-                    thread.exit()
-                    thread.wait(500)
-                del self.chart_data_threads[thread_id]
-            self.chart_data_threads = {}
+            self.stop_chart_data_threads()
             self.load_charts_button.setEnabled(True)
 
+    def on_candle_cache_write_failed(self, message):
+        self.statusBar().showMessage(message, 10000)
+
+    def toggle_live_stream(self, state):
+        if Qt.CheckState(state) == Qt.CheckState.Checked:
+            self.sync_live_stream()
+        else:
+            self.stop_live_stream()
+
+    def get_live_subscriptions(self):
+        return list(dict.fromkeys((self.get_chart_pair(chart), self.get_chart_timeframe(chart)) for chart in self.get_visible_charts() if self.get_chart_pair(chart)))
+
+    def sync_live_stream(self):
+        if not self.live_stream_checkbox.isChecked(): return
+        subscriptions = self.get_live_subscriptions()
+        if self.live_stream_thread and self.live_stream_thread.isRunning() and self.live_stream_thread.subscriptions == subscriptions: return
+        self.stop_live_stream()
+        selected_config = self.exchange_options.get(self.chart_exchange_combo.currentText())
+        if not subscriptions or not selected_config: return
+        self.live_stream_thread = LiveCandleStreamThread(selected_config["id_ccxt"], selected_config["type"], subscriptions, self)
+        self.live_stream_thread.candles_signal.connect(self.on_live_candles)
+        self.live_stream_thread.error_signal.connect(lambda msg: self.statusBar().showMessage(msg, 10000))
+        self.live_stream_thread.start()
+        self.live_repaint_timer.start()
+
+    def stop_live_stream(self):
+        self.live_repaint_timer.stop()
+        self.pending_live_candles = {}
+        thread, self.live_stream_thread = self.live_stream_thread, None
+        if thread is None: return
+        thread.stop()
+        for signal in (thread.candles_signal, thread.error_signal):
+            try:
+                signal.disconnect()
+            except TypeError:
+                pass
+        self.retire_thread(thread)
+
+    def retire_thread(self, thread):
+        # Wątek może jeszcze chwilę działać (zamykanie połączeń) - trzymany do sygnału finished
+        if thread.isFinished(): return
+        self.retired_threads.add(thread)
+        thread.finished.connect(lambda t=thread: self.retired_threads.discard(t))
+
+    def on_live_candles(self, symbol, timeframe, ohlcv):
+        # Tylko najnowsza paczka na (para, interwał) - wykresy odświeżane są z ustaloną liczbą klatek na sekundę
+        self.pending_live_candles[(symbol, timeframe)] = ohlcv
+
+    def apply_live_candles(self):
+        if not self.pending_live_candles or self.is_loading: return
+        pending, self.pending_live_candles = self.pending_live_candles, {}
+        indicator_name, indicator_params = self.get_indicator_name(), self.get_indicator_params()
+        for chart_widget in self.charts:
+            data_key = self.get_chart_data_key(chart_widget)
+            ohlcv = pending.get(data_key[:2])
+            if ohlcv is None or chart_widget.data_key != data_key: continue
+            if chart_widget.isHidden(): chart_widget.stale = True; continue
+            df = update_chart_data_frame(chart_widget.data_frame, ohlcv, indicator_name, indicator_params, max(CHART_CANDLE_LIMIT, len(chart_widget.data_frame)))
+            self.apply_chart_data(chart_widget, df, indicator_name, data_key, True)
+
     def update_refresh_interval(self):
         minutes = self.refresh_interval_spinbox.value()
         interval_ms = minutes * 60 * 1000
+        if self.is_cross_pair_mode():
+            # Tryb wielu par: tury odświeżania rozłożone równomiernie na cały interwał
+            rounds = int(np.ceil(len(self.charts) / self.cross_pair_batch_spinbox.value()))
+            interval_ms //= max(1, rounds)
         self.refresh_timer.setInterval(interval_ms)
 
     def toggle_maximize_chart(self, chart_to_toggle):
@@ -750,19 +1199,79 @@ class MultiChartWindow(QMainWindow):
         else:
             for chart in self.charts: chart.show()
             self.maximized_chart = None
+            self.refresh_stale_charts()
+
+    def is_cross_pair_mode(self):
+        return self.chart_mode_combo.currentText() == CHART_MODE_PAIRS
+
+    def get_chart_pair(self, chart_widget):
+        if self.is_cross_pair_mode(): return self.chart_pairs.get(chart_widget.chart_id, "")
+        return self.current_pair
+
+    def get_chart_timeframe(self, chart_widget):
+        if self.is_cross_pair_mode(): return self.cross_pair_timeframe_combo.currentText()
+        return chart_widget.timeframe_combo.currentText()
+
+    def get_visible_charts(self):
+        return [chart for chart in self.charts if not chart.isHidden()]
+
+    def apply_chart_data(self, chart_widget, df, indicator_name, data_key, incremental):
+        if chart_widget not in self.charts: return  # wykres usunięty przy zmniejszeniu siatki
+        # Wynik spóźnionego wątku (inna giełda, para, interwał lub wskaźnik) nie nadpisuje bieżącego wykresu
+        if data_key != self.get_chart_data_key(chart_widget): return
+        chart_widget.update_chart_and_indicator(df, indicator_name, data_key[0], data_key, incremental)
+
+    def show_chart_error(self, chart_widget, message):
+        if chart_widget in self.charts: chart_widget.chart_title_label.setText(f"Błąd: {message}")
+
+    def refresh_stale_charts(self):
+        # Wykresy pominięte, gdy były ukryte (lub nowe w siatce), odświeżane są dopiero po pokazaniu
+        if self.is_loading or not self.current_pair: return
+        charts = [c for c in self.get_visible_charts() if self.get_chart_pair(c) and (c.stale or c.data_key != self.get_chart_data_key(c))]
+        if not charts: return
+        if not self.is_cross_pair_mode():
+            for chart in charts: self.start_single_fetch_thread(chart, chart.data_key == self.get_chart_data_key(chart))
+            return
+        if CROSS_PAIR_BATCH_KEY in self.chart_data_threads: return
+        thread = self.create_chart_batch_thread(charts, incremental=True)
+        if not thread: return
+        thread.finished_signal.connect(lambda _, t=thread: self.on_chart_data_thread_finished(thread_key=CROSS_PAIR_BATCH_KEY, thread=t))
+        self.chart_data_threads[CROSS_PAIR_BATCH_KEY] = thread
+        thread.start()
+
+    def get_watchlist_pairs(self):
+        return [self.watchlist_widget.item(i).text() for i in range(self.watchlist_widget.count())]
+
+    def on_chart_mode_changed(self, _=None):
+        self.update_chart_mode_controls()
+        self.save_settings()
+
+    def update_chart_mode_controls(self):
+        cross_pair_mode = self.is_cross_pair_mode()
+        for chart in self.charts: chart.timeframe_combo.setEnabled(not cross_pair_mode)
+        self.cross_pair_timeframe_combo.setEnabled(cross_pair_mode)
+        self.cross_pair_batch_spinbox.setEnabled(cross_pair_mode)
+        self.update_refresh_interval()
 
     def sync_crosshairs(self, x_pos):
-        for chart in self.charts: chart.update_v_line(x_pos)
+        # Zdarzenia myszy ze wszystkich wykresów zapamiętują tylko ostatnią pozycję, stosowaną raz na klatkę
+        self.crosshair_x = x_pos
+        if not self.crosshair_timer.isActive(): self.crosshair_timer.start()
+
+    def apply_crosshair(self):
+        if self.crosshair_x is None: return
+        for chart in self.get_visible_charts(): chart.update_v_line(self.crosshair_x)
 
     def on_global_indicator_changed(self, indicator_name=None):
         name = indicator_name or self.global_indicator_combo.currentText()
-        if name == "Williams %R": self.params_stacked_widget.setCurrentIndex(0)
-        elif name == "RSI": self.params_stacked_widget.setCurrentIndex(1)
-        elif name == "MACD": self.params_stacked_widget.setCurrentIndex(2)
+        names = indicator_names()
+        if name in names: self.params_stacked_widget.setCurrentIndex(names.index(name))
 
     def trigger_chart_updates(self):
         if self.is_loading:
             return
+        if self.is_cross_pair_mode():
+            self.trigger_cross_pair_updates(); return
 
         current_item = self.watchlist_widget.currentItem()
         if not current_item:
@@ -774,51 +1283,247 @@ class MultiChartWindow(QMainWindow):
 
         self.is_loading = True
         self.current_pair = current_item.text()
+        self.stop_prefetch()
+        if self.current_pair in self.recent_pairs: self.recent_pairs.remove(self.current_pair)
+        self.recent_pairs.appendleft(self.current_pair)
 
         if not self.auto_refresh_checkbox.isChecked():
             self.load_charts_button.setEnabled(False)
             self.load_charts_button.setText(f"Wczytywanie {self.current_pair}...")
 
-        for thread_id, thread in list(self.chart_data_threads.items()):
-            if thread.isRunning():
-                thread.exit()
-                thread.wait(500)
-            del self.chart_data_threads[thread_id]
+        self.stop_chart_data_threads()
+
+        delay = 0
+        for chart_widget in self.get_visible_charts():
+            QTimer.singleShot(delay, lambda cw=chart_widget: self.start_single_fetch_thread(cw))
+            delay += 250
+
+    def trigger_cross_pair_updates(self):
+        # Tryb wielu par: kolejne pary z listy obserwowanych (od zaznaczonej) na kolejnych wykresach
+        watchlist = self.get_watchlist_pairs()
+        if not watchlist:
+            if not self.auto_refresh_checkbox.isChecked():
+                QMessageBox.warning(self, "Brak par", "Lista obserwowanych jest pusta.")
+            return
+        current_item = self.watchlist_widget.currentItem()
+        start = watchlist.index(current_item.text()) if current_item and current_item.text() in watchlist else 0
+
+        self.is_loading = True
+        self.current_pair = watchlist[start]
+        self.assign_cross_pairs()
+        self.cross_pair_index = 0
+        self.stop_prefetch()
+
+        if not self.auto_refresh_checkbox.isChecked():
+            self.load_charts_button.setEnabled(False)
+            self.load_charts_button.setText(f"Wczytywanie {len(self.chart_pairs)} par...")
+
+        self.stop_chart_data_threads()
+        thread = self.create_chart_batch_thread([c for c in self.get_visible_charts() if c.chart_id in self.chart_pairs], incremental=False)
+        if not thread: self.on_chart_data_thread_finished(); return
+        thread.finished_signal.connect(lambda _, t=thread: self.on_chart_data_thread_finished(thread_key=CROSS_PAIR_BATCH_KEY, thread=t))
+        self.chart_data_threads[CROSS_PAIR_BATCH_KEY] = thread
+        thread.start()
+
+    def assign_cross_pairs(self):
+        # Kolejne pary z listy obserwowanych, począwszy od bieżącej, na kolejnych wykresach
+        watchlist = self.get_watchlist_pairs()
+        start = watchlist.index(self.current_pair) if self.current_pair in watchlist else 0
+        self.chart_pairs = {chart.chart_id: watchlist[(start + offset) % len(watchlist)] for offset, chart in enumerate(self.charts[:len(watchlist)])}
+        for chart in self.charts:
+            if chart.chart_id not in self.chart_pairs: chart.chart_title_label.setText("<b>Brak pary</b>")
+
+    def refresh_next_cross_pair_batch(self):
+        # Co takt timera odświeżana jest kolejna porcja wykresów (round-robin) zamiast wszystkich naraz
+        if self.is_loading or ROUND_ROBIN_BATCH_KEY in self.chart_data_threads: return
+        if not self.chart_pairs: self.trigger_chart_updates(); return
+        for chart in self.charts:
+            if chart.isHidden(): chart.stale = True
+        charts = [c for c in self.get_visible_charts() if c.chart_id in self.chart_pairs]
+        if not charts: return
+        start = self.cross_pair_index % len(charts)
+        selected = [charts[(start + i) % len(charts)] for i in range(min(self.cross_pair_batch_spinbox.value(), len(charts)))]
+        self.cross_pair_index = (start + len(selected)) % len(charts)
+        thread = self.create_chart_batch_thread(selected, incremental=True)
+        if not thread: return
+        thread.finished_signal.connect(lambda _, t=thread: self.on_chart_data_thread_finished(thread_key=ROUND_ROBIN_BATCH_KEY, thread=t))
+        self.chart_data_threads[ROUND_ROBIN_BATCH_KEY] = thread
+        thread.start()
+
+    def create_chart_batch_thread(self, charts, incremental):
+        exchange = self.get_exchange()
+        if not exchange: return None
+        indicator_name, indicator_params = self.get_indicator_name(), self.get_indicator_params()
+        jobs, applied = [], {}
+        for chart in charts:
+            data_key = self.get_chart_data_key(chart)
+            chart_incremental = incremental and chart.data_key == data_key
+            display_bars = max(CHART_CANDLE_LIMIT, len(chart.data_frame)) if chart_incremental else CHART_CANDLE_LIMIT
+            jobs.append((chart, data_key[0], data_key[1], chart_incremental, display_bars))
+            applied[chart.chart_id] = (data_key, chart_incremental)
+        thread = FetchChartBatchThread(exchange, jobs, indicator_name, indicator_params, self.candle_cache, self)
+        thread.data_ready_signal.connect(lambda df, cw, ind=indicator_name: self.apply_chart_data(cw, df, ind, *applied[cw.chart_id]))
+        thread.error_signal.connect(lambda msg, cw: self.show_chart_error(cw, msg))
+        return thread
+
+    def stop_chart_data_threads(self):
+        # Zatrzymywany wątek nie może już zmienić stanu okna ani wykresów (jego klucz może dostać nowy wątek) -
+        # sygnały są odłączane, a referencja trzymana do końca pracy wątku
+        for thread in self.chart_data_threads.values(): self.retire_chart_data_thread(thread)
         self.chart_data_threads = {}
+        self.stop_history_threads()
+
+    def stop_history_threads(self):
+        for thread in self.history_threads.values():
+            for signal in (thread.data_ready_signal, thread.history_exhausted_signal, thread.error_signal, thread.finished):
+                try:
+                    signal.disconnect()
+                except TypeError:
+                    pass
+            thread.chart_widget.history_loading = False
+            self.retire_thread(thread)
+        self.history_threads = {}
+
+    def retire_chart_data_thread(self, thread):
+        for signal in (thread.data_ready_signal, thread.error_signal, thread.finished_signal):
+            try:
+                signal.disconnect()
+            except TypeError:
+                pass
+        if isinstance(thread, FetchChartBatchThread): thread.requestInterruption()
+        self.retire_thread(thread)
+
+    def refresh_charts_incrementally(self):
+        # Auto-odświeżanie: dociąga tylko nowe świece i aktualizuje wykresy w miejscu (bez resetu powiększenia)
+        if self.is_cross_pair_mode():
+            self.refresh_next_cross_pair_batch(); return
+        if self.is_loading: return
+        current_item = self.watchlist_widget.currentItem()
+        if not current_item: return
+        if current_item.text() != self.current_pair:
+            self.trigger_chart_updates(); return
 
+        self.is_loading = True
         delay = 0
         for chart_widget in self.charts:
-            QTimer.singleShot(delay, lambda cw=chart_widget: self.start_single_fetch_thread(cw))
+            if chart_widget.isHidden(): chart_widget.stale = True
+        for chart_widget in self.get_visible_charts():
+            incremental = chart_widget.data_key == self.get_chart_data_key(chart_widget)
+            QTimer.singleShot(delay, lambda cw=chart_widget, inc=incremental: self.start_single_fetch_thread(cw, inc))
             delay += 250
 
-    def on_chart_data_thread_finished(self, finished_chart_widget=None):
-        if finished_chart_widget and finished_chart_widget.chart_id in self.chart_data_threads:
-            del self.chart_data_threads[finished_chart_widget.chart_id]
+    def get_chart_data_key(self, chart_widget):
+        return (self.get_chart_pair(chart_widget), self.get_chart_timeframe(chart_widget), self.get_indicator_name(),
+                tuple(sorted(self.get_indicator_params().items())), self.get_exchange_id())
+
+    def on_chart_data_thread_finished(self, finished_chart_widget=None, thread_key=None, thread=None):
+        if finished_chart_widget is not None: thread_key = finished_chart_widget.chart_id
+        # Wątek zastąpiony pod tym samym kluczem nie usuwa wpisu następcy ani nie kończy jego ładowania
+        if thread is not None and self.chart_data_threads.get(thread_key) is not thread: return
+        if thread_key in self.chart_data_threads:
+            del self.chart_data_threads[thread_key]
 
         if not self.chart_data_threads:
-            self.is_loading = False
-            if not self.auto_refresh_checkbox.isChecked():
-                self.load_charts_button.setEnabled(True)
-                self.load_charts_button.setText("Wczytaj Wykresy dla wybranej pary")
+            self.reset_loading_state()
+            self.sync_live_stream()
+            self.start_prefetch()
 
-    def start_single_fetch_thread(self, chart_widget):
+    def reset_loading_state(self):
+        self.is_loading = False
+        if not self.auto_refresh_checkbox.isChecked():
+            self.load_charts_button.setEnabled(True)
+            self.load_charts_button.setText("Wczytaj Wykresy dla wybranej pary")
+
+    def get_prefetch_pairs(self):
+        watchlist = self.get_watchlist_pairs()
+        if self.is_cross_pair_mode():
+            # Tryb wielu par: rozgrzewane są pary następujące po tych wyświetlanych
+            displayed = set(self.chart_pairs.values())
+            if not displayed: return []
+            last_row = max(watchlist.index(p) for p in displayed if p in watchlist) if displayed & set(watchlist) else -1
+            following = watchlist[last_row + 1:] + watchlist[:last_row + 1]
+            return [p for p in following if p not in displayed][:PREFETCH_RECENT_PAIRS]
+        if self.current_pair not in watchlist: return []
+        row = watchlist.index(self.current_pair)
+        candidates = [watchlist[r] for r in (row + 1, row - 1) if 0 <= r < len(watchlist)]
+        candidates += [p for p in self.recent_pairs if p in watchlist]
+        pairs = []
+        for pair in candidates:
+            if pair != self.current_pair and pair not in pairs: pairs.append(pair)
+        return pairs
+
+    def start_prefetch(self):
+        budget = self.prefetch_budget_spinbox.value()
+        if budget <= 0 or self.is_loading: return
+        if self.prefetch_thread and self.prefetch_thread.isRunning(): return
+        pairs = self.get_prefetch_pairs()
+        if not pairs: return
+        exchange = self.get_exchange()
+        if not exchange: return
+        timeframes = list(dict.fromkeys(self.get_chart_timeframe(chart) for chart in self.charts))
+        self.prefetch_thread = ChartPrefetchThread(exchange, pairs, timeframes, self.candle_cache, budget, self)
+        self.prefetch_thread.start()
+
+    def stop_prefetch(self):
+        if self.prefetch_thread and self.prefetch_thread.isRunning():
+            self.prefetch_thread.requestInterruption()
+
+    def start_single_fetch_thread(self, chart_widget, incremental=False):
         exchange = self.get_exchange();
         if not exchange: self.on_chart_data_thread_finished(chart_widget); return
         if not hasattr(self, 'current_pair') or not self.current_pair: return
 
         indicator_name = self.get_indicator_name(); indicator_params = self.get_indicator_params()
 
-        thread = FetchChartDataThread(exchange, self.current_pair, chart_widget.timeframe_combo.currentText(), indicator_name, indicator_params, chart_widget, self)
+        display_bars = CHART_CANDLE_LIMIT
+        if incremental and chart_widget.data_frame is not None: display_bars = max(CHART_CANDLE_LIMIT, len(chart_widget.data_frame))
+        data_key = self.get_chart_data_key(chart_widget)
+        thread = FetchChartDataThread(exchange, data_key[0], data_key[1], indicator_name, indicator_params, chart_widget, self.candle_cache, not incremental, display_bars, self)
 
-        thread.data_ready_signal.connect(lambda df, cw, ind=indicator_name, p=self.current_pair: cw.update_chart_and_indicator(df, ind, p))
-        thread.error_signal.connect(lambda msg, cw=chart_widget: cw.chart_title_label.setText(f"Błąd: {msg}"))
-        thread.finished_signal.connect(self.on_chart_data_thread_finished)
+        thread.data_ready_signal.connect(lambda df, cw, ind=indicator_name, k=data_key, inc=incremental: self.apply_chart_data(cw, df, ind, k, inc))
+        thread.error_signal.connect(lambda msg, cw=chart_widget: self.show_chart_error(cw, msg))
+        thread.finished_signal.connect(lambda cw, t=thread: self.on_chart_data_thread_finished(cw, thread=t))
 
+        previous = self.chart_data_threads.get(chart_widget.chart_id)
+        if previous is not None: self.retire_chart_data_thread(previous)
         self.chart_data_threads[chart_widget.chart_id] = thread
         thread.start()
 
+    def closeEvent(self, event):
+        self.refresh_timer.stop()
+        self.stop_chart_data_threads()
+        self.stop_prefetch()
+        self.stop_live_stream()
+        for thread in list(self.retired_threads):
+            if isinstance(thread, LiveCandleStreamThread): thread.wait(LIVE_STREAM_CLOSE_TIMEOUT_MS)
+        self.config_service.flush_quietly()
+        super().closeEvent(event)
+
+    def load_older_history(self, chart_widget):
+        if self.is_loading or chart_widget.history_loading or chart_widget.data_key != self.get_chart_data_key(chart_widget): return
+        exchange = self.get_exchange()
+        if not exchange: return
+        chart_widget.history_loading = True
+        indicator_name, indicator_params = self.get_indicator_name(), self.get_indicator_params()
+        data_key = chart_widget.data_key
+        thread = FetchOlderHistoryThread(exchange, data_key[0], data_key[1], indicator_name, indicator_params, chart_widget, data_frame_to_ohlcv(chart_widget.data_frame), self.candle_cache, self)
+        thread.data_ready_signal.connect(lambda df, cw, ind=indicator_name, k=data_key: self.apply_chart_data(cw, df, ind, k, True))
+        thread.history_exhausted_signal.connect(lambda cw: setattr(cw, 'history_exhausted', True))
+        thread.error_signal.connect(lambda msg, cw: self.statusBar().showMessage(msg, 10000))
+        thread.finished.connect(lambda cw=chart_widget: setattr(cw, 'history_loading', False))
+        self.history_threads[chart_widget.chart_id] = thread
+        thread.start()
+
     def on_exchange_changed(self, exchange_name_gui):
         # When exchange changes, load settings specific to this exchange (including watchlist)
+        # Wątki starej giełdy są zatrzymywane, a wykresy tracą klucz danych - kolejne pobranie jest pełne
+        self.stop_chart_data_threads()
+        self.reset_loading_state()
+        for chart in self.charts: chart.data_key = None
+        self.stop_prefetch()
+        self.stop_live_stream()
+        self.recent_pairs.clear()
+        self.chart_pairs = {}
         self.load_settings()
         # Clear available pairs and re-fetch them for the new exchange
         self.available_pairs_list_widget.clear()
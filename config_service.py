@@ -0,0 +1,77 @@
+import os, configparser
+from PyQt6.QtCore import QObject, QTimer, QCoreApplication, pyqtSignal as Signal
+
+DEFAULT_SAVE_DELAY_MS = 750
+
+_services = {}
+
+
+class ConfigService(QObject):
+    """
+    Jedna, współdzielona kopia pliku ustawień w pamięci. Okna czytają i modyfikują `config` bez dostępu do dysku,
+    a zmiany są zapisywane z opóźnieniem (kilka zmian = jeden zapis) i atomowo (plik tymczasowy + os.replace).
+    Używać tylko z wątku GUI.
+    """
+    save_failed = Signal(str)   # opis błędu zapisu
+
+    def __init__(self, path, save_delay_ms=DEFAULT_SAVE_DELAY_MS, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.config = configparser.ConfigParser()
+        self.file_exists = os.path.exists(path)
+        if self.file_exists:
+            self.config.read(path)
+        self._snapshot = self._take_snapshot()
+        self._dirty = False
+        self._save_timer = QTimer(self)
+        self._save_timer.setSingleShot(True)
+        self._save_timer.setInterval(save_delay_ms)
+        self._save_timer.timeout.connect(self.flush_quietly)
+        app = QCoreApplication.instance()
+        if app is not None: app.aboutToQuit.connect(self.flush_quietly)
+
+    def _take_snapshot(self):
+        return {name: dict(self.config.items(name, raw=True)) for name in self.config.sections()}
+
+    def commit(self):
+        """
+        Wywoływane po zmianie `config`: planuje zapis, tylko gdy coś się zmieniło. Zwraca nazwy zmienionych sekcji.
+        Okna współdzielą `config` i czytają go przy użyciu (np. klucze API przy tworzeniu giełdy), więc nie ma osobnych
+        powiadomień o zmianach.
+        """
+        snapshot = self._take_snapshot()
+        changed_sections = sorted(name for name in snapshot.keys() | self._snapshot.keys() if snapshot.get(name) != self._snapshot.get(name))
+        self._snapshot = snapshot
+        if changed_sections:
+            self._dirty = True
+            self._save_timer.start()
+        return changed_sections
+
+    def flush(self):
+        """Natychmiastowy zapis oczekujących zmian (np. przycisk „Zapisz”). Błąd zapisu zgłaszany jest wyjątkiem OSError."""
+        self._save_timer.stop()
+        if not self._dirty: return
+        config_dir = os.path.dirname(self.path)
+        if config_dir: os.makedirs(config_dir, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as configfile:
+            self.config.write(configfile)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+        self.file_exists = True
+
+    def flush_quietly(self):
+        """Zapis oczekujących zmian bez wyjątku (zamykanie okna, wyjście z aplikacji) - błąd zgłaszany sygnałem `save_failed`."""
+        try:
+            self.flush()
+        except OSError as e:
+            print(f"Błąd zapisu ustawień {self.path}: {e}")
+            self.save_failed.emit(str(e))
+
+
+def get_config_service(path):
+    """Zwraca wspólną usługę konfiguracji dla danego pliku (jedna instancja na ścieżkę)."""
+    path = os.path.abspath(path)
+    if path not in _services:
+        _services[path] = ConfigService(path)
+    return _services[path]
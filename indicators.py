@@ -0,0 +1,144 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas_ta as ta
+
+DEFAULT_RESULT_CACHE_ENTRIES = 256
+
+INDICATOR_REGISTRY = OrderedDict()  # nazwa -> Indicator, w kolejności rejestracji
+
+
+class IndicatorParam:
+    """Opis jednego parametru wskaźnika - z niego budowane są pola w GUI i klucze w pliku ustawień."""
+    def __init__(self, key, label, default, minimum=1, maximum=200, config_key=None):
+        self.key = key
+        self.label = label
+        self.default = default
+        self.minimum = minimum
+        self.maximum = maximum
+        self.config_key = config_key or key
+
+
+class Indicator:
+    def __init__(self, name, compute, params, plot):
+        self.name = name
+        self.compute = compute
+        self.params = params
+        self.plot = plot
+
+    def default_params(self):
+        return {param.key: param.default for param in self.params}
+
+    def normalize_params(self, params):
+        values = self.default_params()
+        values.update({key: value for key, value in (params or {}).items() if key in values})
+        return values
+
+
+def register_indicator(name, params=(), plot=None):
+    """
+    Dekorator rejestrujący wskaźnik. Funkcja dostaje DataFrame z kolumnami OHLCV i słownik parametrów,
+    a zwraca słownik {nazwa kolumny: seria/tablica} o długości DataFrame.
+    `plot` opisuje panel wykresu: linie (prefiks kolumny, pióro, nazwa), histogram i poziomy odniesienia.
+    """
+    def decorator(compute):
+        INDICATOR_REGISTRY[name] = Indicator(name, compute, list(params), plot or {})
+        return compute
+    return decorator
+
+
+def get_indicator(name):
+    return INDICATOR_REGISTRY.get(name)
+
+
+def indicator_names():
+    return list(INDICATOR_REGISTRY)
+
+
+class IndicatorResultCache:
+    """
+    Wspólny cache wyników wskaźników (LRU). Klucz zawiera źródło danych (giełda, symbol, interwał, czas
+    ostatniej świecy), liczbę świec, zamknięcie ostatniej świecy (formująca się świeca zmienia wynik)
+    oraz wskaźnik z parametrami. Bezpieczny dla wielu wątków.
+    """
+    def __init__(self, max_entries=DEFAULT_RESULT_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None: self._entries.move_to_end(key)
+            return result
+
+    def put(self, key, result):
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+shared_indicator_cache = IndicatorResultCache()
+
+
+def compute_indicator(df, name, params=None, source=None, cache=shared_indicator_cache):
+    """
+    Liczy wskaźnik `name` dla DataFrame z kolumnami OHLCV i zwraca słownik {kolumna: tablica numpy}.
+    `source` = (giełda, symbol, interwał, czas ostatniej świecy) włącza wspólny cache, dzięki czemu
+    ten sam wskaźnik dla tych samych danych (np. dwa wykresy jednej pary) liczony jest tylko raz.
+    """
+    indicator = get_indicator(name)
+    if indicator is None or df.empty: return {}
+    params = indicator.normalize_params(params)
+    key = None
+    if source is not None and cache is not None:
+        key = (*source, len(df), float(df['close'].iloc[-1]), name, tuple(sorted(params.items())))
+        cached = cache.get(key)
+        if cached is not None: return cached
+    result = {}
+    for column, values in indicator.compute(df, params).items():
+        if values is None: continue
+        result[column] = np.asarray(values, dtype=np.float64)
+    if key is not None: cache.put(key, result)
+    return result
+
+
+def apply_indicator(df, name, params=None, source=None, cache=shared_indicator_cache):
+    """Dopisuje kolumny wskaźnika do DataFrame (w miejscu) i zwraca go."""
+    for column, values in compute_indicator(df, name, params, source, cache).items():
+        df[column] = values
+    return df
+
+
+@register_indicator("Williams %R",
+                    params=[IndicatorParam('wpr_period', "Okres W%R:", 14), IndicatorParam('ema_period', "Okres EMA:", 9)],
+                    plot={'curves': [('WILLR_', 'b', "W%R"), ('WPR_EMA_', {'color': 'orange', 'width': 2}, "EMA on W%R")],
+                          'levels': [(-20, 'r'), (-80, 'g')]})
+def williams_r(df, params):
+    wpr_p, ema_p = params['wpr_period'], params['ema_period']
+    wpr = ta.willr(df['high'], df['low'], df['close'], length=wpr_p)
+    if wpr is None or wpr.isna().all(): return {}
+    # EMA liczona na serii bez początkowych NaN (tak jak w skanerze), potem wyrównana do indeksu świec
+    ema = ta.ema(wpr.dropna(), length=ema_p)
+    return {f'WILLR_{wpr_p}': wpr, f'WPR_EMA_{ema_p}': ema.reindex(df.index) if ema is not None else None}
+
+
+@register_indicator("RSI",
+                    params=[IndicatorParam('rsi_period', "Okres RSI:", 14)],
+                    plot={'curves': [('RSI_', 'g', "RSI")], 'levels': [(70, 'r'), (30, 'g')]})
+def rsi(df, params):
+    rsi_p = params['rsi_period']
+    return {f'RSI_{rsi_p}': ta.rsi(df['close'], length=rsi_p)}
+
+
+@register_indicator("MACD",
+                    params=[IndicatorParam('fast', "Okres Fast:", 12, config_key='macd_fast'),
+                            IndicatorParam('slow', "Okres Slow:", 26, config_key='macd_slow'),
+                            IndicatorParam('signal', "Okres Signal:", 9, config_key='macd_signal')],
+                    plot={'curves': [('MACD_', 'b', 'MACD'), ('MACDs_', 'r', 'Signal')], 'histogram': 'MACDh_'})
+def macd(df, params):
+    result = ta.macd(df['close'], fast=params['fast'], slow=params['slow'], signal=params['signal'])
+    if result is None: return {}
+    return {column: result[column] for column in result.columns}
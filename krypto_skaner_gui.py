@@ -1,11 +1,13 @@
-import sys, time, os, configparser, ccxt, pandas as pd, pandas_ta as ta, requests
+import time
+STARTUP_STARTED_AT = time.perf_counter()
+import sys, os
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QWidget, QComboBox, QPushButton, QTableWidget, QTextEdit, QTableWidgetItem, QHeaderView, QLabel, QLineEdit, QMessageBox, QHBoxLayout, QCheckBox, QGroupBox, QFormLayout, QDoubleSpinBox, QSpinBox, QListWidget, QListWidgetItem, QSizePolicy, QScrollArea)
 from PyQt6.QtGui import QAction
-from PyQt6.QtCore import QThread, pyqtSignal as Signal, QStandardPaths, Qt
+from PyQt6.QtCore import QThread, pyqtSignal as Signal, QStandardPaths, Qt, QTimer
+from config_service import get_config_service
 
-from chart_window import MultiChartWindow
-from spike_detector_window import SpikeDetectorWindow
-from order_flow_window import OrderFlowWindow
+# ccxt, pandas, pandas_ta, requests i moduły okien (pyqtgraph, ccxt.pro, NumPy) importowane są dopiero przy
+# pierwszym użyciu - okno główne pojawia się bez czekania na ich załadowanie
 
 CONFIG_DIR_NAME = "KryptoSkaner"
 CONFIG_FILE_NAME = "app_settings.ini"
@@ -41,6 +43,7 @@ def format_large_number(num, currency_symbol=""):
 
 def send_telegram_notification(bot_token, chat_id, message, progress_callback):
     if not bot_token or not chat_id: progress_callback.emit("<font color='orange'>Ostrz.: Token Telegram lub Chat ID nieskonfigurowane.</font>"); return
+    import requests
     telegram_url=f"https://api.telegram.org/bot{bot_token}/sendMessage"; payload={'chat_id':chat_id,'text':message,'parse_mode':'HTML'}
     try:
         response=requests.post(telegram_url,data=payload,timeout=10); response.raise_for_status()
@@ -49,6 +52,8 @@ def send_telegram_notification(bot_token, chat_id, message, progress_callback):
     except Exception as e: progress_callback.emit(f"<font color='red'>Błąd Telegram: {str(e)}</font>")
 
 def perform_actual_scan(exchange_id_gui_config_key,api_key,api_secret,pairs_to_scan,selected_timeframes,wpr_period_from_gui,ema_period_from_gui,wpr_operator_cond,wpr_value_cond,ema_wpr_operator_cond,ema_wpr_value_cond,notification_settings,progress_callback,result_callback,error_callback,app_instance):
+    import ccxt, pandas as pd
+    from indicators import compute_indicator
     progress_callback.emit(f"Rozpoczynanie skanowania dla: {exchange_id_gui_config_key}")
     if not selected_timeframes: error_callback.emit("Nie wybrano interwałów."); return
     sorted_selected_timeframes=sorted(selected_timeframes,key=get_timeframe_duration_for_sort,reverse=True); progress_callback.emit(f"Wybrane interwały: {', '.join(sorted_selected_timeframes)}"); progress_callback.emit(f"Parametry: W%R({wpr_period_from_gui}), EMA({ema_period_from_gui}) | Kryteria: W%R {wpr_operator_cond} {wpr_value_cond}, EMA(W%R) {ema_wpr_operator_cond} {ema_wpr_value_cond}")
@@ -78,13 +83,12 @@ def perform_actual_scan(exchange_id_gui_config_key,api_key,api_secret,pairs_to_s
                 if not ohlcv or len(ohlcv) < (wpr_period_from_gui+ema_period_from_gui-1): progress_callback.emit(f"  Brak danych. Pomijam."); all_tfs_ok=False; break
                 df=pd.DataFrame(ohlcv,columns=['timestamp','open','high','low','close','volume'])
                 if df.empty: progress_callback.emit(f"  Puste dane. Pomijam."); all_tfs_ok=False; break
-                df.ta.willr(length=wpr_period_from_gui,append=True); wpr_col=f'WILLR_{wpr_period_from_gui}'
-                if wpr_col not in df.columns or df[wpr_col].isna().all(): progress_callback.emit(f"  Błąd W%R. Pomijam."); all_tfs_ok=False; break
-                current_wpr=df[wpr_col].iloc[-1]
+                indicator_values=compute_indicator(df,"Williams %R",{'wpr_period':wpr_period_from_gui,'ema_period':ema_period_from_gui},(ccxt_exchange_id,pair_symbol,tf,int(ohlcv[-1][0]))); wpr_col=f'WILLR_{wpr_period_from_gui}'; ema_col=f'WPR_EMA_{ema_period_from_gui}'
+                if wpr_col not in indicator_values or pd.isna(indicator_values[wpr_col]).all(): progress_callback.emit(f"  Błąd W%R. Pomijam."); all_tfs_ok=False; break
+                current_wpr=indicator_values[wpr_col][-1]
                 if pd.isna(current_wpr): progress_callback.emit(f"  W%R NaN. Pomijam."); all_tfs_ok=False; break
-                ema_series=ta.ema(df[wpr_col].dropna(),length=ema_period_from_gui)
-                if ema_series is None or ema_series.empty or ema_series.isna().all(): progress_callback.emit(f"  Błąd EMA(W%R). Pomijam."); all_tfs_ok=False; break
-                current_ema=ema_series.iloc[-1]
+                if ema_col not in indicator_values or pd.isna(indicator_values[ema_col]).all(): progress_callback.emit(f"  Błąd EMA(W%R). Pomijam."); all_tfs_ok=False; break
+                current_ema=indicator_values[ema_col][-1]
                 if pd.isna(current_ema): progress_callback.emit(f"  EMA(W%R) NaN. Pomijam."); all_tfs_ok=False; break
                 wpr_ok=(current_wpr >= wpr_value_cond) if wpr_operator_cond == ">=" else (current_wpr <= wpr_value_cond); ema_ok=(current_ema >= ema_wpr_value_cond) if ema_wpr_operator_cond == ">=" else (current_ema <= ema_wpr_value_cond)
                 wpr_ok_str=f"<font color='green'>True</font>" if wpr_ok else f"<font color='red'>False</font>"; ema_ok_str=f"<font color='green'>True</font>" if ema_ok else f"<font color='red'>False</font>"
@@ -131,6 +135,7 @@ class FetchMarketsThread(QThread):
         super().__init__(parent); self.exchange_id_ccxt,self.market_type_filter=exchange_id_ccxt,market_type_filter
     def run(self):
         try:
+            import ccxt
             exchange=getattr(ccxt,self.exchange_id_ccxt)({'enableRateLimit':True,'timeout':30000}); markets=exchange.load_markets()
             available_pairs=[symbol for symbol,market_data in markets.items() if market_data.get('active',False) and market_data.get('quote','').upper() == 'USDT' and self.type_matches(market_data)]; self.markets_fetched_signal.emit(sorted(list(set(available_pairs))))
         except Exception as e: self.error_signal.emit(f"Błąd pobierania par dla {self.exchange_id_ccxt}: {type(e).__name__} - {str(e)}")
@@ -149,6 +154,7 @@ class MainWindow(QMainWindow):
         self.chart_win=None
         self.spike_detector_win=None
         self.order_flow_win=None
+        self.config_service=get_config_service(CONFIG_FILE_PATH)
         self.setup_menu()
 
         self.scroll_area=QScrollArea()
@@ -396,14 +402,22 @@ class MainWindow(QMainWindow):
     def setup_menu(self):
         menu_bar=self.menuBar(); tools_menu=menu_bar.addMenu("&Narzędzia"); open_chart_action=QAction("Otwórz okno analizy wykresów",self); open_chart_action.triggered.connect(self.open_chart_window); tools_menu.addAction(open_chart_action); open_spike_detector_action=QAction("Otwórz detektor pików",self); open_spike_detector_action.triggered.connect(self.open_spike_detector_window); tools_menu.addAction(open_spike_detector_action); tools_menu.addSeparator(); open_order_flow_action=QAction("Otwórz Analizę Order Flow",self); open_order_flow_action.triggered.connect(self.open_order_flow_window); tools_menu.addAction(open_order_flow_action)
     def open_chart_window(self):
-        if self.chart_win is None or not self.chart_win.isVisible(): self.chart_win=MultiChartWindow(self.exchange_options,CONFIG_FILE_PATH,self); self.chart_win.show()
+        if self.chart_win is None or not self.chart_win.isVisible():
+            started_at=time.perf_counter(); from chart_window import MultiChartWindow
+            self.chart_win=MultiChartWindow(self.exchange_options,CONFIG_FILE_PATH,self); self.chart_win.show(); self.log_window_open_time("analizy wykresów",started_at)
         else: self.chart_win.activateWindow(); self.chart_win.raise_()
     def open_spike_detector_window(self):
-        if self.spike_detector_win is None or not self.spike_detector_win.isVisible(): self.spike_detector_win=SpikeDetectorWindow(self.exchange_options,self); self.spike_detector_win.show()
+        if self.spike_detector_win is None or not self.spike_detector_win.isVisible():
+            started_at=time.perf_counter(); from spike_detector_window import SpikeDetectorWindow
+            self.spike_detector_win=SpikeDetectorWindow(self.exchange_options,self); self.spike_detector_win.show(); self.log_window_open_time("detektora pików",started_at)
         else: self.spike_detector_win.activateWindow(); self.spike_detector_win.raise_()
     def open_order_flow_window(self):
-        if self.order_flow_win is None or not self.order_flow_win.isVisible(): self.order_flow_win=OrderFlowWindow(self.exchange_options,self); self.order_flow_win.show()
+        if self.order_flow_win is None or not self.order_flow_win.isVisible():
+            started_at=time.perf_counter(); from order_flow_window import OrderFlowWindow
+            self.order_flow_win=OrderFlowWindow(self.exchange_options,self); self.order_flow_win.show(); self.log_window_open_time("Order Flow",started_at)
         else: self.order_flow_win.activateWindow(); self.order_flow_win.raise_()
+    def log_window_open_time(self,window_name,started_at): self.update_log(f"Okno {window_name} otwarte w {time.perf_counter()-started_at:.2f} s (z importem modułów przy pierwszym otwarciu).")
+    def report_startup_time(self,started_at): self.update_log(f"Czas uruchomienia okna głównego: {time.perf_counter()-started_at:.2f} s (moduły wykresów, giełd i wskaźników ładowane przy pierwszym użyciu).")
 
     def on_exchange_selection_changed(self,exchange_name_gui):
         # Ta metoda teraz tylko ładuje konfigurację i odświeża listy par
@@ -418,13 +432,12 @@ class MainWindow(QMainWindow):
 
     # NOWE/ZMODYFIKOWANE METODY DLA KONFIGURACJI
     def load_configuration(self, exchange_name_gui_from_signal=None):
-        config = configparser.ConfigParser()
-        if not os.path.exists(CONFIG_FILE_PATH):
+        if not self.config_service.file_exists:
             self.update_log(f"Plik konf. {CONFIG_FILE_PATH} nie istnieje. Ładowanie domyślnych ustawień.")
             self._load_default_settings()
             return
 
-        config.read(CONFIG_FILE_PATH)
+        config = self.config_service.config
         self.update_log(f"Wczytuję konfigurację z: {CONFIG_FILE_PATH}")
 
         self._load_global_scan_settings(config)
@@ -518,10 +531,7 @@ class MainWindow(QMainWindow):
             self.scan_pairs_list_widget.clear()
 
     def save_configuration(self):
-        config = configparser.ConfigParser()
-        if os.path.exists(CONFIG_FILE_PATH):
-            config.read(CONFIG_FILE_PATH)
-
+        config = self.config_service.config
         self.update_log("Rozpoczynam zapis konfiguracji...")
 
         self._save_global_scan_settings(config)
@@ -529,12 +539,9 @@ class MainWindow(QMainWindow):
         selected_exchange_name_gui = self.exchange_combo.currentText()
         self._save_exchange_specific_settings(config, selected_exchange_name_gui)
 
+        self.config_service.commit()
         try:
-            config_dir = os.path.dirname(CONFIG_FILE_PATH)
-            if not os.path.exists(config_dir):
-                os.makedirs(config_dir, exist_ok=True)
-            with open(CONFIG_FILE_PATH, 'w') as configfile:
-                config.write(configfile)
+            self.config_service.flush()
             self.update_log(f"Konfiguracja zapisana w {CONFIG_FILE_PATH}")
             QMessageBox.information(self, "Zapisano", "Konfiguracja zapisana.")
         except Exception as e:
@@ -621,4 +628,4 @@ class MainWindow(QMainWindow):
     def scan_finished(self):self.update_log("Wątek cyklicznego skanowania zakończył pracę.");self.start_button.setEnabled(True);self.stop_button.setEnabled(False)
 
 if __name__ == '__main__':
-    app=QApplication(sys.argv);app.setOrganizationName("MojaFirmaPrzyklad");app.setApplicationName(CONFIG_DIR_NAME);window=MainWindow();window.show();sys.exit(app.exec())
+    app=QApplication(sys.argv);app.setOrganizationName("MojaFirmaPrzyklad");app.setApplicationName(CONFIG_DIR_NAME);window=MainWindow();window.show();QTimer.singleShot(0,lambda:window.report_startup_time(STARTUP_STARTED_AT));sys.exit(app.exec())
@@ -0,0 +1,197 @@
+import heapq
+from itertools import islice, repeat
+from operator import itemgetter
+import numpy as np
+
+AGGREGATED_SOURCE_LABEL = "Agregacja"
+DEFAULT_PRICE_PRECISION = 8
+DEFAULT_BOOK_DEPTH = 1000  # poziomów na stronę przekazywanych z workera do GUI
+DEFAULT_TOP_LEVELS = 10    # poziomów liczonych do nierównowagi w kafelkach dashboardu
+
+_EMPTY = np.empty(0, dtype=np.float64)
+
+
+def price_precision(level):
+    """Liczba miejsc po przecinku dla poziomu agregacji (0.01 -> 2, 0.001 -> 3); bez agregacji 8."""
+    if not level: return DEFAULT_PRICE_PRECISION
+    try:
+        return int(max(0, -np.log10(float(level))))
+    except (ValueError, TypeError):
+        return DEFAULT_PRICE_PRECISION
+
+
+def book_side_to_arrays(levels):
+    """
+    Zamienia jedną stronę order booka z ccxt ([cena, ilość, ...], ...) lub tablicę (N, 2) na dwie tablice float64.
+    Poziomy, których nie da się odczytać jako liczby, są pomijane.
+    """
+    if levels is None or len(levels) == 0: return _EMPTY, _EMPTY
+    try:
+        arr = np.asarray(levels, dtype=np.float64)
+        if arr.ndim != 2 or arr.shape[1] < 2: raise ValueError
+    except (ValueError, TypeError):
+        rows = []
+        for level in levels:
+            try:
+                rows.append((float(level[0]), float(level[1])))
+            except (ValueError, TypeError, IndexError):
+                pass
+        if not rows: return _EMPTY, _EMPTY
+        arr = np.asarray(rows, dtype=np.float64)
+    return arr[:, 0], arr[:, 1]
+
+
+class LocalOrderBook:
+    """
+    Kopia order booka jednej giełdy w tablicach NumPy (N, 2) [cena, ilość], posortowanych od najlepszej ceny,
+    trzymana w wątku workera. ccxt.pro sam nakłada delty z WebSocketu na swoją książkę - tu przepisywane jest
+    tylko `depth` najlepszych poziomów, a niezmienione migawki nie są wysyłane do GUI.
+    Migawki to nowe tablice (nigdy nie modyfikowane), więc GUI może je czytać bez blokad.
+    """
+    def __init__(self, depth=DEFAULT_BOOK_DEPTH):
+        self.depth = depth
+        self.bids = np.empty((0, 2), dtype=np.float64)
+        self.asks = np.empty((0, 2), dtype=np.float64)
+        self.timestamp = None
+
+    @staticmethod
+    def _side_array(levels, depth):
+        prices, amounts = book_side_to_arrays(levels[:depth] if levels is not None else None)
+        return np.column_stack((prices, amounts))
+
+    def update(self, orderbook):
+        """Przepisuje najlepsze poziomy z książki ccxt; zwraca True, jeśli zmieniło się cokolwiek w zakresie `depth`."""
+        bids = self._side_array(orderbook.get('bids'), self.depth)
+        asks = self._side_array(orderbook.get('asks'), self.depth)
+        self.timestamp = orderbook.get('timestamp')
+        if np.array_equal(bids, self.bids) and np.array_equal(asks, self.asks):
+            return False
+        self.bids, self.asks = bids, asks
+        return True
+
+    def snapshot(self):
+        return {'bids': self.bids, 'asks': self.asks, 'timestamp': self.timestamp}
+
+
+def aggregate_side(prices, amounts, level, is_bid, precision=None):
+    """
+    Grupuje poziomy cenowe w koszyki o szerokości `level` (bidy w dół, aski w górę) i sumuje ilości.
+    Zwraca (ceny, ilości) posortowane od najlepszej ceny. `level` = 0 oznacza brak agregacji.
+    """
+    if level and len(prices):
+        # zaokrąglenie usuwa błąd reprezentacji (np. 0.3 / 0.1 = 2.9999999999999996)
+        scaled = np.round(prices / level, 9)
+        bins = np.floor(scaled) if is_bid else np.ceil(scaled)
+        bins, inverse = np.unique(bins, return_inverse=True)
+        amounts = np.bincount(inverse, weights=amounts, minlength=len(bins))
+        prices = np.round(bins * level, price_precision(level) if precision is None else precision)
+    else:
+        order = np.argsort(prices, kind='stable')
+        prices, amounts = prices[order], amounts[order]
+    if is_bid:
+        prices, amounts = prices[::-1], amounts[::-1]
+    return prices, amounts
+
+
+def aggregate_order_books(books, level=0.0, precision=None, merged_label=None):
+    """
+    Agreguje order booki jednej lub wielu giełd ({id giełdy: order book ccxt}) w jednym przebiegu:
+    strony wszystkich giełd są łączone w wspólne tablice, a dopiero potem grupowane.
+    Zwraca {'bids': (ceny, ilości, źródła), 'asks': (...)} posortowane od najlepszej ceny.
+    Bez agregacji poziomy zachowują giełdę źródłową; po agregacji źródłem jest `merged_label`
+    (domyślnie id giełdy, gdy jest tylko jedna, w przeciwnym razie "Agregacja").
+    """
+    books = {ex_id: book for ex_id, book in sorted(books.items()) if book}
+    if merged_label is None:
+        merged_label = next(iter(books)) if len(books) == 1 else AGGREGATED_SOURCE_LABEL
+    source_names = np.asarray(list(books), dtype=object)
+    result = {}
+    for side in ('bids', 'asks'):
+        is_bid = side == 'bids'
+        price_parts, amount_parts, source_parts = [], [], []
+        for source_idx, book in enumerate(books.values()):
+            prices, amounts = book_side_to_arrays(book.get(side))
+            price_parts.append(prices)
+            amount_parts.append(amounts)
+            source_parts.append(np.full(len(prices), source_idx, dtype=np.int32))
+        prices = np.concatenate(price_parts) if price_parts else _EMPTY
+        amounts = np.concatenate(amount_parts) if amount_parts else _EMPTY
+        if level:
+            prices, amounts = aggregate_side(prices, amounts, level, is_bid, precision)
+            sources = np.full(len(prices), merged_label, dtype=object)
+        else:
+            source_idx = np.concatenate(source_parts) if source_parts else np.empty(0, dtype=np.int32)
+            # sortowanie po cenie, przy równej cenie po giełdzie (stabilna kolejność wierszy)
+            order = np.lexsort((source_idx, prices))
+            if is_bid: order = order[::-1]
+            prices, amounts, sources = prices[order], amounts[order], source_names[source_idx[order]]
+        result[side] = (prices, amounts, sources)
+    return result
+
+
+def top_of_book(orderbook, levels=DEFAULT_TOP_LEVELS):
+    """
+    Zwarta migawka szczytu order booka: najlepszy bid/ask, suma ilości `levels` najlepszych poziomów
+    z każdej strony i nierównowaga (bid - ask) / (bid + ask) w zakresie -1..1.
+    """
+    bid_prices, bid_amounts = book_side_to_arrays((orderbook.get('bids') or [])[:levels])
+    ask_prices, ask_amounts = book_side_to_arrays((orderbook.get('asks') or [])[:levels])
+    bid_volume, ask_volume = float(bid_amounts.sum()), float(ask_amounts.sum())
+    total = bid_volume + ask_volume
+    return {'bid': float(bid_prices[0]) if len(bid_prices) else None,
+            'ask': float(ask_prices[0]) if len(ask_prices) else None,
+            'bid_volume': bid_volume, 'ask_volume': ask_volume,
+            'imbalance': (bid_volume - ask_volume) / total if total else 0.0,
+            'timestamp': orderbook.get('timestamp')}
+
+
+class ConsolidatedOrderBook:
+    """
+    Skonsolidowany order book wielu giełd bez agregacji poziomów. Każda giełda trzyma swoje strony
+    posortowane od najlepszej ceny (tak przychodzą z ccxt), a do wyświetlenia scalane jest tylko `top_levels`
+    najlepszych poziomów przez k-drożne scalanie (heapq.merge) - O(N log k) zamiast sortowania wszystkich poziomów
+    wszystkich giełd. Zmiana booka jednej giełdy odświeża tylko jej listę; gdy jej szczyt się nie zmienił,
+    scalony wynik zostaje z pamięci podręcznej.
+    """
+    def __init__(self, top_levels):
+        self.top_levels = top_levels
+        self._books = {}
+        self._levels = {'bids': {}, 'asks': {}}   # strona -> {id giełdy: [(cena, ilość, id giełdy), ...]}
+        self._merged = {'bids': None, 'asks': None}
+
+    def update(self, exchange_id, book):
+        """Podmienia book giełdy; zwraca True, jeśli zmienił się widoczny szczyt którejś strony."""
+        self._books[exchange_id] = book
+        changed = False
+        for side, levels_by_exchange in self._levels.items():
+            side_levels = book.get(side) if book else None
+            prices, amounts = book_side_to_arrays(side_levels[:self.top_levels] if side_levels is not None else None)
+            levels = list(zip(prices.tolist(), amounts.tolist(), repeat(exchange_id)))
+            if levels != levels_by_exchange.get(exchange_id):
+                levels_by_exchange[exchange_id] = levels
+                self._merged[side] = None
+                changed = True
+        return changed
+
+    def remove(self, exchange_id):
+        self._books.pop(exchange_id, None)
+        for side, levels_by_exchange in self._levels.items():
+            if levels_by_exchange.pop(exchange_id, None) is not None: self._merged[side] = None
+
+    def side(self, side):
+        """Scalony szczyt strony: (ceny, ilości, źródła) - najwyżej `top_levels` poziomów od najlepszej ceny."""
+        if self._merged[side] is None:
+            is_bid = side == 'bids'
+            # kolejność giełd przy równej cenie jak w aggregate_order_books (merge jest stabilny)
+            runs = [levels for _, levels in sorted(self._levels[side].items(), reverse=is_bid)]
+            top = list(islice(heapq.merge(*runs, key=itemgetter(0), reverse=is_bid), self.top_levels))
+            self._merged[side] = (np.fromiter((level[0] for level in top), dtype=np.float64, count=len(top)),
+                                  np.fromiter((level[1] for level in top), dtype=np.float64, count=len(top)),
+                                  np.asarray([level[2] for level in top], dtype=object))
+        return self._merged[side]
+
+    def depth(self, side):
+        """Pełna głębokość strony wszystkich giełd (ceny, ilości) - bez sortowania, np. do heatmapy płynności."""
+        parts = [book_side_to_arrays(book.get(side)) for book in self._books.values() if book]
+        if not parts: return _EMPTY, _EMPTY
+        return np.concatenate([prices for prices, _ in parts]), np.concatenate([amounts for _, amounts in parts])
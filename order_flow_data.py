@@ -0,0 +1,356 @@
+import threading, time
+from collections import deque
+import numpy as np
+
+RESAMPLE_SECONDS = {"1s": 1, "5s": 5, "15s": 15, "1Min": 60, "5Min": 300, "15Min": 900, "1H": 3600}
+
+CVD_BUFFER_SIZE = 5000
+CANDLE_BUFFER_SIZE = 1000
+
+MAX_PENDING_TRADE_UPDATES = 64   # po przekroczeniu oczekujące paczki transakcji są scalane w jedną
+MAX_PENDING_ERRORS = 10
+
+TRADE_COLUMNS = ('timestamp', 'price', 'amount', 'delta')      # timestamp w sekundach, delta = +ilość (kupno) / -ilość (sprzedaż)
+CVD_COLUMNS = ('x', 'y')
+CANDLE_COLUMNS = ('x', 'open', 'high', 'low', 'close', 'delta')
+FOOTPRINT_COLUMNS = ('x', 'price', 'buy', 'sell')             # rzadki zapis: jeden wiersz na (świeca, koszyk ceny)
+
+FOOTPRINT_BUFFER_SIZE = 200000   # ~6 MB; przy ~10 koszykach na świecę to kilka godzin świec 1s
+HEATMAP_BUFFER_SIZE = 600        # kolumn (przedziałów czasu) heatmapy płynności
+HEATMAP_ROWS = 300               # koszyków ceny heatmapy
+HEATMAP_RECENTER_MARGIN = 0.2    # siatka cen jest przesuwana, gdy środek booka wejdzie w 20% przy krawędzi
+
+
+class RingBuffer:
+    """
+    Bufor cykliczny wierszy na prealokowanej tablicy NumPy. Dane trzymane są w ciągłym fragmencie tablicy
+    o podwójnej pojemności, więc view() zwraca widok bez kopiowania; gdy miejsce się skończy, ostatnie
+    wiersze przesuwane są na początek (koszt zamortyzowany). Jeden wiersz zapasu pozwala dołączyć do widoku
+    element „w toku” (np. formującą się świecę) - view_with().
+    """
+    def __init__(self, capacity, columns, dtype=np.float64):
+        self.capacity = capacity
+        self.columns = columns
+        self._data = np.zeros((2 * capacity + 1, len(columns)), dtype=dtype)
+        self._start = 0
+        self._end = 0
+
+    def __len__(self):
+        return self._end - self._start
+
+    def clear(self):
+        self._start = self._end = 0
+
+    def _make_room(self, n):
+        if self._end + n <= 2 * self.capacity: return
+        keep = min(len(self), self.capacity - n)
+        self._data[:keep] = self._data[self._end - keep:self._end]
+        self._start, self._end = 0, keep
+
+    def extend(self, rows):
+        rows = np.asarray(rows, dtype=self._data.dtype).reshape(-1, len(self.columns))
+        if len(rows) > self.capacity: rows = rows[-self.capacity:]
+        n = len(rows)
+        if n == 0: return
+        self._make_room(n)
+        self._data[self._end:self._end + n] = rows
+        self._end += n
+        if len(self) > self.capacity: self._start = self._end - self.capacity
+
+    def append(self, row):
+        self.extend(row)
+
+    def view(self):
+        """Widok (bez kopii) na zapisane wiersze, od najstarszego. Ważny do kolejnego extend()."""
+        return self._data[self._start:self._end]
+
+    def view_with(self, row):
+        """Widok z dołączonym na końcu wierszem `row`, który nie jest zapisywany w buforze."""
+        self._data[self._end] = row
+        return self._data[self._start:self._end + 1]
+
+    def column(self, name, data=None):
+        return (self.view() if data is None else data)[:, self.columns.index(name)]
+
+    def last(self):
+        return self._data[self._end - 1] if len(self) else None
+
+
+class FormingCandle:
+    """Formująca się świeca (zwarty rekord ze __slots__, aktualizowany przy każdej transakcji)."""
+    __slots__ = ('x', 'open', 'high', 'low', 'close', 'delta')
+
+    def __init__(self, x, price, delta=0.0):
+        self.x = x
+        self.open = self.high = self.low = self.close = price
+        self.delta = delta
+
+    def add(self, price, delta):
+        if price > self.high: self.high = price
+        if price < self.low: self.low = price
+        self.close = price
+        self.delta += delta
+
+    def as_row(self):
+        return (self.x, self.open, self.high, self.low, self.close, self.delta)
+
+    @classmethod
+    def from_row(cls, row):
+        candle = cls(float(row[0]), float(row[1]), float(row[5]))
+        candle.high, candle.low, candle.close = float(row[2]), float(row[3]), float(row[4])
+        return candle
+
+
+def trades_to_array(trades):
+    """Lista transakcji ccxt -> tablica (N, 4) w układzie TRADE_COLUMNS."""
+    rows = [(trade['timestamp'] / 1000.0, trade['price'], trade['amount'],
+             trade['amount'] if trade['side'] == 'buy' else -trade['amount']) for trade in trades]
+    return np.array(rows, dtype=np.float64).reshape(-1, len(TRADE_COLUMNS))
+
+
+class TradeAggregator:
+    """
+    Składa transakcje w świece, deltę i CVD - wektorowo dla całej paczki, w wątku streamu, a nie w GUI.
+    Jeden agregator jest wspólny dla wszystkich giełd streamu; wywołania add_trades() i wysyłkę wyniku
+    należy wykonywać pod `lock`, żeby kolejność paczek w kolejce zgadzała się z kolejnością agregacji.
+    """
+    def __init__(self, interval_seconds, footprint_level=None):
+        self.interval_seconds = interval_seconds
+        self.cumulative_delta = 0.0
+        self.current = None   # FormingCandle
+        self.lock = threading.Lock()
+        # Footprint: None = wyłączony, 0 = szerokość koszyka dobierana z ceny pierwszej transakcji
+        self.footprint_level = footprint_level
+        self.footprint_forming = np.empty((0, len(FOOTPRINT_COLUMNS)))
+
+    def add_trades(self, trades):
+        """
+        Zwraca {'cvd': (N, 2), 'closed': (M, 6) zamknięte świece, 'forming': wiersz formującej się świecy}
+        lub None dla pustej paczki. Transakcje spóźnione (np. z innej giełdy) trafiają do bieżącej świecy.
+        Z włączonym footprintem dochodzą 'footprint_closed' (wiersze zamkniętych świec) i 'footprint_forming'
+        (pełny footprint formującej się świecy, zastępuje poprzedni) w układzie FOOTPRINT_COLUMNS.
+        """
+        rows = trades_to_array(trades)
+        if not len(rows): return None
+        timestamps, prices, deltas = rows[:, 0], rows[:, 1], rows[:, 3]
+
+        cvd = self.cumulative_delta + np.cumsum(deltas)
+        self.cumulative_delta = float(cvd[-1])
+
+        starts = (timestamps // self.interval_seconds) * self.interval_seconds
+        np.maximum.accumulate(starts, out=starts)
+        if self.current is not None: np.maximum(starts, self.current.x, out=starts)
+
+        # granice grup transakcji o tym samym początku świecy
+        first = np.concatenate(([0], np.flatnonzero(np.diff(starts)) + 1))
+        last = np.concatenate((first[1:], [len(starts)])) - 1
+        candles = np.column_stack((starts[first], prices[first], np.maximum.reduceat(prices, first),
+                                   np.minimum.reduceat(prices, first), prices[last], np.add.reduceat(deltas, first)))
+
+        current = self.current
+        if current is not None and candles[0, 0] == current.x:
+            current.high = max(current.high, candles[0, 2])
+            current.low = min(current.low, candles[0, 3])
+            current.close = candles[0, 4]
+            current.delta += candles[0, 5]
+            candles[0] = current.as_row()
+        elif current is not None:
+            candles = np.vstack((current.as_row(), candles))
+
+        self.current = FormingCandle.from_row(candles[-1])
+        update = {'cvd': np.column_stack((timestamps, cvd)), 'closed': candles[:-1], 'forming': self.current.as_row()}
+        if self.footprint_level is not None:
+            update['footprint_closed'], update['footprint_forming'] = self._add_footprint(starts, prices, rows[:, 2], deltas > 0)
+            update['footprint_level'] = self.footprint_level
+        return update
+
+    def _add_footprint(self, starts, prices, amounts, is_buy):
+        if not self.footprint_level:
+            self.footprint_level = auto_footprint_level(prices[0])
+        level = self.footprint_level
+        bins = np.floor(np.round(prices / level, 9))
+        buy, sell = np.where(is_buy, amounts, 0.0), np.where(is_buy, 0.0, amounts)
+        # footprint formującej się świecy wchodzi do grupowania razem z nową paczką
+        forming = self.footprint_forming
+        keys = np.concatenate((forming[:, :2], np.column_stack((starts, bins * level))))
+        keys[:, 1] = np.round(keys[:, 1] / level)
+        keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        buy = np.bincount(inverse, weights=np.concatenate((forming[:, 2], buy)), minlength=len(keys))
+        sell = np.bincount(inverse, weights=np.concatenate((forming[:, 3], sell)), minlength=len(keys))
+        footprint = np.column_stack((keys[:, 0], keys[:, 1] * level, buy, sell))
+        is_forming = footprint[:, 0] == self.current.x
+        self.footprint_forming = footprint[is_forming]
+        return footprint[~is_forming], self.footprint_forming
+
+
+def auto_footprint_level(price):
+    """Szerokość koszyka footprintu, gdy agregacja OB to "Brak": ok. 1/1000-1/10000 ceny (BTC ~60000 -> 10)."""
+    return float(10 ** (np.floor(np.log10(price)) - 3)) if price > 0 else 1.0
+
+
+def auto_heatmap_level(prices, rows=HEATMAP_ROWS):
+    """Szerokość koszyka heatmapy, gdy agregacja OB to "Brak": potęga 10, przy której głębokość booka zajmuje ok. połowę wierszy."""
+    span = float(prices.max() - prices.min()) if len(prices) else 0.0
+    if span <= 0: return auto_footprint_level(float(prices[0])) if len(prices) else 1.0
+    return float(10 ** np.ceil(np.log10(span / (rows / 2))))
+
+
+class LiquidityHeatmap:
+    """
+    Historia płynności order booka: kolumna na przedział czasu (szerokość świecy), wiersz na koszyk ceny,
+    wartość = suma ilości z bidów i asków w koszyku z ostatniej migawki w przedziale.
+    Kolumny są wierszami RingBuffer, więc nowy przedział to dopisanie jednej kolumny - starsze nie są przeliczane,
+    a view() (czas x cena) trafia wprost do pg.ImageItem. Gdy cena zbliży się do krawędzi, siatka cen jest
+    przesuwana o całe wiersze. Przedziały bez zmian w booku dostają kopię poprzedniej kolumny
+    (niezmienione migawki nie są przesyłane z workera).
+    """
+    def __init__(self, interval_seconds, level=0.0, columns=HEATMAP_BUFFER_SIZE, rows=HEATMAP_ROWS):
+        self.interval_seconds = interval_seconds
+        self.level = level   # 0 -> dobór automatyczny z pierwszej migawki
+        self.rows = rows
+        self.data = RingBuffer(columns, tuple(range(rows)), dtype=np.float32)
+        self.price0 = None   # dolna krawędź siatki cen
+        self.last_slot = None
+        self.version = 0     # zmienia się przy każdym zapisie - GUI pomija niezmieniony obraz
+
+    def __len__(self):
+        return len(self.data)
+
+    def _recenter(self, mid):
+        if self.price0 is None:
+            self.price0 = (np.floor(mid / self.level) - self.rows // 2) * self.level
+            return
+        row = (mid - self.price0) / self.level
+        if self.rows * HEATMAP_RECENTER_MARGIN <= row <= self.rows * (1 - HEATMAP_RECENTER_MARGIN): return
+        shift = int(np.floor(row)) - self.rows // 2
+        history = self.data.view()
+        if abs(shift) >= self.rows:
+            history[:] = 0
+        elif shift > 0:
+            history[:, :-shift] = history[:, shift:]
+            history[:, -shift:] = 0
+        else:
+            history[:, -shift:] = history[:, :shift].copy()
+            history[:, :-shift] = 0
+        self.price0 += shift * self.level
+
+    def record(self, bids, asks, timestamp):
+        """
+        Zapisuje migawkę booka ((ceny, ilości) dla bidów i asków, w dowolnej kolejności) w kolumnie przedziału
+        `timestamp` (sekundy). Zwraca False, gdy booka nie da się umieścić na siatce (pusta strona).
+        """
+        (bid_prices, bid_amounts), (ask_prices, ask_amounts) = bids, asks
+        if not len(bid_prices) or not len(ask_prices): return False
+        prices = np.concatenate((bid_prices, ask_prices))
+        amounts = np.concatenate((bid_amounts, ask_amounts))
+        if not self.level: self.level = auto_heatmap_level(prices, self.rows)
+        self._recenter((bid_prices.max() + ask_prices.min()) / 2)
+
+        bins = np.floor(np.round((prices - self.price0) / self.level, 9)).astype(np.int64)
+        inside = (bins >= 0) & (bins < self.rows)
+        column = np.bincount(bins[inside], weights=amounts[inside], minlength=self.rows)
+
+        slot = int(timestamp // self.interval_seconds)
+        if self.last_slot is None or slot > self.last_slot:
+            if self.last_slot is not None and len(self.data):
+                gap = min(slot - self.last_slot - 1, self.data.capacity)
+                if gap > 0: self.data.extend(np.repeat(self.data.last()[None, :], gap, axis=0))
+            self.data.append(column)
+            self.last_slot = slot
+        else:
+            # ta sama (lub spóźniona) migawka w bieżącym przedziale - nadpisuje ostatnią kolumnę
+            self.data.last()[:] = column
+        self.version += 1
+        return True
+
+    def view(self):
+        """Widok (bez kopii) kolumn od najstarszej: tablica (czas, koszyk ceny)."""
+        return self.data.view()
+
+    def rect(self):
+        """Prostokąt (x, y, szerokość, wysokość) obrazu w układzie wykresu - kolumny wyśrodkowane na świecach."""
+        n = len(self.data)
+        x = (self.last_slot - n + 1) * self.interval_seconds - self.interval_seconds / 2
+        return x, self.price0, n * self.interval_seconds, self.rows * self.level
+
+
+def merge_trade_updates(updates):
+    """Scala kolejne paczki z TradeAggregator w jedną (bezstratnie w granicach buforów GUI)."""
+    if len(updates) == 1: return updates[0]
+    merged = {'cvd': np.concatenate([update['cvd'] for update in updates])[-CVD_BUFFER_SIZE:],
+              'closed': np.concatenate([update['closed'] for update in updates])[-CANDLE_BUFFER_SIZE:],
+              'forming': updates[-1]['forming']}
+    footprint_updates = [update for update in updates if 'footprint_forming' in update]
+    if footprint_updates:
+        # paczki bez footprintu (np. sprzed włączenia) nie mają wierszy footprintu - pomijane przy scalaniu
+        merged['footprint_closed'] = np.concatenate([update['footprint_closed'] for update in footprint_updates])[-FOOTPRINT_BUFFER_SIZE:]
+        merged['footprint_forming'] = footprint_updates[-1]['footprint_forming']
+        merged['footprint_level'] = footprint_updates[-1]['footprint_level']
+    return merged
+
+
+class StreamChannel:
+    """
+    Ograniczony kanał między wątkiem streamów a GUI, z jawną polityką przeciążenia:
+    - migawka order booka zastępuje poprzednią, jeszcze nieodebraną migawkę o tym samym kluczu (giełda lub para),
+    - paczki transakcji jednej pary są scalane, gdy oczekuje ich więcej niż `max_trade_updates`,
+    - z błędów zostaje najwyżej MAX_PENDING_ERRORS ostatnich.
+    Dzięki temu pamięć i czas opróżniania są ograniczone, nawet gdy GUI nie nadąża. drain() zabiera
+    wszystko naraz; liczniki i opóźnienia służą do wyświetlania stanu kanału w oknie.
+    """
+    def __init__(self, max_trade_updates=MAX_PENDING_TRADE_UPDATES):
+        self.max_trade_updates = max_trade_updates
+        self._lock = threading.Lock()
+        self._books = {}              # klucz -> (migawka, czas włożenia)
+        self._trade_updates = {}      # para -> [(paczka, czas włożenia), ...]
+        self._errors = deque(maxlen=MAX_PENDING_ERRORS)
+        self.books_received = 0
+        self.books_superseded = 0
+        self.trade_updates_received = 0
+        self.trade_updates_merged = 0
+        self.max_depth = 0
+
+    def _depth(self):
+        return len(self._books) + sum(map(len, self._trade_updates.values())) + len(self._errors)
+
+    def depth(self):
+        with self._lock:
+            return self._depth()
+
+    def put_book(self, key, snapshot):
+        with self._lock:
+            self.books_received += 1
+            if key in self._books: self.books_superseded += 1
+            self._books[key] = (snapshot, time.monotonic())
+            self.max_depth = max(self.max_depth, self._depth())
+
+    def put_trades(self, symbol, trade_update):
+        with self._lock:
+            self.trade_updates_received += 1
+            pending = self._trade_updates.setdefault(symbol, [])
+            pending.append((trade_update, time.monotonic()))
+            if len(pending) > self.max_trade_updates:
+                self.trade_updates_merged += len(pending) - 1
+                pending[:] = [(merge_trade_updates([update for update, _ in pending]), pending[0][1])]
+            self.max_depth = max(self.max_depth, self._depth())
+
+    def put_error(self, message):
+        with self._lock:
+            self._errors.append(message)
+
+    def drain(self):
+        """
+        Zabiera całą zawartość kanału: {'books': {klucz: migawka}, 'trade_updates': {para: scalona paczka},
+        'errors': [...], 'queue_latency': czas oczekiwania najstarszego elementu w sekundach lub None}.
+        """
+        with self._lock:
+            books, trade_updates, errors = self._books, self._trade_updates, list(self._errors)
+            self._books, self._trade_updates = {}, {}
+            self._errors.clear()
+        put_times = [put_time for _, put_time in books.values()]
+        put_times += [pending[0][1] for pending in trade_updates.values()]
+        return {'books': {key: snapshot for key, (snapshot, _) in books.items()},
+                'trade_updates': {symbol: merge_trade_updates([update for update, _ in pending]) for symbol, pending in trade_updates.items()},
+                'errors': errors,
+                'queue_latency': time.monotonic() - min(put_times) if put_times else None}
@@ -7,121 +7,544 @@ import pandas as pd
 import numpy as np
 import datetime
 import time
-from queue import Queue
 from threading import Thread
-from collections import deque
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QLabel, QHBoxLayout,
                              QApplication, QGroupBox, QFormLayout, QComboBox,
                              QLineEdit, QPushButton, QMessageBox, QCheckBox, QListWidget, QListWidgetItem,
-                             QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView)
-from PyQt6.QtCore import Qt, QThread, pyqtSignal as Signal, QTimer, QEvent, QPointF, QRectF
+                             QTableView, QHeaderView, QAbstractItemView, QStackedWidget, QScrollArea, QGridLayout,
+                             QFrame, QProgressBar, QSizePolicy)
+from PyQt6.QtCore import Qt, QThread, pyqtSignal as Signal, QTimer, QEvent, QPointF, QRectF, QAbstractTableModel, QModelIndex
 from PyQt6.QtGui import QFont, QPainter, QPen, QColor
+from order_flow_data import (RESAMPLE_SECONDS, CVD_BUFFER_SIZE, CANDLE_BUFFER_SIZE,
+                             FOOTPRINT_BUFFER_SIZE, CVD_COLUMNS, CANDLE_COLUMNS, FOOTPRINT_COLUMNS,
+                             RingBuffer, TradeAggregator, StreamChannel, LiquidityHeatmap)
+from order_book import (AGGREGATED_SOURCE_LABEL, DEFAULT_PRICE_PRECISION, DEFAULT_TOP_LEVELS, LocalOrderBook, ConsolidatedOrderBook,
+                        aggregate_order_books, price_precision, top_of_book)
+
+ORDER_FLOW_FPS = 10               # ile razy na sekundę kolejka jest opróżniana, a order book przerysowywany
+BOOK_TABLE_ROWS = 50
+BOOK_HEAT_BASE_COLOR = (250, 250, 250)
+BID_HEAT_COLOR, ASK_HEAT_COLOR = (160, 255, 160), (255, 160, 160)
+
+FOOTPRINT_MAX_CELLS = 6000             # powyżej (mocno oddalony widok) footprint nie jest rysowany - wystarczą świece
+FOOTPRINT_TEXT_MIN_PIXELS = (44, 11)   # minimalny rozmiar komórki (szer., wys.) w pikselach, żeby pisać liczby
+
+HEATMAP_LEVEL_PERCENTILE = 99   # górny próg kolorów heatmapy - pojedyncza ściana nie „wybiela” reszty
+HEATMAP_LUT = pg.ColorMap([0.0, 0.35, 1.0], [(255, 255, 255), (255, 190, 110), (140, 0, 40)]).getLookupTable(nPts=256)
+
+VIEW_SINGLE_PAIR = "Jedna para"
+VIEW_DASHBOARD = "Dashboard (obserwowane pary)"
+MAX_DASHBOARD_PAIRS = 24
+DASHBOARD_COLUMNS = 4
+DASHBOARD_CVD_POINTS = 600        # limit pamięci na parę: punkty CVD w kafelku
 
 pg.setConfigOption('background', 'w')
 pg.setConfigOption('foreground', 'k')
 
 class CandlestickItem(pg.GraphicsObject):
-    def __init__(self, data=[]):
+    """Świece z tablicy (N, 6) w układzie CANDLE_COLUMNS; zakres liczony przy setData, bo tablica może być widokiem bufora."""
+    def __init__(self, data=None, interval_seconds=1):
         pg.GraphicsObject.__init__(self)
-        self.data = data
+        self.data = np.empty((0, len(CANDLE_COLUMNS))) if data is None else data
+        self.interval_seconds = interval_seconds
+        self.bounds = QRectF()
         self.generatePicture()
-    def setData(self, data):
+    def setData(self, data, interval_seconds=None):
         self.data = data
+        if interval_seconds: self.interval_seconds = interval_seconds
         self.generatePicture()
         self.informViewBoundsChanged()
         self.update()
     def generatePicture(self):
         self.picture = pg.QtGui.QPicture()
         p = QPainter(self.picture)
-        if not self.data: p.end(); return
-
-        resample_map = {"1s":1, "5s":5, "15s":15, "1Min":60, "5Min":300, "15Min":900, "1H":3600}
-        interval_str = self.data[0].get('interval', '1s') if self.data else '1s'
-        interval_seconds = resample_map.get(interval_str, 1)
-        w = interval_seconds * 0.4
-
-        for d in self.data:
-            t, o, h, l, c = d['x'], d['open'], d['high'], d['low'], d['close']
-            p.setPen(pg.mkPen('k'))
+        if not len(self.data):
+            self.bounds = QRectF()
+            p.end(); return
+
+        w = self.interval_seconds * 0.4
+        up_brush, down_brush = pg.mkBrush('g'), pg.mkBrush('r')
+        p.setPen(pg.mkPen('k'))
+        for t, o, h, l, c, _ in self.data.tolist():
             if o == c:
                 p.drawLine(QPointF(t - w, o), QPointF(t + w, c))
             else:
                 p.drawLine(QPointF(t, l), QPointF(t, h))
-                p.setBrush(pg.mkBrush('g' if o < c else 'r'))
+                p.setBrush(up_brush if o < c else down_brush)
                 p.drawRect(QRectF(t - w, o, w * 2, c - o))
         p.end()
+
+        x_min, x_max = self.data[0, 0], self.data[-1, 0]
+        y_min, y_max = float(self.data[:, 3].min()), float(self.data[:, 2].max())
+        self.bounds = QRectF(x_min - w, y_min, (x_max - x_min) + 2 * w, y_max - y_min)
     def paint(self, p, *args): p.drawPicture(0, 0, self.picture)
     def boundingRect(self):
-        if not self.data: return QRectF()
-        x_values = [d['x'] for d in self.data]
-        y_lows = [d['low'] for d in self.data]
-        y_highs = [d['high'] for d in self.data]
-
-        x_min = min(x_values)
-        x_max = max(x_values)
-        y_min = np.min(y_lows)
-        y_max = np.max(y_highs)
+        return QRectF(self.bounds)
 
-        interval_str = self.data[0].get('interval', '1s') if self.data else '1s'
-        resample_map = {"1s":1, "5s":5, "15s":15, "1Min":60, "5Min":300, "15Min":900, "1H":3600}
-        interval_seconds = resample_map.get(interval_str, 1)
-        w = interval_seconds * 0.4
-
-        return QRectF(x_min - w, y_min, (x_max - x_min) + 2 * w, y_max - y_min)
 
+class FootprintItem(pg.GraphicsObject):
+    """
+    Footprint świec: komórka na (świeca, koszyk ceny) w kolorze przewagi kupna (zielony) lub sprzedaży (czerwony)
+    z intensywnością wg wolumenu, a przy dużym przybliżeniu z liczbami "sprzedaż x kupno".
+    Rysowane są tylko komórki z widocznego zakresu (wiersze posortowane po czasie - wybór przez searchsorted).
+    Zamknięte świece czytane są z RingBuffer przy każdym rysowaniu - widok bufora jest ważny tylko do kolejnego extend().
+    """
+    def __init__(self):
+        pg.GraphicsObject.__init__(self)
+        self.closed_buffer = None
+        self.forming = np.empty((0, len(FOOTPRINT_COLUMNS)))
+        self.level = 1.0
+        self.interval_seconds = 1
+        self.bounds = QRectF()
+
+    def setData(self, closed_buffer, forming, level, interval_seconds):
+        self.prepareGeometryChange()
+        self.closed_buffer, self.forming = closed_buffer, forming
+        closed = closed_buffer.view()
+        self.level, self.interval_seconds = level, interval_seconds
+        if len(closed) or len(forming):
+            x_min = closed[0, 0] if len(closed) else forming[0, 0]
+            x_max = forming[0, 0] if len(forming) else closed[-1, 0]
+            prices = np.concatenate((closed[:, 1], forming[:, 1]))
+            w = interval_seconds * 0.5
+            self.bounds = QRectF(x_min - w, prices.min(), x_max - x_min + 2 * w, prices.max() - prices.min() + level)
+        else:
+            self.bounds = QRectF()
+        self.update()
 
-class AsyncioWorker(Thread):
-    def __init__(self, exchange_id, pair_symbol, pair_id, pair_type, data_queue):
-        super().__init__()
-        self.daemon = True
+    def boundingRect(self):
+        return QRectF(self.bounds)
+
+    def visible_cells(self):
+        view_box = self.getViewBox()
+        if view_box is None: return self.forming
+        (x0, x1), (y0, y1) = view_box.viewRange()
+        closed = self.closed_buffer.view() if self.closed_buffer is not None else self.forming[:0]
+        xs = closed[:, 0]
+        lo = np.searchsorted(xs, x0 - self.interval_seconds)
+        hi = np.searchsorted(xs, x1 + self.interval_seconds, side='right')
+        cells = np.concatenate((closed[lo:hi], self.forming))
+        return cells[(cells[:, 1] + self.level >= y0) & (cells[:, 1] <= y1)]
+
+    def paint(self, p, *args):
+        cells = self.visible_cells()
+        if not len(cells) or len(cells) > FOOTPRINT_MAX_CELLS: return
+        buy, sell = cells[:, 2], cells[:, 3]
+        total = buy + sell
+        buy_share = np.divide(buy, total, out=np.full(len(total), 0.5), where=total > 0)
+        intensity = total / total.max() if total.max() > 0 else total
+        # czerwony (przewaga sprzedaży) -> zielony (przewaga kupna), krycie wg wolumenu
+        reds = (230 * (1 - buy_share)).astype(int).tolist()
+        greens = (200 * buy_share).astype(int).tolist()
+        alphas = (30 + 150 * intensity).astype(int).tolist()
+
+        w = self.interval_seconds * 0.45
+        transform = p.transform()
+        cell_rect = transform.mapRect(QRectF(0, 0, 2 * w, self.level))
+        draw_text = cell_rect.width() >= FOOTPRINT_TEXT_MIN_PIXELS[0] and cell_rect.height() >= FOOTPRINT_TEXT_MIN_PIXELS[1]
+        rects = [QRectF(x - w, price, 2 * w, self.level) for x, price in cells[:, :2].tolist()]
+        for rect, r, g, a in zip(rects, reds, greens, alphas):
+            p.fillRect(rect, QColor(r, g, 60, a))
+        if draw_text:
+            # tekst w układzie pikseli, żeby nie był odwrócony ani skalowany razem z osiami
+            p.save()
+            p.resetTransform()
+            p.setPen(QPen(QColor(20, 20, 20)))
+            for rect, sell_volume, buy_volume in zip(rects, sell.tolist(), buy.tolist()):
+                p.drawText(transform.mapRect(rect), Qt.AlignmentFlag.AlignCenter, f"{sell_volume:.3g} x {buy_volume:.3g}")
+            p.restore()
+
+
+class OrderBookTableModel(QAbstractTableModel):
+    """
+    Drabinka jednej strony order booka na stałych buforach NumPy (BOOK_TABLE_ROWS wierszy).
+    set_side() porównuje nowe bufory z poprzednimi (po zaokrągleniu do wyświetlanej precyzji) i emituje
+    dataChanged tylko dla zmienionych komórek; kolory tła (intensywność wg wartości) liczone są wektorowo.
+    """
+    HEADERS = ["Ilość", "Cena", "Wartość (USDT)", "Giełda"]
+
+    def __init__(self, heat_color, font=None, rows=BOOK_TABLE_ROWS, parent=None):
+        super().__init__(parent)
+        self.rows = rows
+        self.font = font
+        self.base_color = np.array(BOOK_HEAT_BASE_COLOR, dtype=np.float64)
+        self.heat_color = np.array(heat_color, dtype=np.float64)
+        self.precision = DEFAULT_PRICE_PRECISION
+        self.size = 0
+        self.amounts = np.full(rows, np.nan)
+        self.prices = np.full(rows, np.nan)
+        self.values = np.full(rows, np.nan)
+        self.sources = np.full(rows, '', dtype=object)
+        self.colors = np.zeros((rows, 3), dtype=np.uint8)
+        self.colored = False
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.rows
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        row, col = index.row(), index.column()
+        if not index.isValid() or row >= self.size: return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            if col == 0: return f"{self.amounts[row]:.4f}"
+            if col == 1: return f"{self.prices[row]:.{self.precision}f}"
+            if col == 2: return f"{self.values[row]:,.2f}"
+            return str(self.sources[row])
+        if role == Qt.ItemDataRole.BackgroundRole and self.colored:
+            r, g, b = self.colors[row]
+            return QColor(int(r), int(g), int(b))
+        if role == Qt.ItemDataRole.TextAlignmentRole:
+            if col in (1, 2): return Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter
+            if col == 3: return Qt.AlignmentFlag.AlignCenter # Wyrównaj giełdę do środka
+        if role == Qt.ItemDataRole.FontRole:
+            return self.font
+        return None
+
+    def clear(self):
+        self.set_side(np.empty(0), np.empty(0), np.empty(0, dtype=object), self.precision)
+
+    def set_side(self, prices, amounts, sources, precision):
+        n = min(len(prices), self.rows)
+        new_prices, new_amounts = np.full(self.rows, np.nan), np.full(self.rows, np.nan)
+        new_prices[:n], new_amounts[:n] = prices[:n], amounts[:n]
+        new_values = new_prices * new_amounts
+        new_sources = np.full(self.rows, '', dtype=object)
+        new_sources[:n] = sources[:n]
+
+        max_value = float(np.max(new_values[:n])) if n else 0.0
+        colored = max_value > 0
+        new_colors = np.zeros((self.rows, 3), dtype=np.uint8)
+        if colored:
+            strength = np.minimum(new_values[:n] / max_value * 1.5, 1.0)[:, None]
+            new_colors[:n] = (self.base_color * (1 - strength) + self.heat_color * strength).astype(np.uint8)
+
+        row_color_changed = np.any(new_colors != self.colors, axis=1) | (colored != self.colored)
+        changed_columns = [
+            self._changed(self.amounts, new_amounts, 4),
+            self._changed(self.prices, new_prices, precision) | (precision != self.precision),
+            self._changed(self.values, new_values, 2),
+            new_sources != self.sources,
+        ]
+        self.size, self.precision, self.colored = n, precision, colored
+        self.amounts, self.prices, self.values, self.sources, self.colors = new_amounts, new_prices, new_values, new_sources, new_colors
+
+        for col, text_changed in enumerate(changed_columns):
+            rows = np.flatnonzero(text_changed | row_color_changed)
+            if not len(rows): continue
+            # ciągłe zakresy zmienionych wierszy -> jeden sygnał na zakres
+            for run in np.split(rows, np.flatnonzero(np.diff(rows) > 1) + 1):
+                self.dataChanged.emit(self.index(int(run[0]), col), self.index(int(run[-1]), col))
+
+    @staticmethod
+    def _changed(old, new, decimals):
+        old, new = np.round(old, decimals), np.round(new, decimals)
+        return ~((old == new) | (np.isnan(old) & np.isnan(new)))
+
+
+class ExchangeStream:
+    """Stream jednej pary z jednej giełdy (transakcje + order book): korutyny uruchamiane w StreamLoopThread."""
+    def __init__(self, exchange_id, pair_symbol, pair_id, pair_type, data_channel, trade_aggregator):
         self.exchange_id = exchange_id
         self.pair_symbol = pair_symbol
         self.pair_id = pair_id
         self.pair_type = pair_type
-        self.data_queue = data_queue
+        self.data_channel = data_channel
+        self.trade_aggregator = trade_aggregator
+        self.tasks = []
         self._is_running = False
 
-    def run(self):
-        self._is_running = True
-        try:
-            asyncio.run(self.main_loop())
-        except Exception as e:
-            self.data_queue.put({'error': str(e)})
+    @property
+    def key(self):
+        return (self.exchange_id, self.pair_symbol)
 
-    async def main_loop(self):
-        exchange = getattr(ccxtpro, self.exchange_id)()
-        print(f"[ASYNCIO]: Uruchamianie pętli dla {self.exchange_id} ({self.pair_type}) - {self.pair_symbol} (ID: {self.pair_id})...")
+    @property
+    def label(self):
+        return self.pair_symbol
 
-        await asyncio.gather(
-            self.watch_trades_loop(exchange, self.pair_symbol),
-            self.watch_orderbook_loop(exchange, self.pair_symbol)
-        )
-        await exchange.close()
-        print(f"[ASYNCIO]: Połączenie WebSocket dla {self.exchange_id} - {self.pair_symbol} zamknięte.")
+    def start(self, loop, exchange):
+        self._is_running = True
+        print(f"[ASYNCIO]: Uruchamianie streamu {self.exchange_id} ({self.pair_type}) - {self.pair_symbol} (ID: {self.pair_id})...")
+        self.tasks = [loop.create_task(self.watch_trades_loop(exchange, self.pair_symbol)),
+                      loop.create_task(self.watch_orderbook_loop(exchange, self.pair_symbol))]
+
+    async def cancel(self):
+        self._is_running = False
+        for task in self.tasks: task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
 
     async def watch_trades_loop(self, exchange, symbol_to_watch):
         while self._is_running:
             try:
                 trades = await exchange.watch_trades(symbol_to_watch)
                 if self._is_running and trades:
-                    self.data_queue.put({'exchange_id': self.exchange_id, 'trades': trades})
+                    # Świece/delta/CVD liczone tutaj - do GUI trafiają gotowe tablice
+                    with self.trade_aggregator.lock:
+                        trade_update = self.trade_aggregator.add_trades(trades)
+                        if trade_update:
+                            self.data_channel.put_trades(self.pair_symbol, trade_update)
             except Exception as e:
-                self.data_queue.put({'error': f"Błąd (trades) z {self.exchange_id} ({self.pair_symbol}): {e}"})
+                self.data_channel.put_error(f"Błąd (trades) z {self.exchange_id} ({self.pair_symbol}): {e}")
                 await asyncio.sleep(5)
 
     async def watch_orderbook_loop(self, exchange, symbol_to_watch):
+        # Do GUI trafia zwarta migawka najlepszych poziomów (tablice NumPy), a nie cała żywa książka ccxt,
+        # którą ccxt.pro modyfikuje w tym wątku przy kolejnych deltach
+        local_book = LocalOrderBook()
         while self._is_running:
             try:
                 orderbook = await exchange.watch_order_book(symbol_to_watch)
-                if self._is_running and orderbook:
-                    self.data_queue.put({'exchange_id': self.exchange_id, 'orderbook': orderbook})
+                if self._is_running and orderbook and local_book.update(orderbook):
+                    self.data_channel.put_book(self.exchange_id, local_book.snapshot())
             except Exception as e:
-                self.data_queue.put({'error': f"Błąd (orderbook) z {self.exchange_id} ({self.pair_symbol}): {e}"})
+                self.data_channel.put_error(f"Błąd (orderbook) z {self.exchange_id} ({self.pair_symbol}): {e}")
                 await asyncio.sleep(5)
 
-    def stop(self):
+class MultiSymbolStream:
+    """
+    Stream dashboardu: transakcje i szczyt order booka wielu par jednej giełdy. Tam, gdzie giełda to wspiera,
+    używa multipleksowanych subskrypcji (watch_trades_for_symbols / watch_order_book_for_symbols), w przeciwnym
+    razie osobnych pętli na parę - wszystko w tej samej pętli asyncio. Do GUI trafiają tylko paczki
+    z TradeAggregator i zwarte migawki szczytu booka (zmienione), kluczowane symbolem pary.
+    """
+    def __init__(self, exchange_id, symbols, data_channel, interval_seconds, top_levels=DEFAULT_TOP_LEVELS):
+        self.exchange_id = exchange_id
+        self.symbols = list(symbols)
+        self.data_channel = data_channel
+        self.top_levels = top_levels
+        self.aggregators = {symbol: TradeAggregator(interval_seconds) for symbol in self.symbols}
+        self.last_tops = {}
+        self.tasks = []
         self._is_running = False
 
+    @property
+    def key(self):
+        return (self.exchange_id, tuple(self.symbols))
+
+    @property
+    def label(self):
+        return ", ".join(self.symbols)
+
+    def start(self, loop, exchange):
+        self._is_running = True
+        has = getattr(exchange, 'has', None) or {}
+        print(f"[ASYNCIO]: Uruchamianie dashboardu {self.exchange_id} - {len(self.symbols)} par "
+              f"(multipleksowanie: transakcje {bool(has.get('watchTradesForSymbols'))}, order book {bool(has.get('watchOrderBookForSymbols'))})...")
+        if has.get('watchTradesForSymbols'):
+            coroutines = [self.watch_trades_for_symbols_loop(exchange)]
+        else:
+            coroutines = [self.watch_trades_loop(exchange, symbol) for symbol in self.symbols]
+        if has.get('watchOrderBookForSymbols'):
+            coroutines.append(self.watch_order_book_for_symbols_loop(exchange))
+        else:
+            coroutines += [self.watch_order_book_loop(exchange, symbol) for symbol in self.symbols]
+        self.tasks = [loop.create_task(coroutine) for coroutine in coroutines]
+
+    async def cancel(self):
+        self._is_running = False
+        for task in self.tasks: task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    def publish_trades(self, trades):
+        trades_by_symbol = {}
+        for trade in trades:
+            trades_by_symbol.setdefault(trade.get('symbol'), []).append(trade)
+        for symbol, symbol_trades in trades_by_symbol.items():
+            aggregator = self.aggregators.get(symbol)
+            if aggregator is None: continue
+            trade_update = aggregator.add_trades(symbol_trades)
+            if trade_update: self.data_channel.put_trades(symbol, trade_update)
+
+    def publish_book(self, symbol, orderbook):
+        if symbol not in self.aggregators: return
+        top = top_of_book(orderbook, self.top_levels)
+        comparable = (top['bid'], top['ask'], top['bid_volume'], top['ask_volume'])
+        if self.last_tops.get(symbol) == comparable: return
+        self.last_tops[symbol] = comparable
+        self.data_channel.put_book(symbol, top)
+
+    async def watch_trades_for_symbols_loop(self, exchange):
+        while self._is_running:
+            try:
+                trades = await exchange.watch_trades_for_symbols(self.symbols)
+                if self._is_running and trades: self.publish_trades(trades)
+            except Exception as e:
+                self.data_channel.put_error(f"Błąd (trades) z {self.exchange_id}: {e}")
+                await asyncio.sleep(5)
+
+    async def watch_trades_loop(self, exchange, symbol):
+        while self._is_running:
+            try:
+                trades = await exchange.watch_trades(symbol)
+                if self._is_running and trades: self.publish_trades(trades)
+            except Exception as e:
+                self.data_channel.put_error(f"Błąd (trades) z {self.exchange_id} ({symbol}): {e}")
+                await asyncio.sleep(5)
+
+    async def watch_order_book_for_symbols_loop(self, exchange):
+        while self._is_running:
+            try:
+                orderbook = await exchange.watch_order_book_for_symbols(self.symbols)
+                if self._is_running and orderbook: self.publish_book(orderbook.get('symbol'), orderbook)
+            except Exception as e:
+                self.data_channel.put_error(f"Błąd (orderbook) z {self.exchange_id}: {e}")
+                await asyncio.sleep(5)
+
+    async def watch_order_book_loop(self, exchange, symbol):
+        while self._is_running:
+            try:
+                orderbook = await exchange.watch_order_book(symbol)
+                if self._is_running and orderbook: self.publish_book(symbol, orderbook)
+            except Exception as e:
+                self.data_channel.put_error(f"Błąd (orderbook) z {self.exchange_id} ({symbol}): {e}")
+                await asyncio.sleep(5)
+
+
+class PairFlowTile(QFrame):
+    """Kafelek dashboardu jednej pary: cena, delta bieżącej świecy, CVD, nierównowaga szczytu booka i mini-wykres CVD."""
+    def __init__(self, symbol, parent=None):
+        super().__init__(parent)
+        self.symbol = symbol
+        self.setFrameShape(QFrame.Shape.StyledPanel)
+        self.setFixedWidth(260)
+        self.setSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Fixed)
+        # Stały limit pamięci na parę - kafelek nie trzyma transakcji ani historii świec
+        self.cvd_data = RingBuffer(DASHBOARD_CVD_POINTS, CVD_COLUMNS)
+        self.current_candle = None
+        self.top = None
+        self.dirty = False
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(4, 4, 4, 4)
+        layout.setSpacing(2)
+        title = QLabel(symbol)
+        title_font = title.font(); title_font.setBold(True); title.setFont(title_font)
+        layout.addWidget(title)
+        self.price_label = QLabel("Cena: -")
+        self.quote_label = QLabel("Bid / Ask: -")
+        self.delta_label = QLabel("Delta świecy: -")
+        self.cvd_label = QLabel("CVD: -")
+        for label in (self.price_label, self.quote_label, self.delta_label, self.cvd_label): layout.addWidget(label)
+        self.imbalance_bar = QProgressBar()
+        self.imbalance_bar.setRange(0, 200)
+        self.imbalance_bar.setValue(100)
+        self.imbalance_bar.setFormat("Nierównowaga: -")
+        layout.addWidget(self.imbalance_bar)
+        self.cvd_plot = pg.PlotWidget()
+        self.cvd_plot.hideAxis('left'); self.cvd_plot.hideAxis('bottom')
+        self.cvd_plot.setMouseEnabled(x=False, y=False)
+        self.cvd_plot.setMenuEnabled(False)
+        self.cvd_plot.setFixedHeight(60)
+        self.cvd_curve = self.cvd_plot.plot(pen=pg.mkPen('g', width=1))
+        layout.addWidget(self.cvd_plot)
+
+    def add_trade_update(self, trade_update):
+        self.cvd_data.extend(trade_update['cvd'])
+        self.current_candle = trade_update['forming']
+        self.dirty = True
+
+    def set_top(self, top):
+        self.top = top
+        self.dirty = True
+
+    def refresh_labels(self):
+        if not self.dirty: return
+        self.dirty = False
+        if self.current_candle is not None:
+            self.price_label.setText(f"Cena: {self.current_candle[4]:g}")
+            self.delta_label.setText(f"Delta świecy: {self.current_candle[5]:+.4f}")
+        if len(self.cvd_data):
+            self.cvd_label.setText(f"CVD: {self.cvd_data.last()[1]:+.4f}")
+        if self.top is not None:
+            imbalance = self.top['imbalance']
+            self.imbalance_bar.setValue(int(round((imbalance + 1) * 100)))
+            self.imbalance_bar.setFormat(f"Nierównowaga: {imbalance * 100:+.0f}%")
+            self.quote_label.setText(f"Bid / Ask: {self.top['bid']} / {self.top['ask']}")
+
+    def refresh_plot(self):
+        if len(self.cvd_data):
+            cvd = self.cvd_data.view()
+            self.cvd_curve.setData(cvd[:, 0], cvd[:, 1])
+
+
+class StreamLoopThread(Thread):
+    """
+    Jeden wątek z jedną pętlą asyncio dla wszystkich streamów order flow. Streamy można dodawać i usuwać
+    w trakcie działania (add_stream/remove_stream, wywoływane z wątku GUI); połączenia jednej giełdy
+    współdzielą instancję ccxt.pro, zamykaną, gdy usunięto jej ostatni stream. Usunięcie streamu anuluje
+    jego zadania, więc oczekujące watch_* kończą się od razu, a nie przy następnej wiadomości.
+    """
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.loop = asyncio.new_event_loop()
+        self.exchanges = {}   # id giełdy -> instancja ccxt.pro
+        self.streams = {}     # (id giełdy, symbol) -> ExchangeStream
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+    def add_stream(self, stream):
+        return asyncio.run_coroutine_threadsafe(self._add_stream(stream), self.loop)
+
+    def remove_stream(self, exchange_id, pair_symbol):
+        return asyncio.run_coroutine_threadsafe(self._remove_stream((exchange_id, pair_symbol)), self.loop)
+
+    def remove_all_streams(self):
+        return asyncio.run_coroutine_threadsafe(self._remove_all_streams(), self.loop)
+
+    def shutdown(self):
+        """Zamyka wszystkie połączenia i kończy pętlę (bez czekania w wątku GUI)."""
+        if not self.loop.is_closed():
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop)
+
+    async def _add_stream(self, stream):
+        if stream.key in self.streams: return
+        exchange = self.exchanges.get(stream.exchange_id)
+        if exchange is None:
+            try:
+                exchange = self.exchanges[stream.exchange_id] = getattr(ccxtpro, stream.exchange_id)()
+            except Exception as e:
+                stream.data_channel.put_error(f"Błąd uruchamiania streamu {stream.exchange_id}: {e}")
+                return
+        self.streams[stream.key] = stream
+        stream.start(self.loop, exchange)
+
+    async def _remove_stream(self, key):
+        stream = self.streams.pop(key, None)
+        if stream is None: return
+        await stream.cancel()
+        if not any(other.exchange_id == stream.exchange_id for other in self.streams.values()):
+            exchange = self.exchanges.pop(stream.exchange_id, None)
+            if exchange is not None:
+                try:
+                    await exchange.close()
+                except Exception as e:
+                    print(f"[ASYNCIO]: Błąd zamykania połączenia {stream.exchange_id}: {e}")
+        print(f"[ASYNCIO]: Stream {stream.exchange_id} - {stream.label} zamknięty.")
+
+    async def _remove_all_streams(self):
+        for key in list(self.streams):
+            await self._remove_stream(key)
+
+    async def _shutdown(self):
+        await self._remove_all_streams()
+        # poczekaj też na usuwanie streamów zlecone wcześniej (np. stop_stream tuż przed zamknięciem okna)
+        pending = [task for task in asyncio.all_tasks(self.loop) if task is not asyncio.current_task()]
+        await asyncio.gather(*pending, return_exceptions=True)
+        self.loop.stop()
+
 class FetchMarketsThread(QThread):
     markets_fetched = Signal(list)
     error_occurred = Signal(str)
@@ -178,12 +601,14 @@ class OrderFlowWindow(QMainWindow):
         self.setWindowTitle("Analiza Order Flow")
         self.setGeometry(200, 200, 1600, 900)
 
-        self.worker_thread = None
-        self.active_workers = {}
+        self.stream_loop = None   # StreamLoopThread, tworzony przy pierwszym starcie i używany ponownie
+        self.active_streams = {}
+        self.dashboard_tiles = {}     # symbol -> PairFlowTile
         self.fetch_markets_thread = None
-        self.data_queue = Queue()
 
         self.current_order_books = {}
+        self.aggregation_level = 0.0
+        self.price_precision = price_precision(0.0)
 
         self.table_font = QFont()
         self.table_font.setPointSize(9)
@@ -208,26 +633,43 @@ class OrderFlowWindow(QMainWindow):
         Zwraca liczbę miejsc po przecinku dla wyświetlania ceny w tabeli Order Booka,
         w zależności od wybranego poziomu agregacji.
         """
+        return price_precision(self.get_aggregation_level())
+
+    def get_aggregation_level(self):
         aggregation_level_str = self.aggregation_combo.currentText()
-        if aggregation_level_str == "Brak":
-            return 8 # Domyślna precyzja dla 'Brak' (można dostosować)
+        if aggregation_level_str == "Brak": return 0.0
         try:
-            # Oblicz liczbę miejsc po przecinku na podstawie logarytmu
-            # np. 0.01 -> 2, 0.001 -> 3, 0.0001 -> 4
-            # Używamy max(0, ...) aby zapewnić nieujemną precyzję
-            return int(max(0, -np.log10(float(aggregation_level_str))))
-        except (ValueError, TypeError): # Obsłuż błędy konwersji, jeśli level nie jest liczbą
-            return 8
+            return float(aggregation_level_str)
+        except ValueError:
+            return 0.0
 
     def reset_data_structures(self):
-        self.cumulative_delta = 0
-        self.current_candle = {}
-
-        self.cvd_data = deque(maxlen=5000)
-        self.candle_data = deque(maxlen=1000)
+        self.current_candle = None   # wiersz formującej się świecy (CANDLE_COLUMNS) z agregatora w wątku streamu
+
+        # Prealokowane bufory kolumnowe - wykresy dostają widoki bez kopiowania
+        self.cvd_data = RingBuffer(CVD_BUFFER_SIZE, CVD_COLUMNS)
+        self.candle_data = RingBuffer(CANDLE_BUFFER_SIZE, CANDLE_COLUMNS)
+        # Footprint: zamknięte świece w rzadkim zapisie (x, cena, kupno, sprzedaż) + footprint formującej się świecy
+        self.footprint_data = RingBuffer(FOOTPRINT_BUFFER_SIZE, FOOTPRINT_COLUMNS)
+        self.footprint_forming = np.empty((0, len(FOOTPRINT_COLUMNS)))
+        self.footprint_level = None
+        # Historia płynności (tworzona przy starcie streamu, gdy zna już interwał i poziom agregacji)
+        self.liquidity_heatmap = None
+        self.heatmap_drawn_version = None
+        self.heatmap_drawn_slot = None
+        self.heatmap_levels = (0.0, 1.0)
 
         self.current_order_books = {}
-        self.active_workers = {}
+        self.consolidated_book = ConsolidatedOrderBook(BOOK_TABLE_ROWS)   # "Wszystkie aktywne giełdy" bez agregacji
+        self.active_streams = {}
+        self.dashboard_active = False
+
+        # Nowy kanał na każdą sesję - dane z zatrzymywanych streamów nie trafią do nowej
+        self.data_channel = StreamChannel()
+        self.book_updates_rendered = 0
+        self.book_latency_ms = None    # od znacznika czasu giełdy do narysowania
+        self.trade_latency_ms = None
+        self.queue_latency_ms = None
 
     def setup_ui(self):
         self.setup_controls_panel()
@@ -259,6 +701,18 @@ class OrderFlowWindow(QMainWindow):
         self.delta_mode_combo.currentTextChanged.connect(self.redraw_plots)
         form_layout.addRow("Tryb Delty:", self.delta_mode_combo)
 
+        self.footprint_checkbox = QCheckBox("Footprint świec (wolumen na poziomach ceny)")
+        form_layout.addRow(self.footprint_checkbox)
+
+        self.heatmap_checkbox = QCheckBox("Heatmapa płynności order booka")
+        self.heatmap_checkbox.toggled.connect(self.on_heatmap_toggled)
+        form_layout.addRow(self.heatmap_checkbox)
+
+        self.view_mode_combo = QComboBox()
+        self.view_mode_combo.addItems([VIEW_SINGLE_PAIR, VIEW_DASHBOARD])
+        self.view_mode_combo.currentTextChanged.connect(self.on_view_mode_changed)
+        form_layout.addRow("Widok:", self.view_mode_combo)
+
         self.aggregation_combo = QComboBox()
         self.aggregation_combo.addItems([
             "Brak",
@@ -346,33 +800,34 @@ class OrderFlowWindow(QMainWindow):
         bids_container = QWidget()
         bids_layout = QVBoxLayout(bids_container)
         bids_layout.setContentsMargins(0,0,0,0)
-        self.bids_table = QTableWidget()
+        self.bids_table = QTableView()
         bids_layout.addWidget(QLabel("Kupno (Bids)"))
         bids_layout.addWidget(self.bids_table)
 
         asks_container = QWidget()
         asks_layout = QVBoxLayout(asks_container)
         asks_layout.setContentsMargins(0,0,0,0)
-        self.asks_table = QTableWidget()
+        self.asks_table = QTableView()
         asks_layout.addWidget(QLabel("Sprzedaż (Asks)"))
         asks_layout.addWidget(self.asks_table)
 
         # Ustawienie tabel order booka - teraz 4 kolumny!
-        self.setup_orderbook_table(self.bids_table, QColor(230, 255, 230))
-        self.setup_orderbook_table(self.asks_table, QColor(255, 230, 230))
+        self.bids_model = OrderBookTableModel(BID_HEAT_COLOR, self.table_font, parent=self)
+        self.asks_model = OrderBookTableModel(ASK_HEAT_COLOR, self.table_font, parent=self)
+        self.setup_orderbook_table(self.bids_table, self.bids_model, QColor(230, 255, 230))
+        self.setup_orderbook_table(self.asks_table, self.asks_model, QColor(255, 230, 230))
 
         tables_layout.addWidget(bids_container)
         tables_layout.addWidget(asks_container)
         ob_layout.addLayout(tables_layout)
 
+        self.orderbook_widget = orderbook_widget
         self.main_layout.addWidget(orderbook_widget)
 
-    def setup_orderbook_table(self, table, color):
-        table.setColumnCount(4) # Zmieniono na 4 kolumny
-        table.setHorizontalHeaderLabels(["Ilość", "Cena", "Wartość (USDT)", "Giełda"]) # Nowy nagłówek
+    def setup_orderbook_table(self, table, model, color):
+        table.setModel(model)
         table.verticalHeader().setVisible(False)
-        table.setRowCount(50)
-        table.setStyleSheet(f"QTableWidget {{ background-color: {color.name()}; gridline-color: #d0d0d0; }}"
+        table.setStyleSheet(f"QTableView {{ background-color: {color.name()}; gridline-color: #d0d0d0; }}"
                             f"QHeaderView::section {{ background-color: #f0f0f0; }}")
 
         header = table.horizontalHeader()
@@ -405,16 +860,82 @@ class OrderFlowWindow(QMainWindow):
 
         plots_layout.addWidget(self.price_plot_widget, stretch=3)
         plots_layout.addWidget(self.cvd_plot_widget, stretch=1)
-        self.main_layout.addWidget(plots_widget, 1)
+
+        # Dashboard wielu par - kafelki tworzone przy starcie streamu
+        dashboard_scroll = QScrollArea()
+        dashboard_scroll.setWidgetResizable(True)
+        dashboard_widget = QWidget()
+        self.dashboard_layout = QGridLayout(dashboard_widget)
+        self.dashboard_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
+        dashboard_scroll.setWidget(dashboard_widget)
+
+        self.view_stack = QStackedWidget()
+        self.view_stack.addWidget(plots_widget)
+        self.view_stack.addWidget(dashboard_scroll)
+
+        view_container = QWidget()
+        view_layout = QVBoxLayout(view_container)
+        view_layout.setContentsMargins(0, 0, 0, 0)
+        view_layout.addWidget(self.view_stack, 1)
+        self.book_stats_label = QLabel()
+        view_layout.addWidget(self.book_stats_label)
+        self.main_layout.addWidget(view_container, 1)
 
     def start_stream(self):
-        if self.active_workers:
+        if self.active_streams:
             QMessageBox.warning(self, "Stream aktywny", "Stream już działa.")
             return
 
+        if self.view_mode_combo.currentText() == VIEW_DASHBOARD:
+            if not self.create_dashboard_streams(): return
+        elif not self.create_pair_streams(): return
+
+        stream_loop = self.get_stream_loop()
+        for stream in self.active_streams.values():
+            stream_loop.add_stream(stream)
+
+        self.update_book_stats_label()
+        self.update_timer.start(1000 // ORDER_FLOW_FPS)
+
+        self.start_button.setEnabled(False)
+        self.stop_button.setEnabled(True)
+        self.exchange_combo.setEnabled(False)
+        self.resample_combo.setEnabled(False)
+        self.delta_mode_combo.setEnabled(False)
+        self.aggregation_combo.setEnabled(False)
+        self.ob_source_combo.setEnabled(False)
+        self.view_mode_combo.setEnabled(False)
+        self.footprint_checkbox.setEnabled(False)
+        self.available_pairs_list.setEnabled(False)
+        self.watchlist.setEnabled(False)
+        self.refresh_markets_button.setEnabled(False)
+
+
+    def stop_stream(self):
+        if self.stream_loop and self.active_streams:
+            self.stream_loop.remove_all_streams()
+        self.active_streams = {}
+
+        self.update_timer.stop()
+
+        self.start_button.setEnabled(True)
+        self.stop_button.setEnabled(False)
+        self.exchange_combo.setEnabled(True)
+        self.resample_combo.setEnabled(True)
+        self.delta_mode_combo.setEnabled(True)
+        self.aggregation_combo.setEnabled(True)
+        self.ob_source_combo.setEnabled(True)
+        self.view_mode_combo.setEnabled(True)
+        self.footprint_checkbox.setEnabled(True)
+        self.available_pairs_list.setEnabled(True)
+        self.watchlist.setEnabled(True)
+        self.refresh_markets_button.setEnabled(True)
+        self.on_view_mode_changed(self.view_mode_combo.currentText())
+
+    def create_pair_streams(self):
         current_item = self.watchlist.currentItem()
         if not current_item:
-            QMessageBox.warning(self, "Brak pary", "Najpierw dodaj parę do listy obserwowanych i ją zaznacz."); return
+            QMessageBox.warning(self, "Brak pary", "Najpierw dodaj parę do listy obserwowanych i ją zaznacz."); return False
 
         market_data = current_item.data(Qt.ItemDataRole.UserRole)
         pair_symbol = market_data['symbol']
@@ -425,11 +946,21 @@ class OrderFlowWindow(QMainWindow):
 
         self.price_plot_widget.clear()
         self.cvd_plot_widget.clear()
-        self.asks_table.clearContents()
-        self.bids_table.clearContents()
+        self.asks_model.clear()
+        self.bids_model.clear()
+
+        # Heatmapa: jeden ImageItem pod świecami zamiast osobnych elementów na komórki
+        self.heatmap_item = pg.ImageItem(axisOrder='col-major')
+        self.heatmap_item.setLookupTable(HEATMAP_LUT)
+        self.heatmap_item.setZValue(-10)
+        self.heatmap_item.setVisible(self.heatmap_checkbox.isChecked())
+        self.price_plot_widget.addItem(self.heatmap_item)
+        self.liquidity_heatmap = LiquidityHeatmap(RESAMPLE_SECONDS.get(self.resample_combo.currentText(), 1), self.aggregation_level)
 
         self.candlestick_item = CandlestickItem()
         self.price_plot_widget.addItem(self.candlestick_item)
+        self.footprint_item = FootprintItem()
+        self.price_plot_widget.addItem(self.footprint_item)
 
         self.cvd_plot_line = self.cvd_plot_widget.plot(pen=pg.mkPen('g', width=2))
         self.delta_bar_item = pg.BarGraphItem(x=[], height=[], width=0.8, brushes=[])
@@ -437,88 +968,101 @@ class OrderFlowWindow(QMainWindow):
 
 
         selected_ob_source = self.ob_source_combo.currentText()
+        # Koszyk ceny footprintu = poziom agregacji order booka ("Brak" -> 0, czyli dobór automatyczny wg ceny)
+        footprint_level = self.aggregation_level if self.footprint_checkbox.isChecked() else None
+        trade_aggregator = TradeAggregator(RESAMPLE_SECONDS.get(self.resample_combo.currentText(), 1), footprint_level)
 
         if selected_ob_source == "Wybrana giełda":
             selected_exchange_id = self.exchange_options[self.exchange_combo.currentText()]['id_ccxt']
-            worker = AsyncioWorker(selected_exchange_id, pair_symbol, pair_id, pair_type, self.data_queue)
-            self.active_workers[selected_exchange_id] = worker
-            worker.start()
+            self.active_streams[selected_exchange_id] = ExchangeStream(selected_exchange_id, pair_symbol, pair_id, pair_type, self.data_channel, trade_aggregator)
         elif selected_ob_source == "Wszystkie aktywne giełdy":
             self.current_order_books = {}
             for ex_name, ex_data in self.exchange_options.items():
                 exchange_id = ex_data['id_ccxt']
                 if ex_data.get('id_ccxt') in ['binance', 'binanceusdm', 'bybit']:
-                     worker = AsyncioWorker(exchange_id, pair_symbol, pair_id, pair_type, self.data_queue)
-                     self.active_workers[exchange_id] = worker
-                     worker.start()
+                     self.active_streams[exchange_id] = ExchangeStream(exchange_id, pair_symbol, pair_id, pair_type, self.data_channel, trade_aggregator)
                 else:
                     print(f"Giełda {ex_name} ({exchange_id}) nie jest aktualnie wspierana dla streamowania.")
 
-            if not self.active_workers:
+            if not self.active_streams:
                 QMessageBox.warning(self, "Brak streamów", "Brak aktywnych giełd do streamowania dla tej pary. Sprawdź konfigurację giełd i listę obserwowanych par.")
-                return
-
+                return False
+        return True
+
+    def create_dashboard_streams(self):
+        symbols = [self.watchlist.item(i).data(Qt.ItemDataRole.UserRole)['symbol'] for i in range(self.watchlist.count())
+                   if self.watchlist.item(i).data(Qt.ItemDataRole.UserRole)]
+        if not symbols:
+            QMessageBox.warning(self, "Brak par", "Dodaj pary do listy obserwowanych, aby uruchomić dashboard."); return False
+        if len(symbols) > MAX_DASHBOARD_PAIRS:
+            QMessageBox.information(self, "Limit par", f"Dashboard obsługuje maksymalnie {MAX_DASHBOARD_PAIRS} par - pozostałe zostaną pominięte.")
+            symbols = symbols[:MAX_DASHBOARD_PAIRS]
 
-        self.update_timer.start(500)
-
-        self.start_button.setEnabled(False)
-        self.stop_button.setEnabled(True)
-        self.exchange_combo.setEnabled(False)
-        self.resample_combo.setEnabled(False)
-        self.delta_mode_combo.setEnabled(False)
-        self.aggregation_combo.setEnabled(False)
-        self.ob_source_combo.setEnabled(False)
-        self.available_pairs_list.setEnabled(False)
-        self.watchlist.setEnabled(False)
-        self.refresh_markets_button.setEnabled(False)
-
-
-    def stop_stream(self):
-        for exchange_id, worker in self.active_workers.items():
-            if worker and worker.is_alive():
-                worker.stop()
-        self.active_workers = {}
-
-        self.update_timer.stop()
-
-        self.start_button.setEnabled(True)
-        self.stop_button.setEnabled(False)
-        self.exchange_combo.setEnabled(True)
-        self.resample_combo.setEnabled(True)
-        self.delta_mode_combo.setEnabled(True)
-        self.aggregation_combo.setEnabled(True)
-        self.ob_source_combo.setEnabled(True)
-        self.available_pairs_list.setEnabled(True)
-        self.watchlist.setEnabled(True)
-        self.refresh_markets_button.setEnabled(True)
+        self.reset_data_structures()
+        self.asks_model.clear()
+        self.bids_model.clear()
+        self.build_dashboard_tiles(symbols)
+
+        exchange_id = self.exchange_options[self.exchange_combo.currentText()]['id_ccxt']
+        interval_seconds = RESAMPLE_SECONDS.get(self.resample_combo.currentText(), 1)
+        self.active_streams[exchange_id] = MultiSymbolStream(exchange_id, symbols, self.data_channel, interval_seconds)
+        self.dashboard_active = True
+        return True
+
+    def build_dashboard_tiles(self, symbols):
+        for tile in self.dashboard_tiles.values():
+            self.dashboard_layout.removeWidget(tile)
+            tile.deleteLater()
+        self.dashboard_tiles = {}
+        for idx, symbol in enumerate(symbols):
+            tile = PairFlowTile(symbol)
+            self.dashboard_layout.addWidget(tile, idx // DASHBOARD_COLUMNS, idx % DASHBOARD_COLUMNS)
+            self.dashboard_tiles[symbol] = tile
+
+    def on_view_mode_changed(self, mode):
+        dashboard = mode == VIEW_DASHBOARD
+        self.view_stack.setCurrentIndex(1 if dashboard else 0)
+        self.orderbook_widget.setVisible(not dashboard)
+        self.ob_source_combo.setEnabled(not dashboard)
+        self.aggregation_combo.setEnabled(not dashboard)
 
     def process_queue(self):
-        start_time = time.time()
-        has_updates = False
-        processed_count = 0
-        max_process_per_call = 50
-
-        while not self.data_queue.empty() and processed_count < max_process_per_call:
-            if (time.time() - start_time) > 0.1:
-                break
-            try:
-                data = self.data_queue.get_nowait()
-            except Exception:
-                break
-
-            has_updates = True
-            processed_count += 1
-
-            exchange_id = data.get('exchange_id')
-            if exchange_id:
-                if 'trades' in data:
-                    self.process_trades(data['trades'])
-                if 'orderbook' in data:
-                    self.current_order_books[exchange_id] = data['orderbook']
-                    self.aggregate_and_update_display()
-            elif 'error' in data:
-                QMessageBox.critical(self, "Błąd Streamu", data['error'])
-                self.stop_stream()
+        # Kanał oddaje wszystko naraz: najnowszy book z każdej giełdy i jedną scaloną paczkę transakcji
+        batch = self.data_channel.drain()
+        now_ms = time.time() * 1000
+        if batch['queue_latency'] is not None:
+            self.queue_latency_ms = batch['queue_latency'] * 1000
+
+        for symbol, trade_update in batch['trade_updates'].items():
+            if self.dashboard_active:
+                tile = self.dashboard_tiles.get(symbol)
+                if tile: tile.add_trade_update(trade_update)
+            else:
+                self.process_trade_update(trade_update)
+            self.trade_latency_ms = now_ms - trade_update['cvd'][-1, 0] * 1000
+
+        if batch['books']:
+            self.book_updates_rendered += 1
+            if self.dashboard_active:
+                for symbol, top in batch['books'].items():
+                    tile = self.dashboard_tiles.get(symbol)
+                    if tile: tile.set_top(top)
+            else:
+                self.current_order_books.update(batch['books'])
+                if self.uses_consolidated_book():
+                    for exchange_id, book in batch['books'].items(): self.consolidated_book.update(exchange_id, book)
+                depth = self.aggregate_and_update_display()
+                if self.liquidity_heatmap is not None and self.heatmap_checkbox.isChecked():
+                    self.liquidity_heatmap.record(depth['bids'], depth['asks'], time.time())
+            book_timestamps = [book['timestamp'] for book in batch['books'].values() if book.get('timestamp')]
+            if book_timestamps: self.book_latency_ms = now_ms - max(book_timestamps)
+
+        if batch['errors']:
+            QMessageBox.critical(self, "Błąd Streamu", batch['errors'][0])
+            self.stop_stream()
+
+        for tile in self.dashboard_tiles.values(): tile.refresh_labels()
+        self.update_book_stats_label()
 
         current_time = time.time()
         if (current_time - self.last_plot_update_time) * 1000 >= self.plot_update_interval_ms:
@@ -526,245 +1070,96 @@ class OrderFlowWindow(QMainWindow):
             self.last_plot_update_time = current_time
 
 
-    def process_trades(self, trades):
-        resample_map = {"1s":1, "5s":5, "15s":15, "1Min":60, "5Min":300, "15Min":900, "1H":3600}
-        interval = resample_map.get(self.resample_combo.currentText(), 1)
-
-        for trade in trades:
-            timestamp = trade['timestamp'] / 1000.0
-            price = trade['price']
-            amount = trade['amount']
-
-            delta = amount if trade['side'] == 'buy' else -amount
-
-            self.cumulative_delta += delta
-            self.cvd_data.append({'x': timestamp, 'y': self.cumulative_delta})
-
-            candle_start_ts = int(timestamp / interval) * interval
-
-            if not self.current_candle or candle_start_ts != self.current_candle.get('x'):
-                if self.current_candle:
-                    self.candle_data.append(self.current_candle)
-                self.current_candle = {
-                    'x': candle_start_ts,
-                    'open': price,
-                    'high': price,
-                    'low': price,
-                    'close': price,
-                    'delta': delta,
-                    'interval': self.resample_combo.currentText()
-                }
-            else:
-                self.current_candle['high'] = max(self.current_candle['high'], price)
-                self.current_candle['low'] = min(self.current_candle['low'], price)
-                self.current_candle['close'] = price
-                self.current_candle['delta'] += delta
+    def update_book_stats_label(self):
+        channel = self.data_channel
+        coalesced = channel.books_received - self.book_updates_rendered
+        latency = lambda value: f"{value:.0f} ms" if value is not None else "-"
+        self.book_stats_label.setText(
+            f"Aktualizacje OB: odebrane {channel.books_received}, narysowane {self.book_updates_rendered}, "
+            f"pominięte (scalone) {coalesced} | Transakcje: paczek {channel.trade_updates_received}, scalonych {channel.trade_updates_merged}\n"
+            f"Kolejka: {channel.depth()} (maks. {channel.max_depth}), oczekiwanie {latency(self.queue_latency_ms)} | "
+            f"Opóźnienie od giełdy: OB {latency(self.book_latency_ms)}, transakcje {latency(self.trade_latency_ms)}")
+
+    def process_trade_update(self, trade_update):
+        self.cvd_data.extend(trade_update['cvd'])
+        self.candle_data.extend(trade_update['closed'])
+        self.current_candle = trade_update['forming']
+        if 'footprint_forming' in trade_update:
+            self.footprint_data.extend(trade_update['footprint_closed'])
+            self.footprint_forming = trade_update['footprint_forming']
+            self.footprint_level = trade_update['footprint_level']
+
+    def uses_consolidated_book(self):
+        return self.ob_source_combo.currentText() == "Wszystkie aktywne giełdy" and not self.aggregation_level
+
+    def sync_consolidated_book(self):
+        # Po przełączeniu w tryb skonsolidowany - book uzupełniany z ostatnich migawek (w innych trybach nie jest aktualizowany)
+        if not self.uses_consolidated_book(): return
+        for exchange_id, book in self.current_order_books.items(): self.consolidated_book.update(exchange_id, book)
 
     def aggregate_and_update_display(self):
-        selected_ob_source = self.ob_source_combo.currentText()
-        aggregation_level_str = self.aggregation_combo.currentText()
-        aggregation_level = 0.0
-        if aggregation_level_str != "Brak":
-            try:
-                aggregation_level = float(aggregation_level_str)
-            except ValueError:
-                aggregation_level = 0.0
-
-        # Finalne listy do wyświetlenia w tabelach
-        final_bids_display = []
-        final_asks_display = []
-
-        if selected_ob_source == "Wybrana giełda":
+        # Zwraca pełną głębokość wyświetlanego booka {'bids': (ceny, ilości), 'asks': ...} dla heatmapy płynności
+        if self.uses_consolidated_book():
+            # Bez agregacji: scalany jest tylko szczyt booków (k-drożnie), zamiast sortowania wszystkich poziomów
+            for side, model in (('bids', self.bids_model), ('asks', self.asks_model)):
+                model.set_side(*self.consolidated_book.side(side), self.price_precision)
+            return {side: self.consolidated_book.depth(side) for side in ('bids', 'asks')}
+
+        # Poziom agregacji i precyzja są zapamiętane przy zmianie ustawienia - tu tylko agregacja w NumPy
+        if self.ob_source_combo.currentText() == "Wybrana giełda":
             selected_exchange_id = self.exchange_options[self.exchange_combo.currentText()]['id_ccxt']
-            book = self.current_order_books.get(selected_exchange_id)
-            if book:
-                # Agregacja bidów dla wybranej giełdy
-                aggregated_bids_map = {}
-                for price_str, amount_str in book.get('bids', []):
-                    try:
-                        price = float(price_str)
-                        amount = float(amount_str)
-                        agg_price = self.get_aggregated_price(price, aggregation_level, is_bid=True)
-                        aggregated_bids_map[agg_price] = aggregated_bids_map.get(agg_price, 0.0) + amount
-                    except ValueError: pass
-
-                # Konwersja do formatu wyświetlania
-                for agg_price, total_amount in aggregated_bids_map.items():
-                    final_bids_display.append((total_amount, agg_price, agg_price * total_amount, selected_exchange_id))
-
-                # Agregacja asków dla wybranej giełdy
-                aggregated_asks_map = {}
-                for price_str, amount_str in book.get('asks', []):
-                    try:
-                        price = float(price_str)
-                        amount = float(amount_str)
-                        agg_price = self.get_aggregated_price(price, aggregation_level, is_bid=False)
-                        aggregated_asks_map[agg_price] = aggregated_asks_map.get(agg_price, 0.0) + amount
-                    except ValueError: pass
-
-                # Konwersja do formatu wyświetlania
-                for agg_price, total_amount in aggregated_asks_map.items():
-                    final_asks_display.append((total_amount, agg_price, agg_price * total_amount, selected_exchange_id))
-
-
-        elif selected_ob_source == "Wszystkie aktywne giełdy":
-            # Mapy do agregowania danych ze wszystkich giełd dla każdego poziomu cenowego
-            # Format: {agg_price: total_amount}
-            overall_aggregated_bids = {}
-            overall_aggregated_asks = {}
-
-            # Jeśli agregacja_level to "Brak", będziemy zbierać indywidualne zlecenia
-            if aggregation_level == 0.0:
-                # Format: [(amount, price, value, exchange_id), ...]
-                all_individual_bids = []
-                all_individual_asks = []
-
-                for ex_id, book in self.current_order_books.items():
-                    if book:
-                        for price_str, amount_str in book.get('bids', []):
-                            try:
-                                price = float(price_str)
-                                amount = float(amount_str)
-                                all_individual_bids.append((amount, price, price * amount, ex_id))
-                            except ValueError: pass
-                        for price_str, amount_str in book.get('asks', []):
-                            try:
-                                price = float(price_str)
-                                amount = float(amount_str)
-                                all_individual_asks.append((amount, price, price * amount, ex_id))
-                            except ValueError: pass
-
-                # Sortuj indywidualne zlecenia (najpierw po cenie, potem po giełdzie dla stabilności)
-                final_bids_display = sorted(all_individual_bids, key=lambda x: (x[1], x[3]), reverse=True)
-                final_asks_display = sorted(all_individual_asks, key=lambda x: (x[1], x[3]))
-
-            else: # Agregacja na poziomach (sumowanie z wielu giełd)
-                for ex_id, book in self.current_order_books.items():
-                    if book:
-                        # Agreguj bidy dla aktualnej giełdy w pętli
-                        for price_str, amount_str in book.get('bids', []):
-                            try:
-                                price = float(price_str)
-                                amount = float(amount_str)
-                                agg_price = self.get_aggregated_price(price, aggregation_level, is_bid=True)
-                                overall_aggregated_bids[agg_price] = overall_aggregated_bids.get(agg_price, 0.0) + amount
-                            except ValueError: pass
-                        # Agreguj aski dla aktualnej giełdy w pętli
-                        for price_str, amount_str in book.get('asks', []):
-                            try:
-                                price = float(price_str)
-                                amount = float(amount_str)
-                                agg_price = self.get_aggregated_price(price, aggregation_level, is_bid=False)
-                                overall_aggregated_asks[agg_price] = overall_aggregated_asks.get(agg_price, 0.0) + amount
-                            except ValueError: pass
-
-                # Konwersja zagregowanych danych do formatu wyświetlania
-                for agg_price, total_amount in overall_aggregated_bids.items():
-                    final_bids_display.append((total_amount, agg_price, agg_price * total_amount, "Agregacja"))
-
-                for agg_price, total_amount in overall_aggregated_asks.items():
-                    final_asks_display.append((total_amount, agg_price, agg_price * total_amount, "Agregacja"))
-
-                final_bids_display = sorted(final_bids_display, key=lambda x: x[1], reverse=True)
-                final_asks_display = sorted(final_asks_display, key=lambda x: x[1])
-
-
-        self.update_book_table(self.bids_table, final_bids_display)
-        self.update_book_table(self.asks_table, final_asks_display)
-
-
-    def get_aggregated_price(self, price, level, is_bid):
-        if level == 0.0: return price
-        if is_bid:
-            agg_price = np.floor(price / level) * level
+            books = {selected_exchange_id: self.current_order_books.get(selected_exchange_id)}
+            merged_label = selected_exchange_id
         else:
-            agg_price = np.ceil(price / level) * level
-        return round(agg_price, self.get_price_precision())
-
-
-    def get_aggregation_precision_for_rounding(self, level):
-        if level == 0: return 8
-        try:
-            return int(max(0, -np.log10(level)))
-        except (ValueError, TypeError):
-            return 8
-
+            books = self.current_order_books
+            merged_label = AGGREGATED_SOURCE_LABEL
+
+        aggregated = aggregate_order_books(books, self.aggregation_level, self.price_precision, merged_label)
+        self.bids_model.set_side(*aggregated['bids'], self.price_precision)
+        self.asks_model.set_side(*aggregated['asks'], self.price_precision)
+        return {side: aggregated[side][:2] for side in ('bids', 'asks')}
+
+
+    def on_heatmap_toggled(self, checked):
+        if hasattr(self, 'heatmap_item'): self.heatmap_item.setVisible(checked)
+
+    def update_heatmap_image(self):
+        heatmap = self.liquidity_heatmap
+        if heatmap is None or not len(heatmap) or heatmap.version == self.heatmap_drawn_version: return
+        image = heatmap.view()
+        if heatmap.last_slot != self.heatmap_drawn_slot:
+            # próg kolorów liczony raz na nową kolumnę, nie przy każdej migawce
+            filled = image[image > 0]
+            if len(filled): self.heatmap_levels = (0.0, float(np.percentile(filled, HEATMAP_LEVEL_PERCENTILE)))
+            self.heatmap_drawn_slot = heatmap.last_slot
+        self.heatmap_item.setImage(image, autoLevels=False, levels=self.heatmap_levels)
+        self.heatmap_item.setRect(QRectF(*heatmap.rect()))
+        self.heatmap_drawn_version = heatmap.version
 
     def on_aggregation_changed(self):
-        self.asks_table.clearContents()
-        self.bids_table.clearContents()
+        self.aggregation_level = self.get_aggregation_level()
+        self.price_precision = self.get_price_precision()
+        self.asks_model.clear()
+        self.bids_model.clear()
+        self.sync_consolidated_book()
         self.aggregate_and_update_display()
 
 
     def on_ob_source_changed(self):
-        if self.active_workers:
+        if self.active_streams:
             QMessageBox.information(self, "Zmień źródło Order Booka",
                                     "Aby zmienić źródło Order Booka, proszę zatrzymać i ponownie uruchomić stream.")
 
-        self.asks_table.clearContents()
-        self.bids_table.clearContents()
+        self.asks_model.clear()
+        self.bids_model.clear()
+        self.sync_consolidated_book()
         self.aggregate_and_update_display()
 
 
-    def update_book_table(self, table, data):
-        max_display_rows = table.rowCount()
-        display_data = data[:max_display_rows]
-
-        table.setSortingEnabled(False)
-        table.setRowCount(max_display_rows) # Zapewnia stałą liczbę wierszy
-
-        try:
-            # Używamy price * amount, które jest już w display_data
-            values = [row[0] * row[1] for row in display_data] # (amount * price)
-            max_value = max(values) if values else 1.0
-        except Exception:
-            max_value = 1.0
-
-        current_precision = self.get_price_precision()
-
-        for row_idx, row_data in enumerate(display_data):
-            amount = row_data[0]
-            price = row_data[1]
-            value = row_data[2]
-            source_exchange = row_data[3] # Nowa kolumna
-
-            item_amount = QTableWidgetItem(f"{amount:.4f}")
-            item_price = QTableWidgetItem(f"{price:.{current_precision}f}")
-            item_value = QTableWidgetItem(f"{value:,.2f}")
-            item_source = QTableWidgetItem(source_exchange)
-
-            item_price.setTextAlignment(Qt.AlignmentFlag.AlignRight)
-            item_value.setTextAlignment(Qt.AlignmentFlag.AlignRight)
-            item_source.setTextAlignment(Qt.AlignmentFlag.AlignCenter) # Wyrównaj giełdę do środka
-
-            for item in [item_amount, item_price, item_value, item_source]:
-                item.setFont(self.table_font)
-
-            if max_value > 0:
-                strength = min((value / max_value) * 1.5, 1.0)
-                base_color = QColor(250,250,250)
-                strong_color = QColor(255, 160, 160) if table is self.asks_table else QColor(160, 255, 160)
-
-                r = int(base_color.red() * (1 - strength) + strong_color.red() * strength)
-                g = int(base_color.green() * (1 - strength) + strong_color.green() * strength)
-                b = int(base_color.blue() * (1 - strength) + strong_color.blue() * strength)
-
-                bg_color = QColor(r, g, b)
-                for item in [item_amount, item_price, item_value, item_source]:
-                    item.setBackground(bg_color)
-
-            table.setItem(row_idx, 0, item_amount)
-            table.setItem(row_idx, 1, item_price)
-            table.setItem(row_idx, 2, item_value)
-            table.setItem(row_idx, 3, item_source)
-
-        for row_idx in range(len(display_data), max_display_rows):
-            for col_idx in range(table.columnCount()):
-                table.setItem(row_idx, col_idx, QTableWidgetItem(""))
-
-        table.setSortingEnabled(True)
-
     def redraw_plots(self):
+        if self.dashboard_active:
+            for tile in self.dashboard_tiles.values(): tile.refresh_plot()
+            return
         if not hasattr(self, 'price_plot_widget') or not self.price_plot_widget: return
         if not hasattr(self, 'cvd_plot_widget') or not self.cvd_plot_widget: return
 
@@ -775,18 +1170,19 @@ class OrderFlowWindow(QMainWindow):
         if not hasattr(self, 'delta_bar_item') or self.delta_bar_item.scene() is None:
             return
 
-        full_candle_data = list(self.candle_data)
-        if self.current_candle: full_candle_data.append(self.current_candle)
+        interval_seconds = RESAMPLE_SECONDS.get(self.resample_combo.currentText(), 1)
+        # Widok bufora świec z dołączoną formującą się świecą (bez kopiowania)
+        candles = self.candle_data.view_with(self.current_candle) if self.current_candle else self.candle_data.view()
 
-        if full_candle_data:
-            self.candlestick_item.setData(full_candle_data)
+        if len(candles):
+            self.candlestick_item.setData(candles, interval_seconds)
+            if self.heatmap_checkbox.isChecked() and hasattr(self, 'heatmap_item') and self.heatmap_item.scene() is not None:
+                self.update_heatmap_image()
+            if self.footprint_level and hasattr(self, 'footprint_item') and self.footprint_item.scene() is not None:
+                self.footprint_item.setData(self.footprint_data, self.footprint_forming, self.footprint_level, interval_seconds)
 
-            x_data = np.array([d['x'] for d in full_candle_data])
+            x_data = candles[:, 0]
             if len(x_data) > 1:
-                resample_map = {"1s":1, "5s":5, "15s":15, "1Min":60, "5Min":300, "15Min":900, "1H":3600}
-                interval_str = self.resample_combo.currentText()
-                interval_seconds = resample_map.get(interval_str, 1)
-
                 visible_range_seconds = interval_seconds * 60
 
                 x_max_current = x_data[-1]
@@ -798,41 +1194,43 @@ class OrderFlowWindow(QMainWindow):
                  self.price_plot_widget.setXRange(x_data[0] - 10, x_data[0] + 10)
                  self.cvd_plot_widget.setXRange(x_data[0] - 10, x_data[0] + 10)
 
-
-            y_lows = np.array([d['low'] for d in full_candle_data])
-            y_highs = np.array([d['high'] for d in full_candle_data])
-            if len(y_lows) > 0 and len(y_highs) > 0:
-                y_min_display = np.min(y_lows) * 0.99
-                y_max_display = np.max(y_highs) * 1.01
-                self.price_plot_widget.setYRange(y_min_display, y_max_display)
+            y_min_display = candles[:, 3].min() * 0.99
+            y_max_display = candles[:, 2].max() * 1.01
+            self.price_plot_widget.setYRange(y_min_display, y_max_display)
 
 
         if self.delta_mode_combo.currentText() == "CVD (Skumulowana Delta)":
             self.delta_bar_item.hide()
             self.cvd_plot_line.show()
-            if self.cvd_data:
-                cvd_list = list(self.cvd_data)
-                x = [d['x'] for d in cvd_list]
-                y = [d['y'] for d in cvd_list]
+            if len(self.cvd_data):
+                cvd = self.cvd_data.view()
+                x, y = cvd[:, 0], cvd[:, 1]
                 self.cvd_plot_line.setData(x, y)
-                if len(y) > 0:
-                    self.cvd_plot_widget.setYRange(min(y) * 0.9, max(y) * 1.1)
+                self.cvd_plot_widget.setYRange(y.min() * 0.9, y.max() * 1.1)
 
         else:
             self.delta_bar_item.show()
             self.cvd_plot_line.hide()
-            resample_map = {"1s":1, "5s":5, "15s":15, "1Min":60, "5Min":300, "15Min":900}; interval = resample_map.get(self.resample_combo.currentText(), 60)
-            bar_width = interval * 0.8; brushes = [pg.mkBrush('g') if d.get('delta', 0) > 0 else pg.mkBrush('r') for d in full_candle_data]
-            self.delta_bar_item.setOpts(x=[d['x'] for d in full_candle_data], height=[d.get('delta', 0) for d in full_candle_data], width=bar_width, brushes=brushes)
-            if full_candle_data:
-                deltas = [d.get('delta', 0) for d in full_candle_data]
-                if len(deltas) > 0:
-                    y_min_delta = min(deltas) * 1.2
-                    y_max_delta = max(deltas) * 1.2
-                    self.cvd_plot_widget.setYRange(y_min_delta, y_max_delta)
+            bar_width = interval_seconds * 0.8
+            deltas = candles[:, 5]
+            up_brush, down_brush = pg.mkBrush('g'), pg.mkBrush('r')
+            brushes = [up_brush if positive else down_brush for positive in (deltas > 0).tolist()]
+            self.delta_bar_item.setOpts(x=candles[:, 0].copy(), height=deltas.copy(), width=bar_width, brushes=brushes)
+            if len(deltas) > 0:
+                y_min_delta = deltas.min() * 1.2
+                y_max_delta = deltas.max() * 1.2
+                self.cvd_plot_widget.setYRange(y_min_delta, y_max_delta)
+
+    def get_stream_loop(self):
+        if self.stream_loop is None or not self.stream_loop.is_alive():
+            self.stream_loop = StreamLoopThread()
+            self.stream_loop.start()
+        return self.stream_loop
 
     def closeEvent(self, event):
-        self.stop_stream(); super().closeEvent(event)
+        self.stop_stream()
+        if self.stream_loop: self.stream_loop.shutdown()
+        super().closeEvent(event)
 
     def trigger_fetch_markets(self):
         if self.fetch_markets_thread and self.fetch_markets_thread.isRunning(): return
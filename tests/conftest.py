@@ -0,0 +1,4 @@
+import os, sys
+
+# Moduły aplikacji leżą płasko w katalogu głównym repozytorium
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,89 @@
+import os
+import numpy as np
+import pytest
+from PyQt6.QtCore import QCoreApplication
+
+from candle_cache import CandleCache, merge_ohlcv, ohlcv_to_array
+
+
+@pytest.fixture(scope='module', autouse=True)
+def qt_app():
+    return QCoreApplication.instance() or QCoreApplication([])
+
+
+def candles(start, count, close=1.0):
+    ts = (start + np.arange(count)) * 60000.0
+    return np.column_stack([ts, np.full(count, close), np.full(count, close), np.full(count, close), np.full(count, close), np.ones(count)])
+
+
+def test_merge_ohlcv_fresh_overrides_its_range_and_keeps_the_rest():
+    cached = candles(0, 10, close=1.0)
+    fresh = candles(5, 10, close=2.0)
+    merged = merge_ohlcv(cached, fresh)
+    assert np.array_equal(merged[:, 0], candles(0, 15)[:, 0])
+    assert np.all(merged[:5, 4] == 1.0) and np.all(merged[5:, 4] == 2.0)
+
+
+def test_merge_ohlcv_keeps_newer_cached_candles_after_older_fresh_history():
+    cached = candles(10, 10, close=1.0)
+    older = candles(0, 12, close=2.0)
+    merged = merge_ohlcv(cached, older)
+    assert np.array_equal(merged[:, 0], candles(0, 20)[:, 0])
+    assert np.all(merged[12:, 4] == 1.0)
+
+
+def test_merge_ohlcv_missing_sides():
+    fresh = candles(0, 5)
+    assert np.array_equal(merge_ohlcv(None, fresh), fresh)
+    assert np.array_equal(merge_ohlcv(fresh, None), fresh)
+    assert merge_ohlcv(None, None).shape == (0, 6)
+
+
+def test_merge_ohlcv_trims_to_newest_bars():
+    merged = merge_ohlcv(candles(0, 10), candles(10, 10), max_bars=8)
+    assert np.array_equal(merged[:, 0], candles(12, 8)[:, 0])
+
+
+def test_ohlcv_to_array_shape():
+    assert ohlcv_to_array([[1, 2, 3, 4, 5, 6]]).shape == (1, 6)
+    assert ohlcv_to_array([]).shape == (0, 6)
+
+
+def test_store_and_load_round_trip(tmp_path):
+    cache = CandleCache(str(tmp_path))
+    data = candles(0, 20)
+    cache.store('binance', 'BTC/USDT', '1m', data)
+    fresh_cache = CandleCache(str(tmp_path))
+    assert np.array_equal(fresh_cache.load('binance', 'BTC/USDT', '1m'), data)
+    assert fresh_cache.load('binance', 'ETH/USDT', '1m') is None
+
+
+def test_store_records_file_size_with_npy_header(tmp_path):
+    cache = CandleCache(str(tmp_path))
+    data = candles(0, 20)
+    cache.store('binance', 'BTC/USDT', '1m', data)
+    name = cache.file_name('binance', 'BTC/USDT', '1m')
+    assert cache._disk_index[name] == os.path.getsize(tmp_path / name) > data.nbytes
+
+
+def test_disk_limit_evicts_least_recently_used(tmp_path):
+    probe = CandleCache(str(tmp_path / 'probe'))
+    probe.store('binance', 'A/USDT', '1m', candles(0, 100))
+    file_size = os.path.getsize(tmp_path / 'probe' / probe.file_name('binance', 'A/USDT', '1m'))
+
+    cache = CandleCache(str(tmp_path / 'cache'), max_bytes=2 * file_size)
+    for symbol in ('A/USDT', 'B/USDT'):
+        cache.store('binance', symbol, '1m', candles(0, 100))
+    cache.load('binance', 'A/USDT', '1m')
+    cache.store('binance', 'C/USDT', '1m', candles(0, 100))
+    assert set(cache._disk_index) == {cache.file_name('binance', s, '1m') for s in ('A/USDT', 'C/USDT')}
+
+
+def test_store_failure_is_reported_by_signal(tmp_path):
+    cache = CandleCache(str(tmp_path / 'cache'))
+    errors = []
+    cache.write_failed.connect(errors.append)
+    os.rmdir(tmp_path / 'cache')
+    cache.store('binance', 'BTC/USDT', '1m', candles(0, 5))
+    assert len(errors) == 1 and 'BTC-USDT' in errors[0]
+    assert not os.path.exists(tmp_path / 'cache')
@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from chart_window import build_chart_data_frame, update_chart_data_frame
+
+
+def random_ohlcv(count, seed=0):
+    rng = np.random.default_rng(seed)
+    ts = 1_700_000_000_000 + np.arange(count) * 60000.0
+    close = 100 + np.cumsum(rng.normal(0, 1, count))
+    return np.column_stack([ts, close, close + 1, close - 1, close + 0.5, np.ones(count)])
+
+
+@pytest.mark.parametrize('indicator_name, params', [('MACD', {'fast': 12, 'slow': 26, 'signal': 9}),
+                                                    ('RSI', {'rsi_period': 14}),
+                                                    ('Williams %R', {'wpr_period': 14, 'ema_period': 9})])
+def test_live_update_of_the_tail_matches_full_recompute(indicator_name, params):
+    ohlcv = random_ohlcv(3000)
+    df = build_chart_data_frame(ohlcv[:-1], indicator_name, params, None)
+    live = random_ohlcv(3001, seed=1)[-3:]
+    live[:, 0] = ohlcv[-2, 0] + np.arange(3) * 60000.0   # formująca się świeca zmieniona + dwie nowe
+
+    updated = update_chart_data_frame(df, live, indicator_name, params, len(df))
+    expected = build_chart_data_frame(np.concatenate([ohlcv[:-2], live]), indicator_name, params, None).iloc[-len(df):]
+
+    pd.testing.assert_frame_equal(updated, expected, check_exact=False, rtol=1e-9, atol=1e-9)
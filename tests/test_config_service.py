@@ -0,0 +1,44 @@
+import configparser
+import pytest
+from PyQt6.QtCore import QCoreApplication
+
+from config_service import ConfigService, get_config_service
+
+
+@pytest.fixture(scope='module', autouse=True)
+def qt_app():
+    return QCoreApplication.instance() or QCoreApplication([])
+
+
+def test_commit_reports_changed_sections_and_flush_writes_file(tmp_path):
+    path = tmp_path / 'app_settings.ini'
+    service = ConfigService(str(path))
+    assert service.commit() == []
+    service.config['chart_settings'] = {'chart_0_timeframe': '1h'}
+    service.config['scan_settings'] = {'wpr_period': '14'}
+    assert service.commit() == ['chart_settings', 'scan_settings']
+    assert service.commit() == []
+    assert not path.exists()   # zapis dopiero po opóźnieniu lub flush()
+
+    service.flush()
+    saved = configparser.ConfigParser()
+    saved.read(path)
+    assert saved['chart_settings']['chart_0_timeframe'] == '1h'
+    assert service.file_exists and not (tmp_path / 'app_settings.ini.tmp').exists()
+
+
+def test_flush_quietly_reports_errors_by_signal(tmp_path):
+    service = ConfigService(str(tmp_path / 'app_settings.ini'))
+    errors = []
+    service.save_failed.connect(errors.append)
+    service.config['chart_settings'] = {'a': '1'}
+    service.commit()
+    (tmp_path / 'app_settings.ini.tmp').mkdir()   # plik tymczasowy nie do otwarcia
+    service.flush_quietly()
+    assert len(errors) == 1
+
+
+def test_get_config_service_is_shared_per_path(tmp_path):
+    path = str(tmp_path / 'app_settings.ini')
+    assert get_config_service(path) is get_config_service(path)
+    assert get_config_service(path) is not get_config_service(str(tmp_path / 'other.ini'))
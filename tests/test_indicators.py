@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import indicators
+from indicators import IndicatorParam, IndicatorResultCache, compute_indicator, register_indicator
+
+COUNTING_INDICATOR = "Test: licznik"
+
+
+@pytest.fixture
+def counting_indicator():
+    calls = []
+
+    @register_indicator(COUNTING_INDICATOR, params=[IndicatorParam('period', "Okres:", 3)])
+    def counting(df, params):
+        calls.append(params['period'])
+        return {f"MA_{params['period']}": df['close'].rolling(params['period']).mean()}
+
+    yield calls
+    indicators.INDICATOR_REGISTRY.pop(COUNTING_INDICATOR, None)
+
+
+def ohlcv_frame(closes):
+    closes = np.asarray(closes, dtype=np.float64)
+    index = pd.date_range('2024-01-01', periods=len(closes), freq='min')
+    return pd.DataFrame({'open': closes, 'high': closes, 'low': closes, 'close': closes, 'volume': 1.0}, index=index)
+
+
+SOURCE = ('binance', 'BTC/USDT', '1m', 1704067200000)
+
+
+def test_same_source_and_params_hit_the_cache(counting_indicator):
+    cache = IndicatorResultCache()
+    first = compute_indicator(ohlcv_frame([1, 2, 3, 4]), COUNTING_INDICATOR, {'period': 2}, SOURCE, cache)
+    second = compute_indicator(ohlcv_frame([1, 2, 3, 4]), COUNTING_INDICATOR, {'period': 2}, SOURCE, cache)
+    assert second is first
+    assert counting_indicator == [2]
+
+
+def test_key_includes_params_last_close_length_and_source(counting_indicator):
+    cache = IndicatorResultCache()
+    compute_indicator(ohlcv_frame([1, 2, 3, 4]), COUNTING_INDICATOR, {'period': 2}, SOURCE, cache)
+    compute_indicator(ohlcv_frame([1, 2, 3, 4]), COUNTING_INDICATOR, {'period': 3}, SOURCE, cache)
+    # formująca się świeca: ta sama długość i źródło, inne zamknięcie
+    compute_indicator(ohlcv_frame([1, 2, 3, 5]), COUNTING_INDICATOR, {'period': 2}, SOURCE, cache)
+    compute_indicator(ohlcv_frame([1, 2, 3, 4, 4]), COUNTING_INDICATOR, {'period': 2}, SOURCE, cache)
+    compute_indicator(ohlcv_frame([1, 2, 3, 4]), COUNTING_INDICATOR, {'period': 2}, ('bybit', *SOURCE[1:]), cache)
+    assert len(counting_indicator) == 5
+
+
+def test_default_params_share_a_key_with_explicit_defaults(counting_indicator):
+    cache = IndicatorResultCache()
+    compute_indicator(ohlcv_frame([1, 2, 3, 4]), COUNTING_INDICATOR, None, SOURCE, cache)
+    compute_indicator(ohlcv_frame([1, 2, 3, 4]), COUNTING_INDICATOR, {'period': 3, 'unknown': 1}, SOURCE, cache)
+    assert counting_indicator == [3]
+
+
+def test_no_source_bypasses_the_cache(counting_indicator):
+    cache = IndicatorResultCache()
+    compute_indicator(ohlcv_frame([1, 2, 3, 4]), COUNTING_INDICATOR, None, None, cache)
+    compute_indicator(ohlcv_frame([1, 2, 3, 4]), COUNTING_INDICATOR, None, None, cache)
+    assert len(counting_indicator) == 2
+
+
+def test_result_cache_is_lru():
+    cache = IndicatorResultCache(max_entries=2)
+    cache.put('a', {'x': 1})
+    cache.put('b', {'x': 2})
+    cache.get('a')
+    cache.put('c', {'x': 3})
+    assert cache.get('b') is None
+    assert cache.get('a') == {'x': 1} and cache.get('c') == {'x': 3}
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from order_book import AGGREGATED_SOURCE_LABEL, ConsolidatedOrderBook, LocalOrderBook, aggregate_order_books, aggregate_side
+
+
+def make_book(mid, levels=200, tick=0.01, seed=0):
+    rng = np.random.default_rng(seed)
+    offsets = tick * np.arange(1, levels + 1)
+    return {'bids': np.column_stack((np.round(mid - offsets, 2), rng.random(levels))),
+            'asks': np.column_stack((np.round(mid + offsets, 2), rng.random(levels))),
+            'timestamp': 1}
+
+
+BOOKS = {'binance': make_book(100.00, seed=1), 'bybit': make_book(100.01, seed=2), 'okx': make_book(99.99, seed=3)}
+
+
+@pytest.mark.parametrize('side', ['bids', 'asks'])
+def test_consolidated_top_matches_full_sort(side):
+    book = ConsolidatedOrderBook(50)
+    for exchange_id, snapshot in BOOKS.items():
+        book.update(exchange_id, snapshot)
+    prices, amounts, sources = book.side(side)
+    expected_prices, expected_amounts, expected_sources = aggregate_order_books(BOOKS, 0.0)[side]
+    assert np.array_equal(prices, expected_prices[:50])
+    assert np.array_equal(amounts, expected_amounts[:50])
+    assert list(sources) == list(expected_sources[:50])
+
+
+def test_consolidated_update_reuses_merge_when_top_is_unchanged():
+    book = ConsolidatedOrderBook(20)
+    for exchange_id, snapshot in BOOKS.items():
+        book.update(exchange_id, snapshot)
+    merged = book.side('bids')
+    deeper_change = {side: levels.copy() for side, levels in BOOKS['binance'].items() if side != 'timestamp'}
+    deeper_change['bids'][150, 1] += 5.0
+    assert not book.update('binance', deeper_change)
+    assert book.side('bids') is merged
+
+    top_change = {side: levels.copy() for side, levels in deeper_change.items()}
+    top_change['bids'][0, 1] += 5.0
+    assert book.update('binance', top_change)
+    assert book.side('bids') is not merged
+    assert book.side('asks') is book.side('asks')
+
+
+def test_consolidated_remove_and_depth():
+    book = ConsolidatedOrderBook(10)
+    for exchange_id, snapshot in BOOKS.items():
+        book.update(exchange_id, snapshot)
+    assert len(book.depth('asks')[0]) == 3 * 200
+    book.remove('okx')
+    assert 'okx' not in set(book.side('bids')[2])
+    assert len(book.depth('asks')[0]) == 2 * 200
+
+
+def test_consolidated_accepts_ccxt_lists_and_empty_sides():
+    book = ConsolidatedOrderBook(5)
+    book.update('binance', {'bids': [[10.0, 1.0], [9.0, 2.0]], 'asks': []})
+    prices, amounts, sources = book.side('bids')
+    assert list(prices) == [10.0, 9.0] and list(sources) == ['binance', 'binance']
+    assert len(book.side('asks')[0]) == 0
+
+
+def test_aggregate_side_groups_bids_down_and_asks_up():
+    prices = np.array([100.04, 100.01, 99.99, 100.10])
+    amounts = np.array([1.0, 2.0, 3.0, 4.0])
+    bid_prices, bid_amounts = aggregate_side(prices, amounts, 0.1, True)
+    ask_prices, ask_amounts = aggregate_side(prices, amounts, 0.1, False)
+    assert list(bid_prices) == [100.1, 100.0, 99.9] and list(bid_amounts) == [4.0, 3.0, 3.0]
+    assert list(ask_prices) == [100.0, 100.1] and list(ask_amounts) == [3.0, 7.0]
+
+
+def test_aggregate_order_books_labels_merged_levels():
+    aggregated = aggregate_order_books(BOOKS, 0.1)
+    assert set(aggregated['bids'][2]) == {AGGREGATED_SOURCE_LABEL}
+    single = aggregate_order_books({'binance': BOOKS['binance']}, 0.1)
+    assert set(single['asks'][2]) == {'binance'}
+
+
+def test_local_order_book_suppresses_unchanged_snapshots():
+    local = LocalOrderBook(depth=3)
+    ccxt_book = {'bids': [[10.0, 1.0], [9.0, 1.0], [8.0, 1.0], [7.0, 1.0]], 'asks': [[11.0, 1.0]], 'timestamp': 5}
+    assert local.update(ccxt_book)
+    assert local.snapshot()['bids'].shape == (3, 2)
+    ccxt_book['bids'][3][1] = 9.0   # poza zakresem `depth`
+    assert not local.update(ccxt_book)
@@ -0,0 +1,248 @@
+from collections import defaultdict
+import numpy as np
+import pytest
+
+from order_flow_data import (LiquidityHeatmap, RingBuffer, StreamChannel, TradeAggregator, auto_footprint_level,
+                             auto_heatmap_level, merge_trade_updates)
+
+COLUMNS = ('x', 'y')
+
+
+def make_trades(count, start=1_700_000_000.0, step=0.37, seed=0):
+    rng = np.random.default_rng(seed)
+    return [{'timestamp': (start + i * step) * 1000, 'price': float(100 + rng.normal()), 'amount': float(rng.random()),
+             'side': 'buy' if rng.random() < 0.6 else 'sell'} for i in range(count)]
+
+
+def reference_candles(trades, interval):
+    # prosta pętla po transakcjach - wzorzec dla wektorowej agregacji
+    candles, current = [], None
+    for trade in trades:
+        start = (trade['timestamp'] / 1000 // interval) * interval
+        delta = trade['amount'] if trade['side'] == 'buy' else -trade['amount']
+        if current is not None and start > current[0]:
+            candles.append(current)
+            current = None
+        if current is None:
+            current = [start, trade['price'], trade['price'], trade['price'], trade['price'], delta]
+        else:
+            current[2] = max(current[2], trade['price'])
+            current[3] = min(current[3], trade['price'])
+            current[4] = trade['price']
+            current[5] += delta
+    return np.array(candles), np.array(current)
+
+
+def rows(start, count):
+    values = np.arange(start, start + count, dtype=np.float64)
+    return np.column_stack((values, values * 10))
+
+
+def test_ring_buffer_keeps_last_capacity_rows_across_wraparound():
+    buffer = RingBuffer(5, COLUMNS)
+    for start in range(0, 23, 3):
+        buffer.extend(rows(start, 3))
+    assert len(buffer) == 5
+    assert np.array_equal(buffer.view(), rows(19, 5))
+    assert np.array_equal(buffer.last(), rows(23, 1)[0])
+
+
+def test_ring_buffer_make_room_moves_live_rows_to_the_front():
+    buffer = RingBuffer(4, COLUMNS)
+    buffer.extend(rows(0, 4))
+    buffer.extend(rows(4, 4))   # koniec bufora o podwójnej pojemności
+    assert buffer._end == 8
+    buffer.extend(rows(8, 2))   # brak miejsca - przesunięcie na początek
+    assert buffer._start == 0 and buffer._end == 4
+    assert np.array_equal(buffer.view(), rows(6, 4))
+
+
+def test_ring_buffer_extend_larger_than_capacity_keeps_newest():
+    buffer = RingBuffer(3, COLUMNS)
+    buffer.extend(rows(0, 2))
+    buffer.extend(rows(2, 10))
+    assert np.array_equal(buffer.view(), rows(9, 3))
+
+
+def test_ring_buffer_view_is_zero_copy_and_view_with_does_not_store():
+    buffer = RingBuffer(4, COLUMNS)
+    buffer.extend(rows(0, 2))
+    assert np.shares_memory(buffer.view(), buffer._data)
+    extended = buffer.view_with((99.0, 990.0))
+    assert np.array_equal(extended[-1], (99.0, 990.0)) and len(extended) == 3
+    assert len(buffer) == 2 and np.array_equal(buffer.view(), rows(0, 2))
+
+
+def test_ring_buffer_append_column_and_clear():
+    buffer = RingBuffer(4, COLUMNS)
+    buffer.append((1.0, 2.0))
+    buffer.extend(np.empty((0, 2)))
+    assert np.array_equal(buffer.column('y'), [2.0])
+    buffer.clear()
+    assert len(buffer) == 0 and buffer.last() is None
+
+
+def test_trade_aggregator_matches_reference_across_batches():
+    trades = make_trades(500)
+    aggregator = TradeAggregator(5)
+    closed, cvd = [], []
+    for begin in range(0, len(trades), 37):
+        update = aggregator.add_trades(trades[begin:begin + 37])
+        closed.append(update['closed'])
+        cvd.append(update['cvd'])
+    expected_closed, expected_forming = reference_candles(trades, 5)
+    assert np.allclose(np.concatenate(closed), expected_closed)
+    assert np.allclose(update['forming'], expected_forming)
+
+    deltas = [t['amount'] if t['side'] == 'buy' else -t['amount'] for t in trades]
+    cvd = np.concatenate(cvd)
+    assert np.allclose(cvd[:, 0], [t['timestamp'] / 1000 for t in trades])
+    assert np.allclose(cvd[:, 1], np.cumsum(deltas))
+    assert aggregator.cumulative_delta == pytest.approx(sum(deltas))
+
+
+def test_trade_aggregator_puts_late_trades_into_the_current_candle():
+    aggregator = TradeAggregator(1)
+    aggregator.add_trades([{'timestamp': 10_500, 'price': 100.0, 'amount': 1.0, 'side': 'buy'}])
+    update = aggregator.add_trades([{'timestamp': 9_200, 'price': 90.0, 'amount': 2.0, 'side': 'sell'}])
+    assert len(update['closed']) == 0
+    assert update['forming'] == (10.0, 100.0, 100.0, 90.0, 90.0, -1.0)
+
+
+def test_trade_aggregator_empty_batch():
+    assert TradeAggregator(1).add_trades([]) is None
+
+
+def split_updates(trades, batch, **aggregator_options):
+    aggregator = TradeAggregator(5, **aggregator_options)
+    return aggregator, [aggregator.add_trades(trades[begin:begin + batch]) for begin in range(0, len(trades), batch)]
+
+
+def test_merge_trade_updates_is_lossless():
+    trades = make_trades(300)
+    _, updates = split_updates(trades, 20)
+    _, (whole,) = split_updates(trades, len(trades))
+    merged = merge_trade_updates(updates)
+    for key in ('cvd', 'closed'):
+        assert np.allclose(merged[key], whole[key])
+    assert np.allclose(merged['forming'], whole['forming'])
+    assert merge_trade_updates(updates[:1]) is updates[0]
+
+
+def test_merge_trade_updates_with_some_updates_missing_footprint():
+    trades = make_trades(60)
+    _, plain = split_updates(trades[:30], 30)
+    _, with_footprint = split_updates(trades[30:], 10, footprint_level=0.5)
+    merged = merge_trade_updates(plain + with_footprint)
+    assert np.allclose(merged['footprint_closed'], np.concatenate([u['footprint_closed'] for u in with_footprint]))
+    assert merged['footprint_forming'] is with_footprint[-1]['footprint_forming']
+    assert merged['footprint_level'] == 0.5
+    assert 'footprint_closed' not in merge_trade_updates(plain + plain)
+
+
+def test_stream_channel_keeps_only_latest_book_per_key():
+    channel = StreamChannel()
+    channel.put_book('binance', {'n': 1})
+    channel.put_book('bybit', {'n': 2})
+    channel.put_book('binance', {'n': 3})
+    assert channel.depth() == 2
+    batch = channel.drain()
+    assert batch['books'] == {'binance': {'n': 3}, 'bybit': {'n': 2}}
+    assert (channel.books_received, channel.books_superseded) == (3, 1)
+    assert batch['queue_latency'] >= 0
+    assert channel.drain()['books'] == {} and channel.depth() == 0
+
+
+def test_stream_channel_coalesces_trade_updates_beyond_limit():
+    trades = make_trades(200)
+    _, updates = split_updates(trades, 10)
+    channel = StreamChannel(max_trade_updates=4)
+    for update in updates:
+        channel.put_trades('BTC/USDT', update)
+        assert channel.depth() <= 4
+    channel.put_trades('ETH/USDT', updates[0])
+    batch = channel.drain()
+    assert channel.trade_updates_received == len(updates) + 1
+    assert channel.trade_updates_merged > 0
+    assert np.allclose(batch['trade_updates']['BTC/USDT']['cvd'], merge_trade_updates(updates)['cvd'])
+    assert batch['trade_updates']['ETH/USDT'] is updates[0]
+
+
+def test_stream_channel_bounds_errors():
+    channel = StreamChannel()
+    for i in range(25):
+        channel.put_error(f"błąd {i}")
+    errors = channel.drain()['errors']
+    assert errors[-1] == "błąd 24" and len(errors) < 25
+    assert channel.drain()['queue_latency'] is None
+
+
+def test_footprint_matches_reference_volume_at_price():
+    trades = make_trades(400)
+    level = 0.25
+    aggregator, updates = split_updates(trades, 33, footprint_level=level)
+    expected = defaultdict(lambda: [0.0, 0.0])
+    for trade in trades:
+        key = ((trade['timestamp'] / 1000 // 5) * 5, int(np.floor(round(trade['price'] / level, 9))))
+        expected[key][0 if trade['side'] == 'buy' else 1] += trade['amount']
+
+    closed = np.concatenate([update['footprint_closed'] for update in updates])
+    cells = np.concatenate((closed, updates[-1]['footprint_forming']))
+    got = {(x, int(round(price / level))): (buy, sell) for x, price, buy, sell in cells.tolist()}
+    assert len(got) == len(cells) == len(expected)
+    for key, volumes in expected.items():
+        assert np.allclose(got[key], volumes)
+    # zamknięte świece dopisywane w kolejności czasu, formująca się ma x bieżącej świecy
+    assert np.all(np.diff(closed[:, 0]) >= 0)
+    assert np.all(updates[-1]['footprint_forming'][:, 0] == aggregator.current.x)
+
+
+def test_footprint_auto_level_and_disabled_by_default():
+    trades = make_trades(10)
+    _, updates = split_updates(trades, 10, footprint_level=0)
+    assert updates[0]['footprint_level'] == auto_footprint_level(trades[0]['price'])
+    assert auto_footprint_level(60000.0) == 10.0 and auto_footprint_level(0.5) == 0.0001
+    _, updates = split_updates(make_trades(10), 10)
+    assert 'footprint_forming' not in updates[0]
+
+
+def book_sides(mid, levels=10, step=0.5):
+    offsets = step / 2 + step * np.arange(levels)
+    return (mid - offsets, np.ones(levels)), (mid + offsets, np.ones(levels))
+
+
+def test_heatmap_records_one_column_per_interval_and_fills_gaps():
+    heatmap = LiquidityHeatmap(1, 0.5, columns=10, rows=40)
+    heatmap.record(*book_sides(100.0), 1000.2)
+    heatmap.record(*book_sides(100.0), 1000.8)      # ten sam przedział - nadpisanie
+    assert len(heatmap) == 1 and heatmap.view()[-1].sum() == 20
+    heatmap.record(*book_sides(100.0), 1003.1)      # przerwa - kopia poprzedniej kolumny
+    assert len(heatmap) == 4 and np.all(heatmap.view().sum(axis=1) == 20)
+    x, y, width, height = heatmap.rect()
+    assert (x, width) == (999.5, 4) and y <= 95.0 and y + height >= 105.0
+
+
+def test_heatmap_recenters_price_grid_by_whole_rows():
+    heatmap = LiquidityHeatmap(1, 0.5, columns=10, rows=20)
+    heatmap.record(*book_sides(100.0), 0)
+    price0 = heatmap.price0
+    heatmap.record(*book_sides(104.0), 1)
+    shift = round((heatmap.price0 - price0) / 0.5)
+    assert shift > 0
+    # stara kolumna przesunięta razem z siatką: poziomy poza nową siatką odpadają
+    assert heatmap.view()[0].sum() == 20 - shift
+    assert heatmap.view()[1].sum() == 20
+
+
+def test_heatmap_accepts_unsorted_sides_and_rejects_empty():
+    heatmap = LiquidityHeatmap(1, 0.5, columns=10, rows=40)
+    (bid_prices, bid_amounts), asks = book_sides(100.0)
+    assert heatmap.record((bid_prices[::-1], bid_amounts), asks, 0)
+    assert heatmap.price0 == 90.0
+    assert not heatmap.record((np.empty(0), np.empty(0)), asks, 1)
+
+
+def test_auto_heatmap_level_fits_depth_in_half_the_rows():
+    prices = np.array([59000.0, 61000.0])
+    level = auto_heatmap_level(prices, rows=300)
+    assert (np.ptp(prices) / level) <= 150 and level == 100.0